@@ -14,34 +14,72 @@ from flask import (
     g,
     has_request_context,
     abort,
+    jsonify,
+    Response,
+    stream_with_context,
 )
 from dotenv import load_dotenv
 import locale
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import sqlite3
 import os
+import base64
+import click
+import csv
+import hashlib
+import heapq
+import io
+import json
+import math
+import queue
+import threading
+import time
 from urllib.parse import urlparse
+from urllib.request import pathname2url
 from forms import (
     AdminLoginForm,
     AdminLogoutForm,
     ModerationActionForm,
+    BulkModerationForm,
     SiteForm,
     AdminSiteForm,
+    SiteImportForm,
+    canonical_url,
     CategoryForm,
     DeleteCategoryForm,
     DeleteClickForm,
 )
 from flask_limiter import Limiter
-from flask_wtf.csrf import CSRFProtect, CSRFError
+from flask_wtf.csrf import CSRFProtect, CSRFError, generate_csrf
 from config import config
+from search_index import PrefixIndex, TrigramIndex, normalize_text
+from hyperloglog import register_sqlite_functions as register_hll_functions
+from ua_classifier import BOT, CATEGORY_LABELS, HEADLESS, classify_user_agent
+from click_archive import (
+    MAX_ATTACHED,
+    archive_old_clicks,
+    attach_archives,
+    click_source_sql,
+    list_archive_months,
+)
+from site_import import import_sites, parse_import_file
+from page_cache import compress_bodies, create_page_cache, select_body
+from mail_outbox import EMAIL_OUTBOX_DDL, create_outbox_sender, enqueue_digest_item, enqueue_email
+from click_pipeline import (
+    CLICK_ROLLUP_DDL,
+    apply_click_rollups,
+    create_click_buffer,
+    create_click_deduplicator,
+    rebuild_click_rollups,
+    utc_timestamp,
+)
 
 # >>> AJOUT : imports utilitaires pour un slug ASCII propre (sans emojis/accents)
 import re
 import unicodedata
-import smtplib
-import ssl
-from email.message import EmailMessage
+import zlib
 import secrets
+from collections import OrderedDict
 from functools import wraps
 from werkzeug.security import check_password_hash
 
@@ -82,66 +120,200 @@ limiter = Limiter(
 )
 limiter.init_app(app)
 
-# SÉCURITÉ : Fonction utilitaire pour gérer les connexions SQLite
-def get_db_connection():
-    """Retourne une connexion sécurisée à la base de données"""
-    try:
-     
+# PERFORMANCE : profil de stockage SQLite (cf. config.py)
+_SQLITE_JOURNAL_MODES = {"WAL", "DELETE", "TRUNCATE", "PERSIST", "MEMORY"}
+_SQLITE_SYNCHRONOUS_MODES = {"OFF", "NORMAL", "FULL", "EXTRA"}
 
-        conn = sqlite3.connect(app.config['DATABASE_PATH'])
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
 
+def apply_storage_profile(conn, readonly=False):
+    """Applique les pragmas de connexion (timeout, cache, mmap, synchronous)."""
+    busy_timeout = int(app.config.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    cache_size_kb = abs(int(app.config.get("SQLITE_CACHE_SIZE_KB", 16384)))
+    mmap_size = int(app.config.get("SQLITE_MMAP_SIZE", 0))
+
+    conn.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+    # Valeur négative = taille en KiB plutôt qu'en nombre de pages.
+    conn.execute(f"PRAGMA cache_size = -{cache_size_kb}")
+    conn.execute(f"PRAGMA mmap_size = {mmap_size}")
+    conn.execute("PRAGMA foreign_keys = ON")
+
+    if not readonly:
+        synchronous = str(app.config.get("SQLITE_SYNCHRONOUS", "NORMAL")).upper()
+        if synchronous in _SQLITE_SYNCHRONOUS_MODES:
+            conn.execute(f"PRAGMA synchronous = {synchronous}")
 
-        init_db_schema(conn)
 
+# SÉCURITÉ : Fonction utilitaire pour gérer les connexions SQLite
+def get_db_connection(readonly=False):
+    """Ouvre une nouvelle connexion SQLite (hors requête : scripts, CLI)."""
+    try:
+        database_path = app.config['DATABASE_PATH']
+        # check_same_thread=False : une connexion du pool peut servir
+        # successivement plusieurs threads du même worker.
+        if readonly:
+            conn = sqlite3.connect(
+                f"file:{pathname2url(database_path)}?mode=ro",
+                uri=True,
+                check_same_thread=False,
+            )
+        else:
+            conn = sqlite3.connect(database_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_storage_profile(conn, readonly=readonly)
+        # Utilisée par le classement de la recherche (bm25 pondéré par les clics).
+        conn.create_function("log1p", 1, math.log1p, deterministic=True)
+        # Croquis de visiteurs uniques (hll_merge, hll_union, hll_count, hll_build).
+        register_hll_functions(conn)
+        # Catégorie de user-agent (filtre de l'explorateur de clics).
+        conn.create_function("ua_category", 1, classify_user_agent, deterministic=True)
         return conn
 
     except Exception as e:
-        print("ERREUR COMPLETE :", e)
-        raise  # important pour voir la vraie erreur
+        app.logger.error(f"Ouverture de la base SQLite impossible ({app.config.get('DATABASE_PATH')}): {e}")
+        raise
 
 
+# PERFORMANCE : pools de connexions par worker (LIFO = connexion la plus "chaude").
+# Les lectures passent par des connexions mode=ro ; les écritures (propositions,
+# modération, clics) par une connexion d'écriture distincte. En WAL, les lecteurs
+# ne sont jamais bloqués par l'écrivain.
+_DB_POOLS = {
+    "read": queue.LifoQueue(maxsize=max(int(app.config.get("DB_READ_POOL_SIZE", 4)), 1)),
+    "write": queue.LifoQueue(maxsize=max(int(app.config.get("DB_WRITE_POOL_SIZE", 1)), 1)),
+}
 
-def send_submission_notification(payload):
-    """Envoie un email de notification lorsqu'un site est proposé."""
-    if not app.config.get('MAIL_ENABLED'):
+
+def _acquire_pooled_connection(kind):
+    try:
+        return _DB_POOLS[kind].get_nowait()
+    except queue.Empty:
+        return get_db_connection(readonly=(kind == "read"))
+
+
+def _release_pooled_connection(conn, kind):
+    """Rend une connexion au pool (ou la ferme si le pool est plein/cassé)."""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    except sqlite3.Error:
+        conn.close()
+        return
+    try:
+        _DB_POOLS[kind].put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+def _get_request_connection(attr, kind):
+    if not has_request_context():
+        raise RuntimeError("Connexion de requête hors contexte ; utilisez get_db_connection().")
+    if attr not in g:
+        setattr(g, attr, _acquire_pooled_connection(kind))
+    return getattr(g, attr)
+
+
+def get_db():
+    """Connexion d'écriture de la requête courante (une seule par requête)."""
+    return _get_request_connection("db", "write")
+
+
+def get_read_db():
+    """Connexion en lecture seule de la requête courante (une seule par requête)."""
+    return _get_request_connection("read_db", "read")
+
+
+# DÉMARRAGE : le schéma est appliqué par migrate.py (avant gunicorn), jamais à
+# l'import du module (CLI, tests). Chaque worker prépare ses services une fois :
+# au démarrage via le hook gunicorn post_worker_init (gunicorn.conf.py), à défaut
+# à sa première requête.
+_WORKER_SERVICES = {"pid": None}
+_WORKER_SERVICES_LOCK = threading.Lock()
+
+
+def start_worker_services():
+    """Préchauffe les index et lance les threads du worker courant (une fois par process)."""
+    if _WORKER_SERVICES["pid"] == os.getpid():
         return
+    with _WORKER_SERVICES_LOCK:
+        if _WORKER_SERVICES["pid"] == os.getpid():
+            return
+        _WORKER_SERVICES["pid"] = os.getpid()
+        warm_search_index()
+        ensure_trends_refresher()
+        if app.config.get("MAIL_ENABLED"):
+            MAIL_OUTBOX.start()
+
+
+@app.before_request
+def ensure_worker_services():
+    start_worker_services()
+
+
+@app.teardown_appcontext
+def release_db(exception=None):
+    for attr, kind in (("db", "write"), ("read_db", "read")):
+        conn = g.pop(attr, None)
+        if conn is not None:
+            _release_pooled_connection(conn, kind)
+
+
+# PERFORMANCE : les clics /go sont écrits par lots en arrière-plan (un écrivain
+# par worker, avec sa propre connexion) ; la redirection n'attend pas le fsync.
+CLICK_BUFFER = create_click_buffer(get_db_connection, app.config, logger=app.logger)
+# Anti double-comptage : (site_id, ip) déjà vu dans les CLICK_DEDUP_TTL secondes ?
+CLICK_DEDUP = create_click_deduplicator(app.config, logger=app.logger)
+
+
+def render_submission_digest(items):
+    """Sujet et corps du résumé des propositions (thread expéditeur, hors requête)."""
+    # Pas de contexte de requête ici : rendu direct, sans les context processors.
+    template = app.jinja_env.get_template("emails/submission_digest.txt")
+    body = template.render(items=items, total=len(items))
+    return f"Réunion Wiki : {len(items)} nouvelle(s) proposition(s)", body
+
+
+# NOTIFICATIONS : emails envoyés depuis la table email_outbox par un thread du worker.
+MAIL_OUTBOX = create_outbox_sender(
+    get_db_connection, app.config, render_digest=render_submission_digest, logger=app.logger
+)
+
+
+def record_click(site_id, ip_address, user_agent):
+    if app.config.get("CLICK_BUFFER_ENABLED", True):
+        return CLICK_BUFFER.submit(site_id, ip_address, user_agent)
+    # Mode synchrone (tests, scripts) : même écriture, dans la requête.
+    CLICK_BUFFER.write_batch(get_db(), [(site_id, ip_address, user_agent, utc_timestamp())])
+    return True
+
+
+
+def queue_submission_notification(cur, payload):
+    """Dépose l'email de notification dans la boîte d'envoi (transaction de l'appelant).
+
+    L'envoi SMTP est fait par MAIL_OUTBOX, hors de la requête ; en mode
+    résumé (MAIL_DIGEST_ENABLED), la proposition attend le prochain résumé.
+    """
+    if not app.config.get('MAIL_ENABLED'):
+        return False
 
     server = app.config.get('MAIL_SERVER')
     recipients = app.config.get('MAIL_RECIPIENTS', [])
     if not server or not recipients:
         app.logger.warning("Notification email non envoyée : serveur ou destinataires non configurés.")
-        return
+        return False
 
-    sender = app.config.get('MAIL_DEFAULT_SENDER') or app.config.get('MAIL_USERNAME') or recipients[0]
-    message = EmailMessage()
-    message['Subject'] = f"Nouvelle proposition Réunion Wiki : {payload.get('nom')}"
-    message['From'] = sender
-    message['To'] = ", ".join(recipients)
-    message.set_content(render_template("emails/new_submission.txt", **payload))
+    if app.config.get('MAIL_DIGEST_ENABLED'):
+        enqueue_digest_item(cur, "submission", payload)
+        return True
 
-    context = ssl.create_default_context()
-    try:
-        if app.config.get('MAIL_USE_SSL'):
-            with smtplib.SMTP_SSL(server, app.config.get('MAIL_PORT'), context=context) as smtp:
-                username = app.config.get('MAIL_USERNAME')
-                password = app.config.get('MAIL_PASSWORD')
-                if username and password:
-                    smtp.login(username, password)
-                smtp.send_message(message)
-        else:
-            with smtplib.SMTP(server, app.config.get('MAIL_PORT')) as smtp:
-                smtp.ehlo()
-                if app.config.get('MAIL_USE_TLS'):
-                    smtp.starttls(context=context)
-                username = app.config.get('MAIL_USERNAME')
-                password = app.config.get('MAIL_PASSWORD')
-                if username and password:
-                    smtp.login(username, password)
-                smtp.send_message(message)
-    except Exception as e:
-        app.logger.error(f"Erreur lors de l'envoi de l'email de notification: {e}")
+    enqueue_email(
+        cur,
+        "submission",
+        f"Nouvelle proposition Réunion Wiki : {payload.get('nom')}",
+        render_template("emails/new_submission.txt", **payload),
+        recipients,
+    )
+    return True
 
 
 def verify_admin_credentials(username, password):
@@ -189,6 +361,142 @@ def parse_positive_int(value, default=1):
     return parsed if parsed > 0 else default
 
 
+# PERFORMANCE : pagination par curseur (keyset) pour les explorateurs admin.
+# Une clé de tri = liste de (expression SQL, "ASC"/"DESC") terminée par un id unique.
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, size):
+    """Décode un curseur ; None si absent ou invalide (=> première page)."""
+    if not token or len(token) > 512:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+        return None
+    return values
+
+
+def keyset_order_sql(sort_key, backwards=False):
+    parts = []
+    for expr, direction in sort_key:
+        if backwards:
+            direction = "ASC" if direction == "DESC" else "DESC"
+        parts.append(f"{expr} {direction}")
+    return ", ".join(parts)
+
+
+def keyset_where_sql(sort_key, cursor_values, backwards=False):
+    """Condition "après le curseur" dans l'ordre de tri (ou avant si backwards)."""
+    directions = {direction for _expr, direction in sort_key}
+    if len(directions) == 1:
+        # Sens homogène : comparaison de row values, exploitable par un index.
+        ascending = (directions.pop() == "ASC") != backwards
+        exprs = ", ".join(expr for expr, _direction in sort_key)
+        placeholders = ", ".join("?" for _ in sort_key)
+        return f"({exprs}) {'>' if ascending else '<'} ({placeholders})", list(cursor_values)
+
+    clauses = []
+    params = []
+    for i, (expr, direction) in enumerate(sort_key):
+        ascending = (direction == "ASC") != backwards
+        terms = [f"{sort_key[j][0]} = ?" for j in range(i)]
+        terms.append(f"{expr} {'>' if ascending else '<'} ?")
+        clauses.append("(" + " AND ".join(terms) + ")")
+        params.extend(cursor_values[:i + 1])
+    return "(" + " OR ".join(clauses) + ")", params
+
+
+def keyset_query(select_sql, where_sql, params, sort_key, per_page, after=None, before=None):
+    """Construit la requête d'une page keyset : (sql, params, backwards).
+
+    `select_sql` doit contenir un marqueur {where} et {order} ; les valeurs de la
+    clé de tri sont sélectionnées sous les alias _k0, _k1...
+    """
+    backwards = before is not None and after is None
+    cursor_values = before if backwards else after
+    conditions = [where_sql]
+    query_params = list(params)
+    if cursor_values is not None:
+        keyset_sql, keyset_params = keyset_where_sql(sort_key, cursor_values, backwards=backwards)
+        conditions.append(keyset_sql)
+        query_params.extend(keyset_params)
+
+    sql = select_sql.format(
+        where=" AND ".join(conditions),
+        order=keyset_order_sql(sort_key, backwards=backwards),
+    )
+    return sql, query_params + [per_page + 1], backwards
+
+
+def keyset_result(rows, sort_key, per_page, has_cursor, backwards):
+    """Lignes brutes (per_page + 1 max, dans l'ordre de la requête) ->
+    (rows, has_prev, has_next, first_cursor, last_cursor)."""
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = has_cursor, has_more
+
+    def row_cursor(row):
+        return encode_cursor(row[f"_k{i}"] for i in range(len(sort_key)))
+
+    first_cursor = row_cursor(rows[0]) if rows else None
+    last_cursor = row_cursor(rows[-1]) if rows else None
+    return rows, has_prev, has_next, first_cursor, last_cursor
+
+
+def keyset_page(cur, select_sql, where_sql, params, sort_key, per_page, after=None, before=None):
+    """Exécute une page keyset (voir keyset_query / keyset_result)."""
+    sql, query_params, backwards = keyset_query(
+        select_sql, where_sql, params, sort_key, per_page, after=after, before=before
+    )
+    cur.execute(sql, query_params)
+    return keyset_result(
+        cur.fetchall(), sort_key, per_page, after is not None, backwards
+    )
+
+
+def keyset_select_columns(sort_key) -> str:
+    return ", ".join(f"{expr} AS _k{i}" for i, (expr, _direction) in enumerate(sort_key))
+
+
+# Totaux des explorateurs admin : mis en cache quelques instants plutôt que
+# recomptés à chaque page. LRU borné : au-delà de la limite, seuls les totaux
+# les moins récemment lus sont oubliés.
+_COUNT_CACHE = OrderedDict()
+_COUNT_CACHE_MAX_ENTRIES = 256
+_COUNT_CACHE_LOCK = threading.Lock()
+
+
+def cached_count(cur, sql, params, ttl=None):
+    ttl = app.config.get("ADMIN_COUNT_CACHE_TTL", 60) if ttl is None else ttl
+    key = (sql, tuple(params))
+    now = time.monotonic()
+    with _COUNT_CACHE_LOCK:
+        cached = _COUNT_CACHE.get(key)
+        if cached and cached[0] > now:
+            _COUNT_CACHE.move_to_end(key)
+            return cached[1]
+        _COUNT_CACHE.pop(key, None)
+    cur.execute(sql, params)
+    total = cur.fetchone()[0]
+    with _COUNT_CACHE_LOCK:
+        _COUNT_CACHE[key] = (now + ttl, total)
+        while len(_COUNT_CACHE) > _COUNT_CACHE_MAX_ENTRIES:
+            _COUNT_CACHE.popitem(last=False)
+    return total
+
+
 def mask_ip(ip_value: str) -> str:
     """Masque les IP dans l'admin pour limiter l'exposition de données personnelles."""
     if not ip_value:
@@ -240,6 +548,148 @@ def inject_admin_logout_form():
     return {}
 
 
+# Version du schéma applicatif, stockée dans PRAGMA user_version.
+# À incrémenter à chaque évolution de init_db_schema().
+SCHEMA_VERSION = 10
+
+# RECHERCHE : index plein texte FTS5 (rowid = sites.id), synchronisé par triggers.
+# remove_diacritics 2 => "Étang" == "etang" ; le tiret sépare les tokens
+# ("Saint-Denis" => saint + denis).
+_SITES_FTS_COLUMNS = "nom, description, categorie, ville, lien"
+_SITES_FTS_VALUES = """
+        new.id,
+        new.nom,
+        COALESCE(new.description, ''),
+        COALESCE((SELECT nom FROM categories WHERE id = new.category_id), ''),
+        COALESCE((SELECT nom FROM villes WHERE id = new.ville_id), ''),
+        COALESCE(new.lien, '')
+"""
+SITES_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS sites_fts USING fts5(
+        {_SITES_FTS_COLUMNS},
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sites_fts_ai AFTER INSERT ON sites BEGIN
+        INSERT INTO sites_fts (rowid, {_SITES_FTS_COLUMNS}) VALUES ({_SITES_FTS_VALUES});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sites_fts_ad AFTER DELETE ON sites BEGIN
+        DELETE FROM sites_fts WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sites_fts_au
+    AFTER UPDATE OF nom, description, category_id, ville_id, lien ON sites BEGIN
+        DELETE FROM sites_fts WHERE rowid = old.id;
+        INSERT INTO sites_fts (rowid, {_SITES_FTS_COLUMNS}) VALUES ({_SITES_FTS_VALUES});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS categories_fts_au AFTER UPDATE OF nom ON categories BEGIN
+        UPDATE sites_fts SET categorie = new.nom
+        WHERE rowid IN (SELECT id FROM sites WHERE category_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS villes_fts_au AFTER UPDATE OF nom ON villes BEGIN
+        UPDATE sites_fts SET ville = new.nom
+        WHERE rowid IN (SELECT id FROM sites WHERE ville_id = new.id);
+    END
+    """,
+]
+
+# PERFORMANCE : compteur de version des données publiques (ETag / Last-Modified),
+# incrémenté par triggers : toute écriture (web, CLI, import) le fait avancer.
+# Les clics (click_count) n'y touchent pas : voir PAGE_REVALIDATE_WINDOW.
+_DATA_VERSION_BUMP = (
+    "UPDATE data_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;"
+)
+DATA_VERSION_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL,
+        updated_at DATETIME NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO data_version (id, version, updated_at) VALUES (1, 1, CURRENT_TIMESTAMP)",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sites_version_ai AFTER INSERT ON sites BEGIN {_DATA_VERSION_BUMP} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sites_version_ad AFTER DELETE ON sites BEGIN {_DATA_VERSION_BUMP} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sites_version_au
+    AFTER UPDATE OF nom, lien, description, category_id, ville_id, status, en_vedette, date_ajout
+    ON sites BEGIN {_DATA_VERSION_BUMP} END
+    """,
+]
+DATA_VERSION_DDL += [
+    f"CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} "
+    f"AFTER {event} ON {table} BEGIN {_DATA_VERSION_BUMP} END"
+    for table in ("categories", "villes")
+    for suffix, event in (("ai", "INSERT"), ("ad", "DELETE"), ("au", "UPDATE"))
+]
+
+
+def rebuild_sites_fts(cur):
+    """Reconstruit entièrement l'index plein texte depuis sites/categories/villes."""
+    cur.execute("DELETE FROM sites_fts")
+    cur.execute(
+        f"""
+        INSERT INTO sites_fts (rowid, {_SITES_FTS_COLUMNS})
+        SELECT
+            s.id,
+            s.nom,
+            COALESCE(s.description, ''),
+            COALESCE(c.nom, ''),
+            COALESCE(v.nom, ''),
+            COALESCE(s.lien, '')
+        FROM sites s
+        LEFT JOIN categories c ON c.id = s.category_id
+        LEFT JOIN villes v ON v.id = s.ville_id
+        """
+    )
+
+
+def backfill_canonical_urls(cur):
+    """Renseigne sites.lien_canonique pour les lignes qui n'en ont pas.
+
+    Un lien déjà présent garde sa clé sur le site publié (puis le plus
+    ancien) ; les doublons historiques restent à NULL et sont signalés aux
+    modérateurs.
+    """
+    claimed = {
+        row[0]
+        for row in cur.execute("SELECT lien_canonique FROM sites WHERE lien_canonique IS NOT NULL")
+    }
+    updates = []
+    rows = cur.execute(
+        """
+        SELECT id, lien FROM sites
+        WHERE lien_canonique IS NULL
+        ORDER BY status = 'valide' DESC, id ASC
+        """
+    ).fetchall()
+    for site_id, lien in rows:
+        key = canonical_url(lien)
+        if key and key not in claimed:
+            claimed.add(key)
+            updates.append((key, site_id))
+    cur.executemany("UPDATE sites SET lien_canonique = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+def get_schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
 def init_db_schema(conn):
     """Initialise et migre le schéma de la base si nécessaire."""
     cur = conn.cursor()
@@ -279,6 +729,9 @@ def init_db_schema(conn):
     if "category_id" not in columns:
         cur.execute("ALTER TABLE sites ADD COLUMN category_id INTEGER")
 
+    if "lien_canonique" not in columns:
+        cur.execute("ALTER TABLE sites ADD COLUMN lien_canonique TEXT")
+
     # ======================
     # TABLE SITE_CLICKS
     # ======================
@@ -367,11 +820,105 @@ def init_db_schema(conn):
     cur.execute("CREATE INDEX IF NOT EXISTS idx_sites_category_id ON sites(category_id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_sites_click_count ON sites(click_count)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_sites_ville_id ON sites(ville_id)")
+    # Détection des doublons : une sonde d'index par soumission.
+    backfill_canonical_urls(cur)
+    cur.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_sites_lien_canonique ON sites(lien_canonique)"
+    )
     cur.execute("CREATE INDEX IF NOT EXISTS idx_site_clicks_site_id ON site_clicks(site_id)")
     cur.execute("CREATE INDEX IF NOT EXISTS idx_site_clicks_clicked_at ON site_clicks(clicked_at)")
+    # Listes publiques : parcours dans l'ordre de l'index, sans tri de toute la table.
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sites_status_recent "
+        "ON sites(status, COALESCE(date_ajout, ''), id)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_sites_status_clicks "
+        "ON sites(status, COALESCE(click_count, 0), id)"
+    )
+
+    # ======================
+    # AGRÉGATS JOURNALIERS DES CLICS
+    # ======================
+    for statement in CLICK_ROLLUP_DDL:
+        cur.execute(statement)
+    cur.execute("PRAGMA table_info(site_click_daily)")
+    if "visitors" not in [col[1] for col in cur.fetchall()]:
+        cur.execute("ALTER TABLE site_click_daily ADD COLUMN visitors BLOB")
+
+    # ======================
+    # BOÎTE D'ENVOI DES EMAILS
+    # ======================
+    for statement in EMAIL_OUTBOX_DDL:
+        cur.execute(statement)
+
+    # ======================
+    # VERSION DES DONNÉES (REVALIDATION HTTP)
+    # ======================
+    for statement in DATA_VERSION_DDL:
+        cur.execute(statement)
+
+    # ======================
+    # INSTANTANÉ DES TENDANCES
+    # ======================
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS trends_snapshot (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            computed_at DATETIME NOT NULL,
+            payload TEXT NOT NULL
+        )
+    """)
 
+    # ======================
+    # RECHERCHE PLEIN TEXTE (FTS5)
+    # ======================
+    try:
+        for statement in SITES_FTS_DDL:
+            cur.execute(statement)
+        rebuild_sites_fts(cur)
+    except sqlite3.OperationalError as e:
+        # SQLite compilé sans FTS5 : la recherche retombe sur LIKE.
+        app.logger.warning(f"FTS5 indisponible, recherche en mode LIKE: {e}")
+
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
     conn.commit()
 
+    # Hors de la transaction du schéma : valide sa propre transaction.
+    rebuild_click_rollups(conn)
+
+
+def ensure_db_schema():
+    """Applique init_db_schema() une seule fois par process, si la base est en retard.
+
+    Appelée par migrate.py (et `python app.py` en local) : ni l'import du module
+    ni le chemin des requêtes n'exécutent de DDL. Retourne True si le schéma a été
+    mis à jour ; une erreur SQLite est journalisée puis relevée (migration en échec).
+    """
+    try:
+        conn = get_db_connection()
+    except sqlite3.Error as e:
+        app.logger.error(f"Initialisation du schéma impossible: {e}")
+        raise
+
+    try:
+        # Le mode de journal est persistant dans le fichier : réglé une fois ici.
+        journal_mode = str(app.config.get("SQLITE_JOURNAL_MODE", "WAL")).upper()
+        if journal_mode in _SQLITE_JOURNAL_MODES:
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+
+        current_version = get_schema_version(conn)
+        if current_version >= SCHEMA_VERSION:
+            return False
+        app.logger.warning(f"Mise à jour du schéma SQLite v{current_version} -> v{SCHEMA_VERSION}")
+        init_db_schema(conn)
+        return True
+    except sqlite3.Error as e:
+        conn.rollback()
+        app.logger.error(f"Erreur lors de l'initialisation du schéma: {e}")
+        raise
+    finally:
+        conn.close()
+
 # GESTION D'ERREURS : Pages d'erreur personnalisées
 @app.errorhandler(404)
 def page_not_found(e):
@@ -389,6 +936,187 @@ def handle_csrf_error(e):
     flash("Session expirée ou formulaire invalide. Réessaie.", "error")
     return redirect(request.referrer or url_for("accueil"))
 
+# PERFORMANCE : cache de pages complètes pour les visiteurs anonymes (page_cache.py).
+# None si PAGE_CACHE_ENABLED=false. Fraîcheur : chaque entrée garde la version
+# data_version de son rendu, comparée à chaque accès (les écritures admin n'ont
+# rien à purger). Les étiquettes ne servent qu'au contenu hors data_version
+# (instantané des tendances).
+PAGE_CACHE = create_page_cache(app.config, logger=app.logger)
+
+
+def page_cache_allowed():
+    if PAGE_CACHE is None or request.method not in ("GET", "HEAD"):
+        return False
+    # Admin connecté ou message flash en attente : la page est personnalisée.
+    return not session.get("admin_authenticated") and not session.get("_flashes")
+
+
+def invalidate_page_cache(*tags):
+    """Invalide les pages étiquetées (contenu hors data_version) ; sans argument, vide tout le cache."""
+    if PAGE_CACHE is None:
+        return
+    if tags:
+        PAGE_CACHE.invalidate(tags)
+    else:
+        PAGE_CACHE.clear()
+
+
+# Le jeton CSRF signé n'est jamais stocké : remplacé par ce marqueur au remplissage,
+# puis par le jeton de la session du visiteur à chaque service.
+CSRF_PLACEHOLDER = b"\x00csrf_token\x00"
+
+
+def _page_data_version():
+    """Version des données pour la page en cours (déjà lue par answer_conditional_page)."""
+    if "page_validators" in g:
+        return g.page_validators[0]
+    return get_data_version(get_read_db())[0]
+
+
+def _page_cache_response(entry):
+    response = make_response(b"", entry["status"])
+    response.mimetype = entry["mimetype"]
+    if entry.get("csrf"):
+        # Page avec formulaire : corps identity seul, nginx compresse la réponse.
+        token = generate_csrf().encode()
+        response.set_data(entry["bodies"]["identity"].replace(CSRF_PLACEHOLDER, token))
+    else:
+        _set_encoded_body(response, entry["bodies"])
+    response.headers["X-Page-Cache"] = "HIT"
+    return response
+
+
+def _set_encoded_body(response, bodies):
+    """Corps précompressé choisi selon Accept-Encoding."""
+    encoding, body = select_body(bodies, request.accept_encodings)
+    response.set_data(body)
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+
+
+def cached_page(*tags):
+    """Sert la page depuis PAGE_CACHE (clé : URL complète) pour les visiteurs anonymes."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not page_cache_allowed():
+                return view(*args, **kwargs)
+            key = request.url
+            version = _page_data_version()
+            entry = PAGE_CACHE.get(key)
+            # Entrée antérieure à la dernière écriture sur sites/categories/villes
+            # (quel que soit le worker) : rendue à nouveau puis remplacée.
+            if entry is not None and entry.get("version") == version:
+                return _page_cache_response(entry)
+
+            response = make_response(view(*args, **kwargs))
+            if (
+                response.status_code == 200
+                and response.mimetype == "text/html"
+                and not response.is_streamed
+                and not session.get("_flashes")
+            ):
+                body = response.get_data()
+                signed_token = g.get(app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token"))
+                if signed_token:
+                    bodies = {"identity": body.replace(signed_token.encode(), CSRF_PLACEHOLDER)}
+                else:
+                    bodies = compress_bodies(body)
+                    _set_encoded_body(response, bodies)
+                PAGE_CACHE.set(
+                    key,
+                    {
+                        "status": response.status_code,
+                        "mimetype": response.mimetype,
+                        "version": version,
+                        "csrf": bool(signed_token),
+                        "bodies": bodies,
+                    },
+                    tags,
+                )
+                response.headers["X-Page-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
+
+
+# PERFORMANCE : revalidation HTTP (If-None-Match) des pages
+# publiques. Le validateur ne dépend que de la version des données, des gabarits
+# déployés, d'une fenêtre de temps (ordre par clics, tendances) et du jeton CSRF
+# de la session (formulaire de proposition intégré) : un 304 est renvoyé avant
+# toute requête de vue et tout rendu de gabarit.
+CONDITIONAL_PAGE_ENDPOINTS = {
+    "accueil",
+    "voir_categorie",
+    "villes_index",
+    "voir_ville",
+    "most_visited_categories",
+    "most_visited_sites",
+    "recently_added_sites",
+    "trends",
+    "search",
+    "faq",
+    "blog",
+    "legal_notices",
+}
+
+
+def _templates_stamp():
+    """Empreinte des gabarits déployés : un nouveau déploiement change les ETag."""
+    digest = zlib.crc32(b"")
+    for root, _dirs, files in os.walk(app.jinja_loader.searchpath[0]):
+        for name in sorted(files):
+            stat = os.stat(os.path.join(root, name))
+            digest = zlib.crc32(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode(), digest)
+    return f"{digest:08x}"
+
+
+TEMPLATES_STAMP = _templates_stamp()
+
+
+def get_data_version(conn):
+    """(version, date UTC de la dernière écriture) du compteur data_version."""
+    row = conn.execute("SELECT version, updated_at FROM data_version WHERE id = 1").fetchone()
+    if row is None:
+        return 0, datetime(1970, 1, 1, tzinfo=timezone.utc)
+    updated_at = datetime.strptime(row["updated_at"], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return row["version"], updated_at
+
+
+def _page_etag(version, window):
+    csrf_token = session.get(app.config.get("WTF_CSRF_FIELD_NAME", "csrf_token"))
+    csrf_part = hashlib.sha256(csrf_token.encode()).hexdigest()[:8] if csrf_token else "0"
+    return f"{version}-{TEMPLATES_STAMP}-{window}-{csrf_part}"
+
+
+@app.before_request
+def answer_conditional_page():
+    if (
+        request.endpoint not in CONDITIONAL_PAGE_ENDPOINTS
+        or request.method not in ("GET", "HEAD")
+        or session.get("admin_authenticated")
+        or session.get("_flashes")
+    ):
+        return None
+
+    version, updated_at = get_data_version(get_read_db())
+    window_seconds = max(int(app.config.get("PAGE_REVALIDATE_WINDOW", 300)), 1)
+    window = int(time.time()) // window_seconds
+    window_start = datetime.fromtimestamp(window * window_seconds, tz=timezone.utc)
+    g.page_validators = (version, window, max(updated_at, window_start))
+
+    # If-Modified-Since seul n'est pas honoré : Last-Modified ignore le jeton CSRF
+    # du formulaire intégré, seul l'ETag le couvre.
+    etag = _page_etag(version, window)
+    if not request.if_none_match or not request.if_none_match.contains_weak(etag):
+        return None
+    response = make_response("", 304)
+    response.set_etag(etag, weak=True)
+    response.last_modified = g.page_validators[2]
+    return response
+
+
 # PERFORMANCE : Headers de cache pour les réponses
 @app.after_request
 def add_cache_headers(response):
@@ -397,13 +1125,24 @@ def add_cache_headers(response):
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     elif request.endpoint == 'static':
         response.headers['Cache-Control'] = 'public, max-age=31536000'
-    elif request.endpoint in ['accueil', 'voir_categorie']:
-        # Pages dynamiques : cache court
-        response.headers['Cache-Control'] = 'public, max-age=300'  # 5 minutes
+    elif request.endpoint in CONDITIONAL_PAGE_ENDPOINTS:
+        # Revalidation systématique : un 304 ne coûte qu'une lecture de data_version.
+        # private : l'ETag dépend du jeton CSRF de la session.
+        response.headers['Cache-Control'] = 'private, no-cache'
     elif request.endpoint == 'website_submission_form':
         # Formulaires : pas de cache
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     
+    if (
+        "page_validators" in g
+        and response.status_code == 200
+        and response.mimetype == "text/html"
+        and not session.get("_flashes")
+    ):
+        version, window, last_modified = g.page_validators
+        response.set_etag(_page_etag(version, window), weak=True)
+        response.last_modified = last_modified
+
     # SÉCURITÉ : Headers de sécurité
     response.headers['X-Content-Type-Options'] = 'nosniff'
     response.headers['X-Frame-Options'] = 'DENY'
@@ -448,115 +1187,74 @@ app.jinja_env.filters["format_date"] = format_date
 
 
 # SÉCURITÉ : Récupère les sites pré-sélectionnés avec gestion d'erreurs
-def get_sites_en_vedette():
-    """Récupère les catégories triées par clics + sites vedette (sinon top clics)."""
-    conn = get_db_connection()
-    if not conn:
-        return {}, {}
+def get_sites_en_vedette(per_category=3):
+    """Récupère les catégories triées par clics + sites vedette (sinon top clics).
+
+    Une seule requête fenêtrée : ne remonte que les sites affichés (au plus
+    `per_category` par catégorie), avec les agrégats de la catégorie.
+    """
+    conn = get_read_db()
 
     try:
         cur = conn.cursor()
-
-        # Catégories triées par popularité (somme des clics)
-        cur.execute(
-            """
-            SELECT
-                c.nom AS categorie,
-                COUNT(*) AS site_count,
-                COALESCE(SUM(s.click_count), 0) AS total_clicks
-            FROM sites s
-            JOIN categories c ON c.id = s.category_id
-            WHERE s.status = 'valide'
-            GROUP BY c.id, c.nom
-            ORDER BY total_clicks DESC, site_count DESC, c.nom COLLATE NOCASE ASC
-            """
-        )
-        cat_rows = cur.fetchall()
-
-        data = {row["categorie"]: [] for row in cat_rows}
-        category_stats = {
-            row["categorie"]: {
-                "site_count": row["site_count"],
-                "total_clicks": row["total_clicks"],
-            }
-            for row in cat_rows
-        }
-
-        # 1) Sites en vedette (si présents dans la catégorie)
         cur.execute(
             """
-            SELECT
-                s.*,
-                c.nom AS categorie,
-                v.nom AS ville,
-                v.nom AS ville_nom,
-                v.slug AS ville_slug
-            FROM sites s
-            JOIN categories c ON c.id = s.category_id
-            LEFT JOIN villes v ON v.id = s.ville_id
-            WHERE s.status = 'valide' AND s.en_vedette = 1
-            ORDER BY c.nom ASC, s.click_count DESC, s.date_ajout DESC
-            """
+            WITH ranked AS (
+                SELECT
+                    s.*,
+                    c.nom AS categorie,
+                    v.nom AS ville,
+                    v.nom AS ville_nom,
+                    v.slug AS ville_slug,
+                    COUNT(*) OVER cat AS site_count,
+                    COALESCE(SUM(s.click_count) OVER cat, 0) AS total_clicks,
+                    MAX(COALESCE(s.en_vedette, 0)) OVER cat AS has_featured,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY s.category_id
+                        ORDER BY
+                            COALESCE(s.en_vedette, 0) DESC,
+                            COALESCE(s.click_count, 0) DESC,
+                            COALESCE(s.date_ajout, '') DESC,
+                            s.id DESC
+                    ) AS rang
+                FROM sites s
+                JOIN categories c ON c.id = s.category_id
+                LEFT JOIN villes v ON v.id = s.ville_id
+                WHERE s.status = 'valide'
+                WINDOW cat AS (PARTITION BY s.category_id)
+            )
+            SELECT *
+            FROM ranked
+            -- Vedettes d'abord : si la catégorie en a, on n'affiche qu'elles.
+            WHERE rang <= ?
+              AND (has_featured = 0 OR COALESCE(en_vedette, 0) = 1)
+            ORDER BY total_clicks DESC, site_count DESC, categorie COLLATE NOCASE ASC, rang ASC
+            """,
+            (per_category,),
         )
-        featured_by_category = {cat: [] for cat in data}
-        for site in cur.fetchall():
-            cat = site["categorie"]
-            if cat in featured_by_category:
-                featured_by_category[cat].append(site)
 
-        # 2) Fallback: sites les plus cliqués par catégorie (tous les sites valides)
-        cur.execute(
-            """
-            SELECT
-                s.*,
-                c.nom AS categorie,
-                v.nom AS ville,
-                v.nom AS ville_nom,
-                v.slug AS ville_slug
-            FROM sites s
-            JOIN categories c ON c.id = s.category_id
-            LEFT JOIN villes v ON v.id = s.ville_id
-            WHERE s.status = 'valide'
-            ORDER BY c.nom ASC, s.click_count DESC, s.date_ajout DESC
-            """
-        )
-        top_by_category = {cat: [] for cat in data}
+        data = {}
+        category_stats = {}
         for site in cur.fetchall():
             cat = site["categorie"]
-            if cat in top_by_category:
-                top_by_category[cat].append(site)
-
-        for cat in data:
-            featured_sites = sorted(
-                featured_by_category[cat],
-                key=lambda s: ((s["click_count"] or 0), (s["date_ajout"] or "")),
-                reverse=True,
-            )
-            if featured_sites:
-                data[cat] = featured_sites[:3]
-                continue
-
-            data[cat] = sorted(
-                top_by_category[cat],
-                key=lambda s: ((s["click_count"] or 0), (s["date_ajout"] or "")),
-                reverse=True,
-            )[:3]
-
+            if cat not in data:
+                data[cat] = []
+                category_stats[cat] = {
+                    "site_count": site["site_count"],
+                    "total_clicks": site["total_clicks"],
+                }
+            data[cat].append(site)
 
         return data, category_stats
 
     except sqlite3.Error as e:
         app.logger.error(f"Erreur lors de la récupération des sites en vedette: {e}")
         return {}, {}
-    finally:
-        conn.close()
 
 # SÉCURITÉ : Récupère les derniers sites avec gestion d'erreurs
 def get_derniers_sites_global(limit=3):
     """Récupère les derniers sites ajoutés"""
-    conn = get_db_connection()
-    if not conn:
-        return []
+    conn = get_read_db()
     
     try:
         cur = conn.cursor()
@@ -580,15 +1278,11 @@ def get_derniers_sites_global(limit=3):
     except sqlite3.Error as e:
         app.logger.error(f"Erreur lors de la récupération des derniers sites: {e}")
         return []
-    finally:
-        conn.close()
 
 
 
 def get_top_sites(limit=5):
-    conn = get_db_connection()
-    if not conn:
-        return []
+    conn = get_read_db()
 
     try:
         cur = conn.cursor()
@@ -610,8 +1304,6 @@ def get_top_sites(limit=5):
     except sqlite3.Error as e:
         app.logger.error(f"Erreur top sites: {e}")
         return []
-    finally:
-        conn.close()
 
 
 
@@ -622,9 +1314,7 @@ def get_categories():
     if has_request_context() and hasattr(g, "_categories_cache"):
         return g._categories_cache
 
-    conn = get_db_connection()
-    if not conn:
-        return []
+    conn = get_read_db()
     
     try:
         cur = conn.cursor()
@@ -664,8 +1354,6 @@ def get_categories():
     except sqlite3.Error as e:
         app.logger.error(f"Erreur lors de la récupération des catégories: {e}")
         return []
-    finally:
-        conn.close()
 
 
 def get_city_choices():
@@ -674,9 +1362,7 @@ def get_city_choices():
         return g._city_choices_cache
 
     choices = [("", "Non précisée")]
-    conn = get_db_connection()
-    if not conn:
-        return choices
+    conn = get_read_db()
 
     try:
         cur = conn.cursor()
@@ -687,8 +1373,6 @@ def get_city_choices():
                 choices.append((nom, nom))
     except sqlite3.Error as e:
         app.logger.error(f"Erreur lors du chargement des villes: {e}")
-    finally:
-        conn.close()
 
     if has_request_context():
         g._city_choices_cache = choices
@@ -793,6 +1477,44 @@ def resolve_city(cursor, city_name):
     return None
 
 
+def find_site_by_url(cursor, lien, exclude_id=None):
+    """Site déjà référencé sous ce lien (id, nom, status) ou None."""
+    key = canonical_url(lien)
+    if not key:
+        return None
+    cursor.execute(
+        "SELECT id, nom, status FROM sites WHERE lien_canonique = ? AND id IS NOT ?",
+        (key, exclude_id),
+    )
+    return cursor.fetchone()
+
+
+def find_duplicate_sites(cursor, sites):
+    """{site_id: site déjà référencé} pour les sites dont le lien appartient à un autre.
+
+    Seuls les doublons historiques (lien_canonique NULL) sont concernés :
+    l'index unique empêche d'en créer de nouveaux.
+    """
+    keys = {}
+    for site in sites:
+        if site["lien_canonique"] is None:
+            key = canonical_url(site["lien"])
+            if key:
+                keys.setdefault(key, []).append(site["id"])
+    if not keys:
+        return {}
+    placeholders = ",".join("?" for _ in keys)
+    cursor.execute(
+        f"SELECT id, nom, status, lien_canonique FROM sites WHERE lien_canonique IN ({placeholders})",
+        list(keys),
+    )
+    duplicates = {}
+    for row in cursor.fetchall():
+        for site_id in keys[row["lien_canonique"]]:
+            duplicates[site_id] = row
+    return duplicates
+
+
 #obtenir le nom de la categorie depuis le slug 
 def get_nom_categorie_depuis_slug(slug):
     categories_slug = get_categories_slug()
@@ -839,10 +1561,7 @@ def admin_logout():
 @app.route("/admin", methods=["GET"])
 @admin_required
 def admin_dashboard():
-    conn = get_db_connection()
-    if not conn:
-        flash("Impossible de se connecter à la base de données.", "error")
-        return redirect(url_for("accueil"))
+    conn = get_read_db()
 
     try:
         cur = conn.cursor()
@@ -854,6 +1573,7 @@ def admin_dashboard():
                 c.nom AS categorie,
                 v.nom AS ville,
                 s.lien,
+                s.lien_canonique,
                 s.description,
                 s.status,
                 s.date_ajout
@@ -865,6 +1585,7 @@ def admin_dashboard():
             """
         )
         pending_sites = cur.fetchall()
+        duplicate_sites = find_duplicate_sites(cur, pending_sites)
 
         cur.execute(
             "SELECT status, COUNT(*) as total FROM sites GROUP BY status"
@@ -874,9 +1595,8 @@ def admin_dashboard():
         app.logger.error(f"Erreur lors de la récupération des propositions: {e}")
         flash("Erreur lors de la récupération des propositions.", "error")
         pending_sites = []
+        duplicate_sites = {}
         stats_rows = []
-    finally:
-        conn.close()
 
     stats = {row["status"]: row["total"] for row in stats_rows}
 
@@ -888,11 +1608,16 @@ def admin_dashboard():
         form.return_to.data = current_path
         action_forms[site["id"]] = form
 
+    bulk_form = BulkModerationForm()
+    bulk_form.return_to.data = current_path
+
     return render_template(
         "admin/dashboard.html",
         pending_sites=pending_sites,
+        duplicate_sites=duplicate_sites,
         stats=stats,
         action_forms=action_forms,
+        bulk_form=bulk_form,
         admin_username=session.get("admin_username"),
     )
 
@@ -900,10 +1625,7 @@ def admin_dashboard():
 @app.route("/admin/sites", methods=["GET"])
 @admin_required
 def admin_sites():
-    conn = get_db_connection()
-    if not conn:
-        flash("Impossible de se connecter à la base de données.", "error")
-        return redirect(url_for("admin_dashboard"))
+    conn = get_read_db()
 
     status_filter = (request.args.get("status") or "all").strip()
     city_filter = (request.args.get("city") or "all").strip()
@@ -913,13 +1635,14 @@ def admin_sites():
     per_page = 50
 
     allowed_status = {"all", "valide", "en_attente", "refuse"}
+    # Clés de tri keyset : COALESCE pour que les NULL restent comparables.
     allowed_sorts = {
-        "date_desc": "s.date_ajout DESC, s.id DESC",
-        "date_asc": "s.date_ajout ASC, s.id ASC",
-        "clicks_desc": "s.click_count DESC, s.id DESC",
-        "clicks_asc": "s.click_count ASC, s.id ASC",
-        "name_asc": "s.nom COLLATE NOCASE ASC, s.id DESC",
-        "name_desc": "s.nom COLLATE NOCASE DESC, s.id DESC",
+        "date_desc": [("COALESCE(s.date_ajout, '')", "DESC"), ("s.id", "DESC")],
+        "date_asc": [("COALESCE(s.date_ajout, '')", "ASC"), ("s.id", "ASC")],
+        "clicks_desc": [("COALESCE(s.click_count, 0)", "DESC"), ("s.id", "DESC")],
+        "clicks_asc": [("COALESCE(s.click_count, 0)", "ASC"), ("s.id", "ASC")],
+        "name_asc": [("s.nom COLLATE NOCASE", "ASC"), ("s.id", "DESC")],
+        "name_desc": [("s.nom COLLATE NOCASE", "DESC"), ("s.id", "DESC")],
     }
 
     if status_filter not in allowed_status:
@@ -929,6 +1652,12 @@ def admin_sites():
     if len(query_text) > 120:
         query_text = query_text[:120]
 
+    sort_key = allowed_sorts[sort_filter]
+    after = decode_cursor(request.args.get("after"), len(sort_key))
+    before = decode_cursor(request.args.get("before"), len(sort_key))
+    if after is None and before is None:
+        page = 1
+
     try:
         cur = conn.cursor()
         cur.execute("SELECT nom, slug FROM villes ORDER BY nom COLLATE NOCASE ASC")
@@ -965,7 +1694,6 @@ def admin_sites():
             params.extend([like, like, like, like, like])
 
         where_sql = " AND ".join(where_clauses)
-        sort_sql = allowed_sorts[sort_filter]
 
         count_sql = f"""
             SELECT COUNT(*) AS total
@@ -974,13 +1702,8 @@ def admin_sites():
             LEFT JOIN villes v ON v.id = s.ville_id
             WHERE {where_sql}
         """
-        cur.execute(count_sql, params)
-        total_sites = cur.fetchone()["total"]
-
+        total_sites = cached_count(cur, count_sql, params)
         total_pages = max((total_sites + per_page - 1) // per_page, 1)
-        if page > total_pages:
-            page = total_pages
-        offset = (page - 1) * per_page
 
         query_sql = f"""
             SELECT
@@ -994,26 +1717,30 @@ def admin_sites():
                 s.status,
                 s.date_ajout,
                 s.en_vedette,
-                s.click_count
+                s.click_count,
+                {keyset_select_columns(sort_key)}
             FROM sites s
             LEFT JOIN categories c ON c.id = s.category_id
             LEFT JOIN villes v ON v.id = s.ville_id
-            WHERE {where_sql}
-            ORDER BY {sort_sql}
-            LIMIT ? OFFSET ?
+            WHERE {{where}}
+            ORDER BY {{order}}
+            LIMIT ?
         """
-        cur.execute(query_sql, params + [per_page, offset])
-        all_sites = cur.fetchall()
+        all_sites, has_prev, has_next, first_cursor, last_cursor = keyset_page(
+            cur, query_sql, where_sql, params, sort_key, per_page, after=after, before=before
+        )
+        visitors_30d = unique_visitors_by_site(conn, [site["id"] for site in all_sites])
     except sqlite3.Error as e:
         app.logger.error(f"Erreur lors de la récupération des sites: {e}")
         flash("Erreur lors du chargement des sites.", "error")
         all_sites = []
+        visitors_30d = {}
         cities = []
         total_sites = 0
         total_pages = 1
         page = 1
-    finally:
-        conn.close()
+        has_prev = has_next = False
+        first_cursor = last_cursor = None
 
     current_path = request.full_path.rstrip("?")
     action_forms = {}
@@ -1026,6 +1753,7 @@ def admin_sites():
     return render_template(
         "admin/sites.html",
         sites=all_sites,
+        visitors_30d=visitors_30d,
         action_forms=action_forms,
         cities=cities,
         status_filter=status_filter,
@@ -1033,98 +1761,205 @@ def admin_sites():
         query_text=query_text,
         sort_filter=sort_filter,
         page=page,
-        total_pages=total_pages,
+        total_pages=max(total_pages, page),
         total_sites=total_sites,
+        has_prev=has_prev,
+        has_next=has_next,
+        prev_cursor=first_cursor,
+        next_cursor=last_cursor,
         admin_username=session.get("admin_username"),
     )
 
 
-@app.route("/admin/clicks", methods=["GET"])
-@admin_required
-def admin_clicks():
-    conn = get_db_connection()
-    if not conn:
-        flash("Impossible de se connecter à la base de données.", "error")
-        return redirect(url_for("admin_dashboard"))
+def unique_visitors_by_site(conn, site_ids, days=30):
+    """Visiteurs uniques estimés (croquis HyperLogLog fusionnés) par site."""
+    if not site_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in site_ids)
+    rows = conn.execute(
+        f"""
+        SELECT site_id, hll_count(hll_union(visitors)) AS visitors
+        FROM site_click_daily
+        WHERE day >= date('now', ?)
+          AND site_id IN ({placeholders})
+        GROUP BY site_id
+        """,
+        [f"-{days - 1} days", *site_ids],
+    ).fetchall()
+    return {row["site_id"]: row["visitors"] for row in rows}
 
-    query_text = (request.args.get("q") or "").strip()
-    sort_filter = (request.args.get("sort") or "newest").strip()
-    days_filter = parse_positive_int(request.args.get("days"), default=30)
-    page = parse_positive_int(request.args.get("page"), default=1)
-    per_page = 100
 
-    if len(query_text) > 120:
-        query_text = query_text[:120]
+def click_archive_dir():
+    return app.config.get("CLICK_ARCHIVE_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(app.config["DATABASE_PATH"])), "archives"
+    )
+
+
+def archived_clicks_page(months, count_sql, select_sql, where_sql, params, sort_key, per_page, after, before):
+    """Page keyset sur site_clicks + archives mensuelles.
+
+    SQLite n'attache que MAX_ATTACHED bases par connexion : les archives sont
+    interrogées par paquets (sur une connexion dédiée), chaque paquet renvoie
+    au plus per_page + 1 lignes, puis les lignes sont fusionnées selon la clé.
+    """
+    total = 0
+    candidates = []
+    backwards = False
+    for start in range(0, max(len(months), 1), MAX_ATTACHED):
+        conn = get_db_connection(readonly=True)
+        try:
+            aliases = attach_archives(conn, click_archive_dir(), months[start:start + MAX_ATTACHED])
+            source = click_source_sql(aliases, include_live=(start == 0))
+            cur = conn.cursor()
+            total += cached_count(cur, count_sql.format(source=source, where=where_sql), params)
+            sql, query_params, backwards = keyset_query(
+                select_sql.format(source=source), where_sql, params, sort_key, per_page, after=after, before=before
+            )
+            cur.execute(sql, query_params)
+            candidates.extend(cur.fetchall())
+        finally:
+            conn.close()
+
+    # Clé homogène (clicked_at, id) : un seul sens de tri à appliquer.
+    descending = (sort_key[0][1] == "DESC") != backwards
+    candidates.sort(key=lambda row: tuple(row[f"_k{i}"] for i in range(len(sort_key))), reverse=descending)
+    rows, has_prev, has_next, first_cursor, last_cursor = keyset_result(
+        candidates[:per_page + 1], sort_key, per_page, after is not None, backwards
+    )
+    return total, rows, has_prev, has_next, first_cursor, last_cursor
+
+
+# Filtres communs à l'explorateur de clics et à son export.
+def parse_click_filters(args):
+    query_text = (args.get("q") or "").strip()[:120]
+    sort_filter = (args.get("sort") or "newest").strip()
+    days_filter = parse_positive_int(args.get("days"), default=30)
+    ua_filter = (args.get("ua") or "all").strip()
+
     if sort_filter not in {"newest", "oldest"}:
         sort_filter = "newest"
     if days_filter not in {1, 7, 30, 90, 365}:
         days_filter = 30
+    if ua_filter != "all" and ua_filter not in CATEGORY_LABELS:
+        ua_filter = "all"
+    return {"q": query_text, "sort": sort_filter, "days": days_filter, "ua": ua_filter}
 
-    try:
-        cur = conn.cursor()
-        where_clauses = [
-            "sc.clicked_at >= datetime('now', ?)"
-        ]
-        params = [f"-{days_filter} days"]
 
-        if query_text:
-            like = f"%{query_text}%"
-            where_clauses.append(
-                """
-                (
-                    s.nom LIKE ?
-                    OR COALESCE(c.nom, '') LIKE ?
-                    OR COALESCE(v.nom, '') LIKE ?
-                    OR s.lien LIKE ?
-                    OR sc.user_agent LIKE ?
-                )
-                """
+def click_filters_where(filters):
+    """(where_sql, params) sur les alias sc, s, c, v de CLICK_LOG_FROM."""
+    where_clauses = [
+        "sc.clicked_at >= datetime('now', ?)"
+    ]
+    params = [f"-{filters['days']} days"]
+
+    if filters["q"]:
+        like = f"%{filters['q']}%"
+        where_clauses.append(
+            """
+            (
+                s.nom LIKE ?
+                OR COALESCE(c.nom, '') LIKE ?
+                OR COALESCE(v.nom, '') LIKE ?
+                OR s.lien LIKE ?
+                OR sc.user_agent LIKE ?
             )
-            params.extend([like, like, like, like, like])
+            """
+        )
+        params.extend([like, like, like, like, like])
 
-        where_sql = " AND ".join(where_clauses)
-        sort_sql = "sc.clicked_at DESC, sc.id DESC" if sort_filter == "newest" else "sc.clicked_at ASC, sc.id ASC"
+    if filters["ua"] != "all":
+        where_clauses.append("ua_category(sc.user_agent) = ?")
+        params.append(filters["ua"])
 
-        cur.execute(
-            f"""
-            SELECT COUNT(*) AS total
-            FROM site_clicks sc
-            JOIN sites s ON s.id = sc.site_id
-            LEFT JOIN categories c ON c.id = s.category_id
-            LEFT JOIN villes v ON v.id = s.ville_id
-            WHERE {where_sql}
-            """,
-            params,
-        )
-        total_clicks = cur.fetchone()["total"]
-        total_pages = max((total_clicks + per_page - 1) // per_page, 1)
-        if page > total_pages:
-            page = total_pages
-        offset = (page - 1) * per_page
+    return " AND ".join(where_clauses), params
 
-        cur.execute(
-            f"""
+
+def click_sort_key(filters):
+    direction = "DESC" if filters["sort"] == "newest" else "ASC"
+    return [("sc.clicked_at", direction), ("sc.id", direction)]
+
+
+def click_archive_months(days_filter):
+    """Archives mensuelles à attacher pour une période (aucune dans la rétention)."""
+    if days_filter <= app.config.get("CLICK_RETENTION_DAYS", 30):
+        return []
+    since_month = (datetime.now(timezone.utc) - timedelta(days=days_filter)).strftime("%Y-%m")
+    return list_archive_months(click_archive_dir(), since_month)
+
+
+# {source} : site_clicks ou sous-requête live + archives (click_source_sql).
+CLICK_LOG_FROM = """
+    FROM {source} sc
+    JOIN sites s ON s.id = sc.site_id
+    LEFT JOIN categories c ON c.id = s.category_id
+    LEFT JOIN villes v ON v.id = s.ville_id
+"""
+
+
+@app.route("/admin/clicks", methods=["GET"])
+@admin_required
+def admin_clicks():
+    conn = get_read_db()
+
+    filters = parse_click_filters(request.args)
+    page = parse_positive_int(request.args.get("page"), default=1)
+    per_page = 100
+
+    sort_key = click_sort_key(filters)
+    after = decode_cursor(request.args.get("after"), len(sort_key))
+    before = decode_cursor(request.args.get("before"), len(sort_key))
+    if after is None and before is None:
+        page = 1
+
+    try:
+        cur = conn.cursor()
+        where_sql, params = click_filters_where(filters)
+
+        count_sql = "SELECT COUNT(*) AS total" + CLICK_LOG_FROM + "WHERE {where}"
+        select_sql = f"""
             SELECT
                 sc.id,
                 sc.site_id,
                 sc.ip_address,
                 sc.user_agent,
                 sc.clicked_at,
+                sc.archived,
                 s.nom AS site_nom,
                 c.nom AS categorie,
                 v.nom AS ville,
-                s.status
-            FROM site_clicks sc
-            JOIN sites s ON s.id = sc.site_id
-            LEFT JOIN categories c ON c.id = s.category_id
-            LEFT JOIN villes v ON v.id = s.ville_id
-            WHERE {where_sql}
-            ORDER BY {sort_sql}
-            LIMIT ? OFFSET ?
-            """,
-            params + [per_page, offset],
-        )
-        rows = cur.fetchall()
+                s.status,
+                {keyset_select_columns(sort_key)}
+            {CLICK_LOG_FROM}
+            WHERE {{{{where}}}}
+            ORDER BY {{{{order}}}}
+            LIMIT ?
+        """
+
+        archive_months = click_archive_months(filters["days"])
+        if not archive_months:
+            source = click_source_sql([])
+            total_clicks = cached_count(cur, count_sql.format(source=source, where=where_sql), params)
+            rows, has_prev, has_next, first_cursor, last_cursor = keyset_page(
+                cur,
+                select_sql.format(source=source),
+                where_sql,
+                params,
+                sort_key,
+                per_page,
+                after=after,
+                before=before,
+            )
+        else:
+            total_clicks, rows, has_prev, has_next, first_cursor, last_cursor = archived_clicks_page(
+                archive_months, count_sql, select_sql, where_sql, params, sort_key, per_page, after, before
+            )
+        total_pages = max((total_clicks + per_page - 1) // per_page, 1)
+
+        # Visiteurs uniques sur la période, tous sites confondus (union des croquis).
+        unique_visitors = cur.execute(
+            "SELECT hll_count(hll_union(visitors)) FROM site_click_daily WHERE day >= date('now', ?)",
+            (f"-{filters['days'] - 1} days",),
+        ).fetchone()[0]
 
         click_events = []
         delete_forms = {}
@@ -1132,6 +1967,7 @@ def admin_clicks():
         for row in rows:
             row_dict = dict(row)
             row_dict["ip_masked"] = mask_ip(row["ip_address"])
+            row_dict["ua_category"] = classify_user_agent(row["user_agent"])
             click_events.append(row_dict)
             delete_forms[row["id"]] = DeleteClickForm(click_id=str(row["id"]))
 
@@ -1142,26 +1978,175 @@ def admin_clicks():
         delete_forms = {}
         current_path = url_for("admin_clicks")
         total_clicks = 0
+        unique_visitors = 0
         total_pages = 1
         page = 1
-    finally:
-        conn.close()
+        has_prev = has_next = False
+        first_cursor = last_cursor = None
 
     return render_template(
         "admin/clicks.html",
         click_events=click_events,
         delete_forms=delete_forms,
-        query_text=query_text,
-        sort_filter=sort_filter,
-        days_filter=days_filter,
+        query_text=filters["q"],
+        sort_filter=filters["sort"],
+        days_filter=filters["days"],
+        ua_filter=filters["ua"],
+        ua_categories=CATEGORY_LABELS,
         page=page,
-        total_pages=total_pages,
+        total_pages=max(total_pages, page),
         total_clicks=total_clicks,
+        unique_visitors=unique_visitors,
+        has_prev=has_prev,
+        has_next=has_next,
+        prev_cursor=first_cursor,
+        next_cursor=last_cursor,
         return_to=current_path,
         admin_username=session.get("admin_username"),
     )
 
 
+# Export du journal des clics : générateurs sur le curseur, mémoire constante.
+CLICK_EXPORT_COLUMNS = [
+    "id",
+    "clicked_at",
+    "site_id",
+    "site_nom",
+    "categorie",
+    "ville",
+    "ip_masked",
+    "user_agent",
+    "ua_category",
+    "archived",
+]
+
+
+def iter_click_log(filters):
+    """Lignes filtrées et triées du journal (table vive + archives éventuelles)."""
+    where_sql, params = click_filters_where(filters)
+    sort_key = click_sort_key(filters)
+    select_sql = f"""
+        SELECT
+            sc.id,
+            sc.clicked_at,
+            sc.site_id,
+            s.nom AS site_nom,
+            c.nom AS categorie,
+            v.nom AS ville,
+            sc.ip_address,
+            sc.user_agent,
+            sc.archived
+        {CLICK_LOG_FROM}
+        WHERE {where_sql}
+        ORDER BY {keyset_order_sql(sort_key)}
+    """
+
+    archive_months = click_archive_months(filters["days"])
+    if not archive_months:
+        yield from get_read_db().execute(select_sql.format(source=click_source_sql([])), params)
+        return
+
+    # Un curseur par paquet d'archives (limite d'ATTACH), fusionnés sur la clé de tri.
+    connections = []
+    try:
+        cursors = []
+        for start in range(0, len(archive_months), MAX_ATTACHED):
+            conn = get_db_connection(readonly=True)
+            connections.append(conn)
+            aliases = attach_archives(conn, click_archive_dir(), archive_months[start:start + MAX_ATTACHED])
+            source = click_source_sql(aliases, include_live=(start == 0))
+            cursors.append(conn.execute(select_sql.format(source=source), params))
+        yield from heapq.merge(
+            *cursors,
+            key=lambda row: (row["clicked_at"] or "", row["id"]),
+            reverse=(sort_key[0][1] == "DESC"),
+        )
+    finally:
+        for conn in connections:
+            conn.close()
+
+
+def iter_click_records(filters):
+    for row in iter_click_log(filters):
+        yield {
+            "id": row["id"],
+            "clicked_at": row["clicked_at"],
+            "site_id": row["site_id"],
+            "site_nom": row["site_nom"],
+            "categorie": row["categorie"],
+            "ville": row["ville"],
+            "ip_masked": mask_ip(row["ip_address"]),
+            "user_agent": row["user_agent"],
+            "ua_category": classify_user_agent(row["user_agent"]),
+            "archived": row["archived"],
+        }
+
+
+def iter_csv(records, columns, flush_every=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM : Excel ouvre ainsi le fichier en UTF-8.
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    for count, record in enumerate(records, start=1):
+        writer.writerow([record[column] for column in columns])
+        if count % flush_every == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def iter_ndjson(records, flush_every=500):
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        if len(lines) >= flush_every:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_gzip(chunks, level=6):
+    """Compression gzip à la volée d'un flux de texte."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@app.route("/admin/clicks/export", methods=["GET"])
+@admin_required
+def admin_clicks_export():
+    filters = parse_click_filters(request.args)
+    export_format = "ndjson" if request.args.get("format") == "ndjson" else "csv"
+    compress = request.args.get("gzip") == "1"
+
+    records = iter_click_records(filters)
+    if export_format == "csv":
+        body = iter_csv(records, CLICK_EXPORT_COLUMNS)
+        mimetype = "text/csv"
+    else:
+        body = iter_ndjson(records)
+        mimetype = "application/x-ndjson"
+
+    filename = f"clics-{filters['days']}j-{datetime.now().strftime('%Y%m%d-%H%M')}.{export_format}"
+    if compress:
+        body = iter_gzip(body)
+        mimetype = "application/gzip"
+        filename += ".gz"
+
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    response.headers["Cache-Control"] = "no-store"
+    # Pas de mise en tampon côté reverse proxy (nginx) : l'export part au fil de l'eau.
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
 @app.route("/admin/clicks/<int:click_id>/delete", methods=["POST"])
 @admin_required
 def admin_delete_click(click_id):
@@ -1182,14 +2167,11 @@ def admin_delete_click(click_id):
     if not is_safe_next_url(return_to):
         return_to = url_for("admin_clicks")
 
-    conn = get_db_connection()
-    if not conn:
-        flash("Impossible de se connecter à la base de données.", "error")
-        return redirect(return_to)
+    conn = get_db()
 
     try:
         cur = conn.cursor()
-        cur.execute("SELECT site_id FROM site_clicks WHERE id = ?", (click_id,))
+        cur.execute("SELECT site_id, date(clicked_at) AS day FROM site_clicks WHERE id = ?", (click_id,))
         click_row = cur.fetchone()
         if not click_row:
             flash("Clic introuvable.", "error")
@@ -1210,14 +2192,14 @@ def admin_delete_click(click_id):
             """,
             (site_id,),
         )
+        if click_row["day"]:
+            apply_click_rollups(conn, {(site_id, click_row["day"]): -1})
         conn.commit()
         flash("Événement de clic supprimé.", "success")
     except sqlite3.Error as e:
         conn.rollback()
         app.logger.error(f"Erreur lors de la suppression du clic {click_id}: {e}")
         flash("Erreur lors de la suppression du clic.", "error")
-    finally:
-        conn.close()
 
     return redirect(return_to)
 
@@ -1225,10 +2207,7 @@ def admin_delete_click(click_id):
 @app.route("/admin/categories", methods=["GET"])
 @admin_required
 def admin_categories():
-    conn = get_db_connection()
-    if not conn:
-        flash("Impossible de se connecter à la base de données.", "error")
-        return redirect(url_for("admin_dashboard"))
+    conn = get_read_db()
 
     try:
         cur = conn.cursor()
@@ -1244,8 +2223,6 @@ def admin_categories():
         app.logger.error(f"Erreur lors de la récupération des catégories: {e}")
         flash("Erreur lors du chargement des catégories.", "error")
         categories = []
-    finally:
-        conn.close()
 
     delete_forms = {cat["id"]: DeleteCategoryForm(category_id=str(cat["id"])) for cat in categories}
 
@@ -1262,17 +2239,13 @@ def admin_categories():
 def admin_create_category():
     form = CategoryForm()
     if form.validate_on_submit():
-        conn = get_db_connection()
-        if not conn:
-            flash("Impossible de se connecter à la base de données.", "error")
-            return redirect(url_for("admin_categories"))
+        conn = get_db()
         try:
             cur = conn.cursor()
             # Vérifie unicité du nom
             cur.execute("SELECT id FROM categories WHERE nom = ?", (form.nom.data,))
             if cur.fetchone():
                 flash("Cette catégorie existe déjà.", "error")
-                conn.close()
                 return redirect(url_for("admin_categories"))
 
             slug = generate_unique_category_slug(cur, form.nom.data)
@@ -1281,14 +2254,13 @@ def admin_create_category():
                 (form.nom.data, slug),
             )
             conn.commit()
+            invalidate_search_index()
             flash("Catégorie créée.", "success")
             return redirect(url_for("admin_categories"))
         except sqlite3.Error as e:
             conn.rollback()
             app.logger.error(f"Erreur lors de la création d'une catégorie: {e}")
             flash("Erreur lors de la création de la catégorie.", "error")
-        finally:
-            conn.close()
 
     return render_template(
         "admin/edit_category.html",
@@ -1303,10 +2275,7 @@ def admin_create_category():
 @admin_required
 def admin_edit_category(category_id):
     form = CategoryForm()
-    conn = get_db_connection()
-    if not conn:
-        flash("Impossible de se connecter à la base de données.", "error")
-        return redirect(url_for("admin_categories"))
+    conn = get_db()
 
     try:
         cur = conn.cursor()
@@ -1316,13 +2285,11 @@ def admin_edit_category(category_id):
         )
         category = cur.fetchone()
     except sqlite3.Error as e:
-        conn.close()
         app.logger.error(f"Erreur lors du chargement de la catégorie {category_id}: {e}")
         flash("Impossible de charger la catégorie.", "error")
         return redirect(url_for("admin_categories"))
 
     if not category:
-        conn.close()
         flash("Catégorie introuvable.", "error")
         return redirect(url_for("admin_categories"))
 
@@ -1336,7 +2303,6 @@ def admin_edit_category(category_id):
             )
             if cur.fetchone():
                 flash("Une autre catégorie porte déjà ce nom.", "error")
-                conn.close()
                 return redirect(url_for("admin_categories"))
 
             slug = generate_unique_category_slug(cur, form.nom.data, exclude_id=category_id)
@@ -1345,17 +2311,15 @@ def admin_edit_category(category_id):
                 (form.nom.data, slug, category_id),
             )
             conn.commit()
+            invalidate_search_index()
             flash("Catégorie mise à jour.", "success")
-            conn.close()
             return redirect(url_for("admin_categories"))
         except sqlite3.Error as e:
             conn.rollback()
-            conn.close()
             app.logger.error(f"Erreur lors de la mise à jour de la catégorie {category_id}: {e}")
             flash("Erreur lors de la mise à jour.", "error")
             return redirect(url_for("admin_categories"))
 
-    conn.close()
     return render_template(
         "admin/edit_category.html",
         form=form,
@@ -1381,10 +2345,7 @@ def admin_delete_category(category_id):
     if category_id != category_id_form:
         abort(400)
 
-    conn = get_db_connection()
-    if not conn:
-        flash("Impossible de se connecter à la base de données.", "error")
-        return redirect(url_for("admin_categories"))
+    conn = get_db()
 
     try:
         cur = conn.cursor()
@@ -1392,7 +2353,6 @@ def admin_delete_category(category_id):
         row = cur.fetchone()
         if not row:
             flash("Catégorie introuvable.", "error")
-            conn.close()
             return redirect(url_for("admin_categories"))
 
         cur.execute(
@@ -1406,22 +2366,45 @@ def admin_delete_category(category_id):
         usage = cur.fetchone()["total"]
         if usage > 0:
             flash("Impossible de supprimer : des sites utilisent encore cette catégorie.", "error")
-            conn.close()
             return redirect(url_for("admin_categories"))
 
         cur.execute("DELETE FROM categories WHERE id = ?", (category_id,))
         conn.commit()
+        invalidate_search_index()
         flash("Catégorie supprimée.", "success")
     except sqlite3.Error as e:
         conn.rollback()
         app.logger.error(f"Erreur lors de la suppression de la catégorie {category_id}: {e}")
         flash("Erreur lors de la suppression.", "error")
-    finally:
-        conn.close()
 
     return redirect(url_for("admin_categories"))
 
 
+# Action de modération -> (requête paramétrée par l'id, message unitaire, message groupé).
+MODERATION_ACTIONS = {
+    "approve": (
+        "UPDATE sites SET status = 'valide', date_ajout = DATETIME('now') WHERE id = ?",
+        "Proposition validée et publiée.",
+        "{count} proposition(s) validée(s) et publiée(s).",
+    ),
+    "reject": (
+        "UPDATE sites SET status = 'refuse' WHERE id = ?",
+        "Proposition refusée.",
+        "{count} proposition(s) refusée(s).",
+    ),
+    "pending": (
+        "UPDATE sites SET status = 'en_attente' WHERE id = ?",
+        "Statut remis en attente.",
+        "{count} proposition(s) remise(s) en attente.",
+    ),
+    "delete": (
+        "DELETE FROM sites WHERE id = ?",
+        "Proposition supprimée.",
+        "{count} proposition(s) supprimée(s).",
+    ),
+}
+
+
 @app.route("/admin/propositions/<int:site_id>", methods=["POST"])
 @admin_required
 def admin_update_site(site_id):
@@ -1441,63 +2424,121 @@ def admin_update_site(site_id):
         abort(400)
 
     action = request.form.get("action")
-    if action not in {"approve", "reject", "delete", "pending"}:
+    if action not in MODERATION_ACTIONS:
         flash("Action inconnue.", "error")
         return redirect(return_to)
 
-    conn = get_db_connection()
-    if not conn:
-        flash("Impossible d'accéder à la base de données.", "error")
-        return redirect(return_to)
+    conn = get_db()
 
-    message = ""
+    sql, message, _bulk_message = MODERATION_ACTIONS[action]
     try:
         cur = conn.cursor()
-        if action == "approve":
-            cur.execute(
-                "UPDATE sites SET status = 'valide', date_ajout = DATETIME('now') WHERE id = ?",
-                (site_id,),
-            )
-            message = "Proposition validée et publiée."
-        elif action == "reject":
-            cur.execute(
-                "UPDATE sites SET status = 'refuse' WHERE id = ?",
-                (site_id,),
-            )
-            message = "Proposition refusée."
-        elif action == "pending":
-            cur.execute(
-                "UPDATE sites SET status = 'en_attente' WHERE id = ?",
-                (site_id,),
-            )
-            message = "Statut remis en attente."
-        else:
-            cur.execute("DELETE FROM sites WHERE id = ?", (site_id,))
-            message = "Proposition supprimée."
+        cur.execute(sql, (site_id,))
 
         if cur.rowcount == 0:
             flash("Proposition introuvable.", "error")
             conn.rollback()
         else:
             conn.commit()
+            invalidate_search_index()
             flash(message, "success")
     except sqlite3.Error as e:
         conn.rollback()
         app.logger.error(f"Erreur lors de la mise à jour de la proposition {site_id}: {e}")
         flash("Erreur lors de la mise à jour de la proposition.", "error")
-    finally:
-        conn.close()
 
     return redirect(return_to)
 
 
+BULK_MODERATION_MAX_IDS = 500
+
+
+def apply_bulk_moderation(conn, action, site_ids):
+    """Applique une action à plusieurs sites dans une seule transaction.
+
+    Retourne {site_id: "ok" | "introuvable"} ; lève sqlite3.Error après rollback.
+    """
+    sql = MODERATION_ACTIONS[action][0]
+    placeholders = ", ".join("?" for _ in site_ids)
+    try:
+        existing = {
+            row["id"]
+            for row in conn.execute(f"SELECT id FROM sites WHERE id IN ({placeholders})", site_ids)
+        }
+        conn.executemany(sql, [(site_id,) for site_id in site_ids if site_id in existing])
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return {site_id: "ok" if site_id in existing else "introuvable" for site_id in site_ids}
+
+
+@app.route("/admin/propositions/bulk", methods=["POST"])
+@admin_required
+def admin_bulk_moderation():
+    form = BulkModerationForm()
+    wants_json = request.accept_mimetypes.best == "application/json"
+    return_to = form.return_to.data if is_safe_next_url(form.return_to.data or "") else url_for("admin_dashboard")
+
+    site_ids = []
+    for raw_id in request.form.getlist("site_ids"):
+        try:
+            site_id = int(raw_id)
+        except (TypeError, ValueError):
+            continue
+        if site_id > 0 and site_id not in site_ids:
+            site_ids.append(site_id)
+
+    error = None
+    if not form.validate_on_submit():
+        app.logger.warning(f"Modération groupée formulaire invalide: {form.errors}")
+        error = "Formulaire invalide."
+    elif not site_ids:
+        error = "Aucune proposition sélectionnée."
+    elif len(site_ids) > BULK_MODERATION_MAX_IDS:
+        error = f"{BULK_MODERATION_MAX_IDS} propositions maximum par lot."
+    if error:
+        if wants_json:
+            return jsonify({"error": error}), 400
+        flash(error, "error")
+        return redirect(return_to)
+
+    action = form.action.data
+    conn = get_db()
+    try:
+        results = apply_bulk_moderation(conn, action, site_ids)
+    except sqlite3.Error as e:
+        app.logger.error(f"Erreur lors de la modération groupée ({action}, {len(site_ids)} sites): {e}")
+        if wants_json:
+            return jsonify({"error": "Erreur lors de la modération groupée."}), 500
+        flash("Erreur lors de la modération groupée.", "error")
+        return redirect(return_to)
+
+    updated = [site_id for site_id, result in results.items() if result == "ok"]
+    missing = [site_id for site_id, result in results.items() if result != "ok"]
+    if updated:
+        # Une seule invalidation pour tout le lot.
+        invalidate_search_index()
+    app.logger.info(f"[MODÉRATION] {action} x{len(updated)} (introuvables: {missing or 'aucun'})")
+
+    if wants_json:
+        return jsonify({
+            "action": action,
+            "updated": len(updated),
+            "results": [{"id": site_id, "result": result} for site_id, result in results.items()],
+        })
+
+    if updated:
+        flash(MODERATION_ACTIONS[action][2].format(count=len(updated)), "success")
+    if missing:
+        flash("Propositions introuvables : " + ", ".join(f"#{site_id}" for site_id in missing), "error")
+    return redirect(return_to)
+
+
 @app.route("/admin/propositions/<int:site_id>/edit", methods=["GET", "POST"])
 @admin_required
 def admin_edit_site(site_id):
-    conn = get_db_connection()
-    if not conn:
-        flash("Impossible de se connecter à la base de données.", "error")
-        return redirect(url_for("admin_dashboard"))
+    conn = get_db()
 
     try:
         cur = conn.cursor()
@@ -1522,13 +2563,11 @@ def admin_edit_site(site_id):
         )
         site = cur.fetchone()
     except sqlite3.Error as e:
-        conn.close()
         app.logger.error(f"Erreur lors de la récupération du site {site_id}: {e}")
         flash("Impossible de charger la proposition.", "error")
         return redirect(url_for("admin_dashboard"))
 
     if not site:
-        conn.close()
         flash("Proposition introuvable.", "error")
         return redirect(url_for("admin_dashboard"))
 
@@ -1559,45 +2598,40 @@ def admin_edit_site(site_id):
             form.categorie.choices.append((current_category, current_category))
         form.categorie.data = current_category
     elif form.validate_on_submit():
-        conn_to_update = get_db_connection()
-        if not conn_to_update:
-            flash("Impossible de se connecter à la base de données.", "error")
-            conn.close()
-            return redirect(url_for("admin_dashboard"))
         # Sécurise la catégorie envoyée (doit exister)
         if form.categorie.data not in [choice[0] for choice in form.categorie.choices if choice[0]]:
             flash("Catégorie non valide.", "error")
-            conn.close()
-            conn_to_update.close()
             return redirect(url_for("admin_dashboard"))
         try:
-            cur_update = conn_to_update.cursor()
+            cur_update = conn.cursor()
+            existing = find_site_by_url(cur_update, form.lien.data, exclude_id=site_id)
+            if existing and canonical_url(form.lien.data) != canonical_url(site["lien"]):
+                flash(f"Ce lien est déjà référencé (#{existing['id']}, statut : {existing['status']}).", "error")
+                return redirect(url_for("admin_edit_site", site_id=site_id))
             resolved = resolve_category(cur_update, form.categorie.data)
             if not resolved:
                 flash("Catégorie non valide.", "error")
-                conn_to_update.rollback()
-                conn_to_update.close()
-                conn.close()
+                conn.rollback()
                 return redirect(url_for("admin_dashboard"))
             resolved_category_id, _resolved_category_name = resolved
             resolved_city = resolve_city(cur_update, form.ville.data)
             if (form.ville.data or "").strip() and not resolved_city:
                 flash("Ville non valide.", "error")
-                conn_to_update.rollback()
-                conn_to_update.close()
-                conn.close()
+                conn.rollback()
                 return redirect(url_for("admin_dashboard"))
             resolved_city_id = resolved_city[0] if resolved_city else None
             cur_update.execute(
                 """
                 UPDATE sites
-                SET nom = ?, ville_id = ?, lien = ?, description = ?, category_id = ?, status = ?, en_vedette = ?
+                SET nom = ?, ville_id = ?, lien = ?, lien_canonique = ?, description = ?, category_id = ?, status = ?, en_vedette = ?
                 WHERE id = ?
                 """,
                 (
                     form.nom.data,
                     resolved_city_id,
                     form.lien.data,
+                    # Doublon historique inchangé : reste sans clé.
+                    None if existing else canonical_url(form.lien.data),
                     form.description.data,
                     resolved_category_id,
                     form.status.data,
@@ -1607,24 +2641,20 @@ def admin_edit_site(site_id):
             )
             if cur_update.rowcount == 0:
                 flash("La mise à jour a échoué : proposition introuvable.", "error")
-                conn_to_update.rollback()
+                conn.rollback()
             else:
-                conn_to_update.commit()
+                conn.commit()
+                invalidate_search_index()
                 flash("Proposition mise à jour avec succès.", "success")
-            conn_to_update.close()
-            conn.close()
             return redirect(url_for("admin_dashboard"))
         except sqlite3.Error as e:
-            conn_to_update.rollback()
-            conn_to_update.close()
-            conn.close()
+            conn.rollback()
             app.logger.error(f"Erreur lors de la mise à jour du site {site_id}: {e}")
             flash("Erreur lors de la mise à jour.", "error")
             return redirect(url_for("admin_dashboard"))
     else:
         flash("Formulaire invalide.", "error")
 
-    conn.close()
     return render_template(
         "admin/edit_site.html",
         form=form,
@@ -1657,12 +2687,13 @@ def admin_create_site():
         if form.categorie.data not in [choice[0] for choice in form.categorie.choices if choice[0]]:
             flash("Catégorie non valide.", "error")
             return redirect(url_for("admin_create_site"))
-        conn = get_db_connection()
-        if not conn:
-            flash("Impossible de se connecter à la base de données.", "error")
-            return redirect(url_for("admin_dashboard"))
+        conn = get_db()
         try:
             cur = conn.cursor()
+            existing = find_site_by_url(cur, form.lien.data)
+            if existing:
+                flash(f"Ce lien est déjà référencé (#{existing['id']}, statut : {existing['status']}).", "error")
+                return redirect(url_for("admin_edit_site", site_id=existing["id"]))
             resolved = resolve_category(cur, form.categorie.data)
             if not resolved:
                 flash("Catégorie non valide.", "error")
@@ -1675,13 +2706,14 @@ def admin_create_site():
             resolved_city_id = resolved_city[0] if resolved_city else None
             cur.execute(
                 """
-                INSERT INTO sites (nom, ville_id, lien, description, category_id, status, date_ajout, en_vedette)
-                VALUES (?, ?, ?, ?, ?, ?, DATETIME('now'), ?)
+                INSERT INTO sites (nom, ville_id, lien, lien_canonique, description, category_id, status, date_ajout, en_vedette)
+                VALUES (?, ?, ?, ?, ?, ?, ?, DATETIME('now'), ?)
                 """,
                 (
                     form.nom.data,
                     resolved_city_id,
                     form.lien.data,
+                    canonical_url(form.lien.data),
                     form.description.data,
                     resolved_category_id,
                     form.status.data or "valide",
@@ -1689,14 +2721,13 @@ def admin_create_site():
                 ),
             )
             conn.commit()
+            invalidate_search_index()
             flash(f"Nouveau site ajouté (statut : {form.status.data}).", "success")
             return redirect(url_for("admin_dashboard"))
         except sqlite3.Error as e:
             conn.rollback()
             app.logger.error(f"Erreur lors de la création d'un site depuis l'admin: {e}")
             flash("Erreur lors de l'ajout du site.", "error")
-        finally:
-            conn.close()
 
     return render_template(
         "admin/edit_site.html",
@@ -1709,7 +2740,58 @@ def admin_create_site():
         subtitle="Complète les champs pour publier le site instantanément.",
     )
 
+@app.route("/admin/propositions/import", methods=["GET", "POST"])
+@admin_required
+def admin_import_sites():
+    form = SiteImportForm()
+    report = None
+
+    if form.validate_on_submit():
+        upload = form.fichier.data
+        max_bytes = app.config.get("SITE_IMPORT_MAX_BYTES", 2 * 1024 * 1024)
+        # Lecture bornée : un fichier trop gros n'est ni chargé en entier ni analysé.
+        data = upload.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            flash(f"Fichier trop volumineux (maximum {max_bytes // 1024} Ko).", "error")
+            return redirect(url_for("admin_import_sites"))
+        try:
+            records = parse_import_file(data, upload.filename or "")
+        except ValueError as e:
+            flash(str(e), "error")
+            return redirect(url_for("admin_import_sites"))
+
+        conn = get_db()
+        try:
+            report = import_sites(
+                conn,
+                records,
+                category_slug=slugify,
+                city_slug=slugify_ville,
+                default_status=form.status.data,
+                dry_run=form.dry_run.data,
+            )
+        except sqlite3.Error as e:
+            app.logger.error(f"Erreur lors de l'import de sites: {e}")
+            flash("Erreur lors de l'import, aucun site n'a été ajouté.", "error")
+            return redirect(url_for("admin_import_sites"))
+
+        if not report["dry_run"] and report["created"]:
+            invalidate_search_index()
+            app.logger.info(
+                f"Import admin: {report['created']} sites ajoutés, "
+                f"{len(report['duplicates'])} doublons, {len(report['errors'])} erreurs"
+            )
+
+    return render_template(
+        "admin/import_sites.html",
+        form=form,
+        report=report,
+        admin_username=session.get("admin_username"),
+    )
+
+
 @app.route("/")
+@cached_page()
 def accueil():
     data, category_stats = get_sites_en_vedette()
     derniers_sites = get_derniers_sites_global(3)
@@ -1730,6 +2812,7 @@ def accueil():
 
 
 @app.route("/categorie/<slug>")
+@cached_page()
 def voir_categorie(slug):
     #stocke le nom sans slug
     nom_categorie = get_nom_categorie_depuis_slug(slug)
@@ -1743,9 +2826,7 @@ def voir_categorie(slug):
     if slug != canonical_slug:
         return redirect(url_for('voir_categorie', slug=canonical_slug), code=301)
 
-    conn = get_db_connection()
-    if not conn:
-        return render_template("500.html"), 500
+    conn = get_read_db()
     cur = conn.cursor()
     cur.execute("SELECT id FROM categories WHERE nom = ?", (nom_categorie,))
     category_row = cur.fetchone()
@@ -1762,7 +2843,6 @@ def voir_categorie(slug):
        ORDER BY en_vedette DESC, click_count DESC, date_ajout DESC, id DESC 
     """, (category_id,))
     sites = cur.fetchall()
-    conn.close()
 
     # >>> AJOUT SEO : metas dynamiques (utilisées dans categorie.html via les blocks Jinja)
     seo_title = f"{nom_categorie} à La Réunion – Réunion Wiki"
@@ -1798,20 +2878,12 @@ def voir_categorie(slug):
 def redirect_site(site_id):
     app.logger.info(f"[GO] Tentative de redirection pour site_id={site_id}")
 
-    conn = get_db_connection()
-    if not conn:
-        app.logger.error("[GO] Connexion DB impossible")
-        abort(500)
-
     try:
-        cur = conn.cursor()
-
-        # Vérifie que le site existe
-        cur.execute(
+        # Vérifie que le site existe (connexion lecture seule)
+        row = get_read_db().execute(
             "SELECT lien, click_count FROM sites WHERE id = ? AND status = 'valide'",
             (site_id,)
-        )
-        row = cur.fetchone()
+        ).fetchone()
 
         if not row:
             app.logger.warning(f"[GO] Site introuvable ou non valide id={site_id}")
@@ -1824,39 +2896,26 @@ def redirect_site(site_id):
         ip = get_client_ip()
         user_agent = (request.headers.get("User-Agent", "") or "")[:400]
         
-        # Anti-bot simple
-        ua_lower = user_agent.lower()
-        if "bot" in ua_lower or "crawl" in ua_lower or "spider" in ua_lower:
-            app.logger.info(f"[GO] Bot détecté, clic ignoré id={site_id} ua={user_agent}")
+        # Anti-bot : robots déclarés et navigateurs headless exclus ; les user-agents
+        # "suspicious" (vides, courts, clients HTTP) restent comptés comme avant.
+        ua_category = classify_user_agent(user_agent)
+        if ua_category in (BOT, HEADLESS):
+            app.logger.info(f"[GO] Clic ignoré ({ua_category}) id={site_id} ua={user_agent}")
             return redirect(row["lien"])
 
 
-        # Vérifie si cette IP a cliqué ce site dans les 30 dernières minutes
-        cur.execute("""
-            SELECT id FROM site_clicks
-            WHERE site_id = ?
-            AND ip_address = ?
-            AND clicked_at >= datetime('now', '-30 minutes')
-        """, (site_id, ip))
-
-        recent_click = cur.fetchone()
-
-        if not recent_click:
-            # Incrémente compteur
-            cur.execute(
-                "UPDATE sites SET click_count = click_count + 1 WHERE id = ?",
-                (site_id,)
-            )
-
-            # Log clic
-            cur.execute("""
-                INSERT INTO site_clicks (site_id, ip_address, user_agent)
-                VALUES (?, ?, ?)
-            """, (site_id, ip, user_agent))
-
-            conn.commit()
-
-            app.logger.info(f"[GO] Clic validé id={site_id} ip={ip}")
+        # Vérifie si cette IP a cliqué ce site dans les 30 dernières minutes (sans SQLite).
+        # La marque n'est gardée que si le clic est bien mis en file : un clic perdu
+        # (file pleine) ne bloque pas le suivant pendant CLICK_DEDUP_TTL.
+        if CLICK_DEDUP.first_seen(site_id, ip):
+            recorded = False
+            try:
+                recorded = record_click(site_id, ip, user_agent)
+            finally:
+                if not recorded:
+                    CLICK_DEDUP.release(site_id, ip)
+            if recorded:
+                app.logger.info(f"[GO] Clic validé id={site_id} ip={ip}")
         else:
             app.logger.info(f"[GO] Clic ignoré (trop récent) id={site_id} ip={ip}")
 
@@ -1866,37 +2925,88 @@ def redirect_site(site_id):
         app.logger.error(f"[GO] Erreur SQLite site_id={site_id} | {e}")
         abort(500)
 
-    finally:
-        conn.close()
-        app.logger.info(f"[GO] Connexion DB fermée pour site_id={site_id}")
 
 
+# PERFORMANCE : listes publiques complètes, paginées par curseur ou diffusées
+# en flux (?tout=1) en itérant directement le curseur SQLite.
+def render_public_site_list(template_name, select_sql, sort_key):
+    """`select_sql` contient les marqueurs {where} et {order} (sans LIMIT)."""
+    conn = get_read_db()
+    cur = conn.cursor()
+    where_sql = "s.status = 'valide'"
+
+    if request.args.get("tout") == "1":
+        cur.execute(select_sql.format(where=where_sql, order=keyset_order_sql(sort_key)))
+        return stream_template_response(
+            template_name,
+            sites=cur,
+            list_endpoint=request.endpoint,
+            streamed=True,
+            rank_offset=0,
+            has_prev=False,
+            has_next=False,
+        )
+
+    per_page = app.config.get("PUBLIC_LIST_PER_PAGE", 50)
+    page = parse_positive_int(request.args.get("page"), default=1)
+    after = decode_cursor(request.args.get("after"), len(sort_key))
+    before = decode_cursor(request.args.get("before"), len(sort_key))
+    if after is None and before is None:
+        page = 1
+
+    sites, has_prev, has_next, first_cursor, last_cursor = keyset_page(
+        cur, select_sql + " LIMIT ?", where_sql, [], sort_key, per_page, after=after, before=before
+    )
+    if not sites and page > 1:
+        abort(404)
+
+    return render_template(
+        template_name,
+        sites=sites,
+        list_endpoint=request.endpoint,
+        streamed=False,
+        page=page,
+        rank_offset=(page - 1) * per_page,
+        has_prev=has_prev,
+        has_next=has_next,
+        prev_cursor=first_cursor,
+        next_cursor=last_cursor,
+    )
+
+
+def stream_template_response(template_name, **context):
+    """Rendu Jinja envoyé au fil de l'eau (la connexion reste liée à la requête)."""
+    app.update_template_context(context)
+    stream = app.jinja_env.get_template(template_name).stream(context)
+    stream.enable_buffering(20)
+    return Response(stream_with_context(stream), mimetype="text/html")
+
+
+_RECENT_SITES_SORT = [("COALESCE(s.date_ajout, '')", "DESC"), ("s.id", "DESC")]
+_MOST_VISITED_SORT = [("COALESCE(s.click_count, 0)", "DESC"), ("s.id", "DESC")]
+
 
 @app.route("/sites-ajoutes-recemment")
 def recently_added_sites():
-    conn = get_db_connection()
-    if not conn:
-        return render_template("500.html"), 500
-    cur = conn.cursor()
-#recupere tous les sites par ordre descroissant d'ajout
-    cur.execute("""
+#recupere les sites par ordre descroissant d'ajout
+    return render_public_site_list(
+        "recently-added-sites.html",
+        f"""
         SELECT
             s.id,
             s.nom,
             s.lien,
             c.nom AS categorie,
             s.description,
-            s.date_ajout
+            s.date_ajout,
+            {keyset_select_columns(_RECENT_SITES_SORT)}
         FROM sites s
         LEFT JOIN categories c ON c.id = s.category_id
-        WHERE s.status = 'valide'
-        ORDER BY s.date_ajout DESC
-    """)
-    
-    sites = cur.fetchall()
-    conn.close()
-
-    return render_template("recently-added-sites.html", sites=sites)
+        WHERE {{where}}
+        ORDER BY {{order}}
+        """,
+        _RECENT_SITES_SORT,
+    )
 
 
 
@@ -1907,27 +3017,24 @@ def legal_notices():
 
 @app.route("/sites-les-plus-visites")
 def most_visited_sites():
-    conn = get_db_connection()
-    if not conn:
-        return render_template("500.html"), 500
-    cur = conn.cursor()
-    cur.execute("""
+    return render_public_site_list(
+        "most-visited-sites.html",
+        f"""
         SELECT
             s.id,
             s.nom,
             s.lien,
             c.nom AS categorie,
             s.description,
-            s.click_count
+            s.click_count,
+            {keyset_select_columns(_MOST_VISITED_SORT)}
         FROM sites s
         LEFT JOIN categories c ON c.id = s.category_id
-        WHERE s.status = 'valide'
-        ORDER BY s.click_count DESC
-    """)
-    sites = cur.fetchall()
-    conn.close()
-
-    return render_template("most-visited-sites.html", sites=sites)
+        WHERE {{where}}
+        ORDER BY {{order}}
+        """,
+        _MOST_VISITED_SORT,
+    )
 
 
 
@@ -1946,18 +3053,80 @@ def month_name(date_value):
     return mois_fr[dt.month - 1]
 
 
-@app.route("/recherche")
-def search():
-    q = (request.args.get("q") or "").strip()
-    if not q:
-        return redirect(url_for("accueil"))
+# RECHERCHE : abréviations courantes des noms de communes ("st-denis").
+_SEARCH_ABBREVIATIONS = {
+    "st": "saint",
+    "ste": "sainte",
+}
+_SEARCH_MAX_TERMS = 8
+_SEARCH_LIMIT = 100
+# Poids bm25 par colonne : nom, description, categorie, ville, lien
+_SEARCH_BM25_WEIGHTS = "10.0, 2.0, 5.0, 4.0, 1.0"
 
-    conn = get_db_connection()
-    if not conn:
-        return render_template("500.html"), 500
+_HAS_SITES_FTS = None
 
-    cur = conn.cursor()
 
+def search_terms(q: str):
+    """Découpe une requête en termes normalisés ("Saint-Denis" -> saint, denis)."""
+    return re.findall(r"\w+", normalize_text(q))[:_SEARCH_MAX_TERMS]
+
+
+def build_fts_query(q: str) -> str:
+    """Traduit une saisie libre en requête FTS5 (préfixes, tous les termes requis)."""
+    parts = []
+    for term in search_terms(q):
+        alternative = _SEARCH_ABBREVIATIONS.get(term)
+        if alternative:
+            parts.append(f'("{term}"* OR "{alternative}"*)')
+        else:
+            parts.append(f'"{term}"*')
+    return " AND ".join(parts)
+
+
+def has_sites_fts(conn) -> bool:
+    global _HAS_SITES_FTS
+    if _HAS_SITES_FTS is None:
+        _HAS_SITES_FTS = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sites_fts'"
+        ).fetchone() is not None
+    return _HAS_SITES_FTS
+
+
+def _search_sites_fts(cur, q):
+    fts_query = build_fts_query(q)
+    if not fts_query:
+        return []
+    # bm25 est négatif (plus petit = meilleur) : on l'amplifie pour les sites cliqués.
+    cur.execute(
+        f"""
+        SELECT
+            s.id,
+            s.nom,
+            s.lien,
+            v.nom AS ville,
+            c.nom AS categorie,
+            s.description,
+            s.click_count,
+            s.date_ajout
+        FROM sites_fts
+        JOIN sites s ON s.id = sites_fts.rowid
+        LEFT JOIN categories c ON c.id = s.category_id
+        LEFT JOIN villes v ON v.id = s.ville_id
+        WHERE sites_fts MATCH ?
+          AND s.status = 'valide'
+        ORDER BY
+          bm25(sites_fts, {_SEARCH_BM25_WEIGHTS})
+            * (1.0 + 0.2 * log1p(COALESCE(s.click_count, 0))),
+          s.date_ajout DESC
+        LIMIT ?
+        """,
+        (fts_query, _SEARCH_LIMIT),
+    )
+    return cur.fetchall()
+
+
+def _search_sites_like(cur, q):
+    """Recherche historique par LIKE (SQLite sans FTS5)."""
     like = f"%{q}%"
 
     # Normalisation "saint-denis" <-> "saint denis"
@@ -1998,18 +3167,233 @@ def search():
           END,
           s.click_count DESC,
           s.date_ajout DESC
-        LIMIT 100
+        LIMIT ?
         """,
         (
             like, like, like, like, like, like_city,
-            like, like, like, like, like_city, like
+            like, like, like, like, like_city, like,
+            _SEARCH_LIMIT,
         ),
     )
+    return cur.fetchall()
+
+
+def search_sites(conn, q):
+    """Recherche des sites valides : FTS5 si disponible, sinon LIKE."""
+    cur = conn.cursor()
+    if has_sites_fts(conn):
+        try:
+            return _search_sites_fts(cur, q)
+        except sqlite3.OperationalError as e:
+            app.logger.warning(f"Recherche FTS en échec, repli LIKE ({q!r}): {e}")
+    return _search_sites_like(cur, q)
+
+
+# RECHERCHE : index en mémoire (trigrammes + préfixes) reconstruits après
+# modération ou au plus tard après SEARCH_INDEX_TTL secondes (autres workers).
+_SEARCH_INDEX = {"trigram": None, "prefix": None, "built_at": None}
+_SEARCH_INDEX_LOCK = threading.Lock()
+_FUZZY_LIMIT = 20
+_FUZZY_SUGGESTIONS = 5
+_SUGGEST_LIMIT = 8
+_SUGGEST_MAX_QUERY = 80
+
+
+def load_search_entries(conn):
+    """Libellés indexés : sites valides, catégories et villes (avec leurs clics)."""
+    cur = conn.cursor()
+    entries = []
+
+    cur.execute("SELECT id, nom, click_count FROM sites WHERE status = 'valide'")
+    for row in cur.fetchall():
+        entries.append({"kind": "site", "id": row["id"], "label": row["nom"], "clicks": row["click_count"] or 0})
+
+    for kind, table, fk in (("categorie", "categories", "category_id"), ("ville", "villes", "ville_id")):
+        cur.execute(
+            f"""
+            SELECT t.id, t.nom, t.slug, COALESCE(SUM(s.click_count), 0) AS clicks
+            FROM {table} t
+            LEFT JOIN sites s ON s.{fk} = t.id AND s.status = 'valide'
+            GROUP BY t.id, t.nom, t.slug
+            """
+        )
+        for row in cur.fetchall():
+            entries.append(
+                {"kind": kind, "id": row["id"], "label": row["nom"], "slug": row["slug"], "clicks": row["clicks"]}
+            )
+    return entries
 
-    sites = cur.fetchall()
-    conn.close()
 
-    return render_template("search-results.html", q=q, sites=sites)
+def build_search_index(conn):
+    entries = load_search_entries(conn)
+    _SEARCH_INDEX["trigram"] = TrigramIndex(entries)
+    _SEARCH_INDEX["prefix"] = PrefixIndex(entries)
+    _SEARCH_INDEX["built_at"] = time.monotonic()
+
+
+def _search_index_is_stale():
+    built_at = _SEARCH_INDEX["built_at"]
+    return built_at is None or time.monotonic() - built_at > app.config.get("SEARCH_INDEX_TTL", 300)
+
+
+def get_search_index(name="trigram"):
+    """Retourne l'index demandé, reconstruit si invalidé ou trop ancien."""
+    if _search_index_is_stale():
+        with _SEARCH_INDEX_LOCK:
+            if _search_index_is_stale():
+                build_search_index(get_read_db())
+    return _SEARCH_INDEX[name]
+
+
+def invalidate_search_index():
+    """À appeler après toute écriture qui change les sites publiés, catégories ou villes."""
+    _SEARCH_INDEX["built_at"] = None
+
+
+def warm_search_index():
+    """Construit les index au démarrage du worker (hors requête)."""
+    try:
+        conn = get_db_connection(readonly=True)
+    except sqlite3.Error as e:
+        app.logger.error(f"Index de recherche non préchargé: {e}")
+        return
+    try:
+        with _SEARCH_INDEX_LOCK:
+            build_search_index(conn)
+    except sqlite3.Error as e:
+        app.logger.error(f"Index de recherche non préchargé: {e}")
+    finally:
+        conn.close()
+
+
+def _suggestion_url(entry):
+    if entry["kind"] == "categorie":
+        return url_for("voir_categorie", slug=entry["slug"])
+    if entry["kind"] == "ville":
+        return url_for("voir_ville", slug=entry["slug"])
+    return url_for("search", q=entry["label"])
+
+
+def fuzzy_search(conn, q):
+    """Repli sur recherche vide : suggestions "vouliez-vous dire" + sites approchants."""
+    try:
+        matches = get_search_index().search(q, limit=50)
+    except sqlite3.Error as e:
+        app.logger.error(f"Erreur lors de la construction de l'index de recherche: {e}")
+        return [], []
+    if not matches:
+        return [], []
+
+    normalized_q = normalize_text(q).strip()
+    suggestions = []
+    seen_labels = set()
+    for _score, entry in matches:
+        key = normalize_text(entry["label"])
+        if key == normalized_q or key in seen_labels:
+            continue
+        seen_labels.add(key)
+        suggestions.append({"label": entry["label"], "kind": entry["kind"], "url": _suggestion_url(entry)})
+        if len(suggestions) >= _FUZZY_SUGGESTIONS:
+            break
+
+    scores = {"site": {}, "categorie": {}, "ville": {}}
+    for score, entry in matches:
+        scores[entry["kind"]].setdefault(entry["id"], score)
+    # Pour les catégories/villes, seule la meilleure correspondance élargit les résultats.
+    for kind in ("categorie", "ville"):
+        if scores[kind]:
+            best_id = max(scores[kind], key=scores[kind].get)
+            scores[kind] = {best_id: scores[kind][best_id]}
+
+    site_ids = list(scores["site"])[:_FUZZY_LIMIT]
+    category_ids = list(scores["categorie"])
+    city_ids = list(scores["ville"])
+    clauses = []
+    params = []
+    for column, ids in (("s.id", site_ids), ("s.category_id", category_ids), ("s.ville_id", city_ids)):
+        if ids:
+            clauses.append(f"{column} IN ({','.join('?' for _ in ids)})")
+            params.extend(ids)
+
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT
+            s.id,
+            s.nom,
+            s.lien,
+            s.category_id,
+            s.ville_id,
+            v.nom AS ville,
+            c.nom AS categorie,
+            s.description,
+            s.click_count,
+            s.date_ajout
+        FROM sites s
+        LEFT JOIN categories c ON c.id = s.category_id
+        LEFT JOIN villes v ON v.id = s.ville_id
+        WHERE s.status = 'valide'
+          AND ({' OR '.join(clauses)})
+        """,
+        params,
+    )
+
+    def site_score(row):
+        return max(
+            scores["site"].get(row["id"], 0),
+            scores["categorie"].get(row["category_id"], 0),
+            scores["ville"].get(row["ville_id"], 0),
+        )
+
+    sites = sorted(cur.fetchall(), key=lambda row: (-round(site_score(row), 2), -(row["click_count"] or 0)))
+    return suggestions, sites[:_FUZZY_LIMIT]
+
+
+def _suggestion_payload(entry):
+    if entry["kind"] == "site":
+        url = url_for("redirect_site", site_id=entry["id"])
+    else:
+        url = _suggestion_url(entry)
+    return {"type": entry["kind"], "label": entry["label"], "url": url}
+
+
+@app.route("/recherche/suggest")
+def search_suggest():
+    """Autocomplétion JSON servie depuis l'index de préfixes en mémoire."""
+    q = (request.args.get("q") or "").strip()[:_SUGGEST_MAX_QUERY]
+    limit = min(parse_positive_int(request.args.get("limit"), default=_SUGGEST_LIMIT), _SUGGEST_LIMIT)
+    results = []
+    if q:
+        try:
+            results = [_suggestion_payload(entry) for entry in get_search_index("prefix").search(q, limit=limit)]
+        except sqlite3.Error as e:
+            app.logger.error(f"Erreur lors de la construction de l'index de recherche: {e}")
+
+    response = jsonify({"q": q, "results": results})
+    response.headers["Cache-Control"] = "public, max-age=60"
+    return response
+
+
+@app.route("/recherche")
+def search():
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return redirect(url_for("accueil"))
+
+    conn = get_read_db()
+    sites = search_sites(conn, q)
+
+    suggestions, fuzzy_sites = [], []
+    if not sites:
+        suggestions, fuzzy_sites = fuzzy_search(conn, q)
+
+    return render_template(
+        "search-results.html",
+        q=q,
+        sites=sites,
+        suggestions=suggestions,
+        fuzzy_sites=fuzzy_sites,
+    )
 
 
 
@@ -2049,10 +3433,7 @@ def website_submission_form():
             flash("Catégorie non valide.", "error")
             return render_template("website-submission-form.html", form=form)
 
-        conn = get_db_connection()
-        if not conn:
-            flash("Erreur technique. Veuillez réessayer plus tard.", "error")
-            return render_template("website-submission-form.html", form=form)
+        conn = get_db()
         
         try:
             cur = conn.cursor()
@@ -2068,20 +3449,23 @@ def website_submission_form():
             resolved_city_id = resolved_city[0] if resolved_city else None
             resolved_city_name = resolved_city[1] if resolved_city else None
 
+            if find_site_by_url(cur, lien):
+                flash("Ce site est déjà référencé ou en cours de validation. Merci !", "info")
+                return redirect(url_for("accueil"))
+
             # SÉCURITÉ : Insertion avec paramètres liés (protection contre SQL injection)
             cur.execute("""
-                INSERT INTO sites (nom, ville_id, lien, description, category_id, status, date_ajout)
-                VALUES (?, ?, ?, ?, ?, 'en_attente', DATETIME('now'))
+                INSERT INTO sites (nom, ville_id, lien, lien_canonique, description, category_id, status, date_ajout)
+                VALUES (?, ?, ?, ?, ?, ?, 'en_attente', DATETIME('now'))
             """, (
                 nom,
                 resolved_city_id,
                 lien,
+                canonical_url(lien),
                 description,
                 resolved_category_id
             ))
-            
-            conn.commit()
-            send_submission_notification({
+            notify = queue_submission_notification(cur, {
                 "nom": nom,
                 "ville": resolved_city_name,
                 "lien": lien,
@@ -2090,14 +3474,21 @@ def website_submission_form():
                 "date_submission": datetime.utcnow().strftime("%d/%m/%Y %H:%M"),
                 "remote_addr": request.remote_addr or "IP inconnue",
             })
+
+            conn.commit()
+            if notify:
+                MAIL_OUTBOX.wake()
             flash("Merci, ta proposition a bien été envoyée ! Elle sera validée prochainement.", "success")
             return redirect(url_for("accueil"))
             
+        except sqlite3.IntegrityError:
+            # Même lien soumis en parallèle : l'index unique tranche.
+            conn.rollback()
+            flash("Ce site est déjà référencé ou en cours de validation. Merci !", "info")
+            return redirect(url_for("accueil"))
         except sqlite3.Error as e:
             app.logger.error(f"Erreur lors de l'insertion du site: {e}")
             flash("Erreur lors de l'enregistrement. Veuillez réessayer.", "error")
-        finally:
-            conn.close()
     
     # Si GET ou website-submission-form invalide → affiche le formulaire avec erreurs
     return render_template("website-submission-form.html", form=form)
@@ -2122,24 +3513,21 @@ def get_categories_slug():
         return g._categories_slug_cache
 
     categories = get_categories()
-    conn = get_db_connection()
+    conn = get_read_db()
     categories_slug = {}
 
-    if conn:
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT name FROM sqlite_master WHERE type='table' AND name='categories'"
-            )
-            has_table = cur.fetchone() is not None
-            if has_table:
-                cur.execute("SELECT nom, slug FROM categories")
-                rows = cur.fetchall()
-                categories_slug = {row["nom"]: row["slug"] for row in rows}
-        except sqlite3.Error as e:
-            app.logger.error(f"Erreur lors de la récupération des slugs de catégories: {e}")
-        finally:
-            conn.close()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='categories'"
+        )
+        has_table = cur.fetchone() is not None
+        if has_table:
+            cur.execute("SELECT nom, slug FROM categories")
+            rows = cur.fetchall()
+            categories_slug = {row["nom"]: row["slug"] for row in rows}
+    except sqlite3.Error as e:
+        app.logger.error(f"Erreur lors de la récupération des slugs de catégories: {e}")
 
     # Si la table n'existe pas ou est vide, on calcule les slugs à la volée
     if not categories_slug:
@@ -2166,10 +3554,9 @@ def slugify_ville(nom: str) -> str:
     return s
 
 @app.route("/villes")
+@cached_page()
 def villes_index():
-    conn = get_db_connection()
-    if not conn:
-        return render_template("500.html"), 500
+    conn = get_read_db()
     cur = conn.cursor()
 
     cur.execute("""
@@ -2188,22 +3575,19 @@ ORDER BY total_clicks DESC, nb_sites DESC, v.nom COLLATE NOCASE ASC
 
     """)
     villes = cur.fetchall()
-    conn.close()
 
     return render_template("cities.html", villes=villes)
 
 
 @app.route("/ville/<slug>")
+@cached_page()
 def voir_ville(slug):
-    conn = get_db_connection()
-    if not conn:
-        return render_template("500.html"), 500
+    conn = get_read_db()
     cur = conn.cursor()
 
     cur.execute("SELECT id, nom, slug FROM villes WHERE slug = ?", (slug,))
     ville = cur.fetchone()
     if not ville:
-        conn.close()
         return render_template("404.html"), 404
 
     cur.execute("""
@@ -2223,181 +3607,356 @@ def voir_ville(slug):
     """, (ville["id"],))
     total_clicks = cur.fetchone()["total_clicks"]
 
-    conn.close()
     return render_template("city.html", ville=ville, sites=sites, total_clicks=total_clicks)
 
 
 
 @app.route("/categories-les-plus-visitees")
+@cached_page()
 def most_visited_categories():
-    conn = get_db_connection()
-    if not conn:
-        return render_template("500.html"), 500
+    conn = get_read_db()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT
+            c.nom AS categorie,
+            COUNT(*) AS site_count,
+            COALESCE(SUM(s.click_count), 0) AS total_clicks
+        FROM sites s
+        JOIN categories c ON c.id = s.category_id
+        WHERE s.status = 'valide'
+        GROUP BY c.id, c.nom
+        ORDER BY total_clicks DESC, site_count DESC, c.nom COLLATE NOCASE ASC
+        """
+    )
+    categories_rank = cur.fetchall()
+    return render_template("most-visited-categories.html", categories_rank=categories_rank)
 
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
+def compute_trends(conn):
+    """Les quatre classements de /tendances (listes de dicts, sérialisables)."""
+    cur = conn.cursor()
+
+    # PERFORMANCE : fenêtres calculées sur les agrégats journaliers
+    # (site_click_daily / category_click_daily), jours UTC : 7 jours = aujourd'hui
+    # et les 6 précédents.
+
+    # Top en ce moment (7 jours) + variation vs 7 jours précédents
+    cur.execute(
+        """
+        WITH windows AS (
             SELECT
-                c.nom AS categorie,
-                COUNT(*) AS site_count,
-                COALESCE(SUM(s.click_count), 0) AS total_clicks
-            FROM sites s
-            JOIN categories c ON c.id = s.category_id
-            WHERE s.status = 'valide'
-            GROUP BY c.id, c.nom
-            ORDER BY total_clicks DESC, site_count DESC, c.nom COLLATE NOCASE ASC
-            """
+                site_id,
+                SUM(CASE WHEN day >= date('now', '-6 days') THEN clicks ELSE 0 END) AS c7,
+                SUM(CASE WHEN day < date('now', '-6 days') THEN clicks ELSE 0 END) AS cprev,
+                hll_count(hll_union(CASE WHEN day >= date('now', '-6 days') THEN visitors END)) AS v7
+            FROM site_click_daily
+            WHERE day >= date('now', '-13 days')
+            GROUP BY site_id
         )
-        categories_rank = cur.fetchall()
-        return render_template("most-visited-categories.html", categories_rank=categories_rank)
+        SELECT
+            s.id,
+            s.nom,
+            c.nom AS categorie,
+            COALESCE(w.c7, 0) AS clicks_7d,
+            COALESCE(w.cprev, 0) AS clicks_prev_7d,
+            COALESCE(w.v7, 0) AS visitors_7d,
+            CASE
+                WHEN COALESCE(w.cprev, 0) = 0 THEN NULL
+                ELSE ROUND((COALESCE(w.c7, 0) - w.cprev) * 100.0 / w.cprev, 1)
+            END AS growth_pct
+        FROM sites s
+        LEFT JOIN categories c ON c.id = s.category_id
+        LEFT JOIN windows w ON w.site_id = s.id
+        WHERE s.status = 'valide'
+        ORDER BY clicks_7d DESC, growth_pct DESC
+        LIMIT 10
+        """
+    )
+    trending_sites = cur.fetchall()
+
+    # Top stable (30 jours)
+    cur.execute(
+        """
+        WITH c30 AS (
+            SELECT site_id, SUM(clicks) AS clicks_30d, hll_count(hll_union(visitors)) AS visitors_30d
+            FROM site_click_daily
+            WHERE day >= date('now', '-29 days')
+            GROUP BY site_id
+        )
+        SELECT
+            s.id,
+            s.nom,
+            c.nom AS categorie,
+            COALESCE(c30.clicks_30d, 0) AS clicks_30d,
+            COALESCE(c30.visitors_30d, 0) AS visitors_30d
+        FROM sites s
+        LEFT JOIN categories c ON c.id = s.category_id
+        LEFT JOIN c30 ON c30.site_id = s.id
+        WHERE s.status = 'valide'
+        ORDER BY clicks_30d DESC
+        LIMIT 10
+        """
+    )
+    stable_sites = cur.fetchall()
+
+    # Catégories en hausse (7j vs 7j précédents)
+    cur.execute(
+        """
+        WITH windows AS (
+            SELECT
+                category_id,
+                SUM(CASE WHEN day >= date('now', '-6 days') THEN clicks ELSE 0 END) AS clicks_7d,
+                SUM(CASE WHEN day < date('now', '-6 days') THEN clicks ELSE 0 END) AS clicks_prev_7d
+            FROM category_click_daily
+            WHERE day >= date('now', '-13 days')
+            GROUP BY category_id
+        )
+        SELECT
+            c.nom AS categorie,
+            COALESCE(w.clicks_7d, 0) AS clicks_7d,
+            COALESCE(w.clicks_prev_7d, 0) AS clicks_prev_7d,
+            CASE
+                WHEN COALESCE(w.clicks_prev_7d, 0) = 0 THEN NULL
+                ELSE ROUND((COALESCE(w.clicks_7d, 0) - w.clicks_prev_7d) * 100.0 / w.clicks_prev_7d, 1)
+            END AS growth_pct
+        FROM categories c
+        LEFT JOIN windows w ON w.category_id = c.id
+        WHERE TRIM(c.nom) != ''
+          AND EXISTS (SELECT 1 FROM sites s WHERE s.category_id = c.id AND s.status = 'valide')
+        ORDER BY clicks_7d DESC, growth_pct DESC
+        LIMIT 10
+        """
+    )
+    trending_categories = cur.fetchall()
+
+    # Nouveaux sites qui performent (ajoutés récemment + clics 7j)
+    cur.execute(
+        """
+        WITH c7 AS (
+            SELECT site_id, SUM(clicks) AS clicks_7d
+            FROM site_click_daily
+            WHERE day >= date('now', '-6 days')
+            GROUP BY site_id
+        )
+        SELECT
+            s.id,
+            s.nom,
+            c.nom AS categorie,
+            COALESCE(c7.clicks_7d, 0) AS clicks_7d
+        FROM sites s
+        LEFT JOIN categories c ON c.id = s.category_id
+        LEFT JOIN c7 ON c7.site_id = s.id
+        WHERE s.status = 'valide'
+          AND s.date_ajout >= datetime('now', '-30 days')
+        ORDER BY clicks_7d DESC
+        LIMIT 10
+        """
+    )
+    new_performers = cur.fetchall()
+
+    return {
+        "trending_sites": [dict(row) for row in trending_sites],
+        "stable_sites": [dict(row) for row in stable_sites],
+        "trending_categories": [dict(row) for row in trending_categories],
+        "new_performers": [dict(row) for row in new_performers],
+    }
+
+
+# PERFORMANCE : /tendances sert un instantané (table trends_snapshot, partagée par
+# les workers) recalculé en arrière-plan toutes les TRENDS_REFRESH_INTERVAL secondes.
+_TRENDS_CACHE = {"computed_at": None, "data": None}
+_TRENDS_REFRESHER = {"thread": None, "pid": None}
+_TRENDS_REFRESHER_LOCK = threading.Lock()
+
+
+def refresh_trends_snapshot():
+    """Recalcule et enregistre l'instantané ; retourne son horodatage (UTC)."""
+    conn = get_db_connection()
+    try:
+        payload = json.dumps(compute_trends(conn), ensure_ascii=False, separators=(",", ":"))
+        computed_at = utc_timestamp()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO trends_snapshot (id, computed_at, payload)
+                VALUES (1, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    computed_at = excluded.computed_at,
+                    payload = excluded.payload
+                """,
+                (computed_at, payload),
+            )
     finally:
         conn.close()
+    invalidate_page_cache("trends")
+    app.logger.info(f"[TENDANCES] Instantané recalculé ({computed_at} UTC)")
+    return computed_at
+
+
+def load_trends_snapshot(conn):
+    """(data, computed_at) ou None ; le JSON n'est décodé que s'il a changé."""
+    row = conn.execute("SELECT computed_at, payload FROM trends_snapshot WHERE id = 1").fetchone()
+    if not row:
+        return None
+    if _TRENDS_CACHE["computed_at"] != row["computed_at"]:
+        _TRENDS_CACHE["data"] = json.loads(row["payload"])
+        _TRENDS_CACHE["computed_at"] = row["computed_at"]
+    return _TRENDS_CACHE["data"], row["computed_at"]
+
+
+def trends_snapshot_age(computed_at):
+    computed = datetime.strptime(computed_at, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return max((datetime.now(timezone.utc) - computed).total_seconds(), 0)
+
+
+def _trends_refresher_loop():
+    interval = max(int(app.config.get("TRENDS_REFRESH_INTERVAL", 300)), 10)
+    while True:
+        try:
+            conn = get_db_connection(readonly=True)
+            try:
+                row = conn.execute("SELECT computed_at FROM trends_snapshot WHERE id = 1").fetchone()
+            finally:
+                conn.close()
+            # Un autre worker a pu rafraîchir entre-temps : on ne recalcule que si périmé.
+            if not row or trends_snapshot_age(row["computed_at"]) >= interval:
+                refresh_trends_snapshot()
+        except Exception:
+            # Le thread doit survivre à toute erreur : le prochain tour réessaiera.
+            app.logger.exception("[TENDANCES] Rafraîchissement impossible")
+        time.sleep(interval)
+
+
+def ensure_trends_refresher():
+    """Démarre le thread de rafraîchissement du worker courant (voir start_worker_services)."""
+    refresher = _TRENDS_REFRESHER
+    if refresher["thread"] is not None and refresher["thread"].is_alive() and refresher["pid"] == os.getpid():
+        return
+    with _TRENDS_REFRESHER_LOCK:
+        if refresher["thread"] is not None and refresher["thread"].is_alive() and refresher["pid"] == os.getpid():
+            return
+        refresher["pid"] = os.getpid()
+        refresher["thread"] = threading.Thread(target=_trends_refresher_loop, name="trends-refresher", daemon=True)
+        refresher["thread"].start()
+
 
 @app.route("/tendances")
+@cached_page("trends")
 def trends():
-    conn = get_db_connection()
-    if not conn:
-        return render_template("500.html"), 500
+    snapshot = load_trends_snapshot(get_read_db())
+    if snapshot is None:
+        # Base neuve : premier calcul dans la requête.
+        refresh_trends_snapshot()
+        snapshot = load_trends_snapshot(get_read_db())
+    data, computed_at = snapshot
+
+    return render_template(
+        "trends.html",
+        snapshot_computed_at=computed_at,
+        snapshot_age_minutes=int(trends_snapshot_age(computed_at) // 60),
+        **data,
+    )
+
 
+@app.cli.command("rebuild-click-rollups")
+def rebuild_click_rollups_command():
+    """Recalcule site_click_daily / category_click_daily depuis site_clicks."""
+    conn = get_db_connection()
     try:
-        cur = conn.cursor()
+        rebuilt = rebuild_click_rollups(conn)
+    finally:
+        conn.close()
+    print(f"Agrégats journaliers recalculés : {rebuilt} lignes site/jour.")
 
-        # Top en ce moment (7 jours) + variation vs 7 jours précédents
-        cur.execute(
-            """
-            WITH clicks_7 AS (
-                SELECT site_id, COUNT(*) AS c7
-                FROM site_clicks
-                WHERE clicked_at >= datetime('now', '-7 days')
-                GROUP BY site_id
-            ),
-            clicks_prev7 AS (
-                SELECT site_id, COUNT(*) AS cprev
-                FROM site_clicks
-                WHERE clicked_at >= datetime('now', '-14 days')
-                  AND clicked_at < datetime('now', '-7 days')
-                GROUP BY site_id
-            )
-            SELECT
-                s.id,
-                s.nom,
-                c.nom AS categorie,
-                COALESCE(c7.c7, 0) AS clicks_7d,
-                COALESCE(cp.cprev, 0) AS clicks_prev_7d,
-                CASE
-                    WHEN COALESCE(cp.cprev, 0) = 0 THEN NULL
-                    ELSE ROUND((COALESCE(c7.c7, 0) - cp.cprev) * 100.0 / cp.cprev, 1)
-                END AS growth_pct
-            FROM sites s
-            LEFT JOIN categories c ON c.id = s.category_id
-            LEFT JOIN clicks_7 c7 ON c7.site_id = s.id
-            LEFT JOIN clicks_prev7 cp ON cp.site_id = s.id
-            WHERE s.status = 'valide'
-            ORDER BY clicks_7d DESC, growth_pct DESC
-            LIMIT 10
-            """
-        )
-        trending_sites = cur.fetchall()
 
-        # Top stable (30 jours)
-        cur.execute(
-            """
-            SELECT
-                s.id,
-                s.nom,
-                c.nom AS categorie,
-                COUNT(sc.id) AS clicks_30d
-            FROM sites s
-            LEFT JOIN categories c ON c.id = s.category_id
-            LEFT JOIN site_clicks sc
-              ON sc.site_id = s.id
-             AND sc.clicked_at >= datetime('now', '-30 days')
-            WHERE s.status = 'valide'
-            GROUP BY s.id, s.nom, c.nom
-            ORDER BY clicks_30d DESC
-            LIMIT 10
-            """
-        )
-        stable_sites = cur.fetchall()
+@app.cli.command("refresh-trends")
+def refresh_trends_command():
+    """Recalcule immédiatement l'instantané de /tendances."""
+    computed_at = refresh_trends_snapshot()
+    print(f"Instantané des tendances recalculé ({computed_at} UTC).")
 
-        # Catégories en hausse (7j vs 7j précédents)
-        cur.execute(
-            """
-            WITH c7 AS (
-                SELECT c.nom AS categorie, COUNT(sc.id) AS clicks_7d
-                FROM sites s
-                LEFT JOIN categories c ON c.id = s.category_id
-                LEFT JOIN site_clicks sc
-                  ON sc.site_id = s.id
-                 AND sc.clicked_at >= datetime('now', '-7 days')
-                WHERE s.status = 'valide'
-                  AND c.nom IS NOT NULL
-                  AND TRIM(c.nom) != ''
-                GROUP BY c.nom
-            ),
-            cp AS (
-                SELECT c.nom AS categorie, COUNT(sc.id) AS clicks_prev_7d
-                FROM sites s
-                LEFT JOIN categories c ON c.id = s.category_id
-                LEFT JOIN site_clicks sc
-                  ON sc.site_id = s.id
-                 AND sc.clicked_at >= datetime('now', '-14 days')
-                 AND sc.clicked_at < datetime('now', '-7 days')
-                WHERE s.status = 'valide'
-                  AND c.nom IS NOT NULL
-                  AND TRIM(c.nom) != ''
-                GROUP BY c.nom
-            )
-            SELECT
-                c7.categorie,
-                COALESCE(c7.clicks_7d, 0) AS clicks_7d,
-                COALESCE(cp.clicks_prev_7d, 0) AS clicks_prev_7d,
-                CASE
-                    WHEN COALESCE(cp.clicks_prev_7d, 0) = 0 THEN NULL
-                    ELSE ROUND((COALESCE(c7.clicks_7d, 0) - cp.clicks_prev_7d) * 100.0 / cp.clicks_prev_7d, 1)
-                END AS growth_pct
-            FROM c7
-            LEFT JOIN cp ON cp.categorie = c7.categorie
-            WHERE c7.categorie IS NOT NULL AND TRIM(c7.categorie) != ''
-            ORDER BY clicks_7d DESC, growth_pct DESC
-            LIMIT 10
-            """
-        )
-        trending_categories = cur.fetchall()
 
-        # Nouveaux sites qui performent (ajoutés récemment + clics 7j)
-        cur.execute(
-            """
-            SELECT
-                s.id,
-                s.nom,
-                c.nom AS categorie,
-                COUNT(sc.id) AS clicks_7d
-            FROM sites s
-            LEFT JOIN categories c ON c.id = s.category_id
-            LEFT JOIN site_clicks sc
-              ON sc.site_id = s.id
-             AND sc.clicked_at >= datetime('now', '-7 days')
-            WHERE s.status = 'valide'
-              AND s.date_ajout >= datetime('now', '-30 days')
-            GROUP BY s.id, s.nom, c.nom
-            ORDER BY clicks_7d DESC
-            LIMIT 10
-            """
+@app.cli.command("archive-clicks")
+@click.option("--vacuum", is_flag=True, help="Compacte ensuite la base principale (VACUUM).")
+def archive_clicks_command(vacuum):
+    """Déplace les clics plus anciens que CLICK_RETENTION_DAYS vers les archives mensuelles."""
+    conn = get_db_connection()
+    try:
+        moved = archive_old_clicks(
+            conn, click_archive_dir(), app.config.get("CLICK_RETENTION_DAYS", 30), logger=app.logger
         )
-        new_performers = cur.fetchall()
-
-        return render_template(
-            "trends.html",
-            trending_sites=trending_sites,
-            stable_sites=stable_sites,
-            trending_categories=trending_categories,
-            new_performers=new_performers,
+        if vacuum and moved:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+    for month, count in moved.items():
+        print(f"{month} : {count} clics archivés")
+    print(f"Archivage terminé : {sum(moved.values())} clics déplacés.")
+
+
+@app.cli.command("import-sites")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--status", type=click.Choice(["valide", "en_attente", "refuse"]), default="valide",
+              help="Statut des lignes sans colonne status.")
+@click.option("--dry-run", is_flag=True, help="Affiche le rapport sans rien écrire.")
+def import_sites_command(path, status, dry_run):
+    """Importe des sites depuis un fichier CSV ou JSON."""
+    with open(path, "rb") as handle:
+        try:
+            records = parse_import_file(handle.read(), path)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+    conn = get_db_connection()
+    try:
+        started = time.perf_counter()
+        report = import_sites(
+            conn,
+            records,
+            category_slug=slugify,
+            city_slug=slugify_ville,
+            default_status=status,
+            dry_run=dry_run,
         )
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+
+    for line, value, reason in report["errors"]:
+        print(f"ligne {line} : {reason} ({value})")
+    for line, value, reason in report["duplicates"]:
+        print(f"ligne {line} : {reason} ({value})")
+    if report["new_categories"]:
+        label = "Catégories à créer" if dry_run else "Catégories créées"
+        print(f"{label} : " + ", ".join(report["new_categories"]))
+    verb = "seraient ajoutés" if dry_run else "ajoutés"
+    print(
+        f"{report['created']} sites {verb} sur {report['total']} lignes "
+        f"({len(report['duplicates'])} doublons, {len(report['errors'])} erreurs) en {elapsed:.2f} s."
+    )
+
+
+@app.cli.command("send-outbox")
+def send_outbox_command():
+    """Envoie immédiatement les emails en attente (résumé en cours compris)."""
+    conn = get_db_connection()
+    try:
+        if MAIL_OUTBOX.render_digest is not None:
+            MAIL_OUTBOX.flush_digest(conn, force=True)
+        sent = MAIL_OUTBOX.drain(conn)
+    finally:
+        MAIL_OUTBOX.smtp.close()
+        conn.close()
+    pending = 0
+    conn = get_db_connection(readonly=True)
+    try:
+        pending = conn.execute("SELECT COUNT(*) FROM email_outbox WHERE status = 'pending'").fetchone()[0]
     finally:
         conn.close()
+    print(f"{sent} email(s) envoyé(s), {pending} en attente.")
 
 
 if __name__ == "__main__":
+    ensure_db_schema()
+    start_worker_services()
     app.run(debug=True)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Archivage mensuel du journal des clics pour Réunion Wiki
+PERFORMANCE : site_clicks ne garde que les CLICK_RETENTION_DAYS derniers jours ;
+les événements plus anciens sont déplacés dans un fichier SQLite par mois
+(clicks-AAAA-MM.db), attachés en lecture seule quand l'admin consulte 90 ou
+365 jours. Les agrégats journaliers ne sont pas touchés.
+"""
+
+import os
+import re
+from urllib.request import pathname2url
+
+# Limite de compilation de SQLite (SQLITE_MAX_ATTACHED, 10 par défaut).
+MAX_ATTACHED = 10
+
+_ARCHIVE_NAME = re.compile(r"^clicks-(\d{4}-\d{2})\.db$")
+
+_CLICK_COLUMNS = "id, site_id, ip_address, user_agent, clicked_at"
+
+
+def archive_path(archive_dir, month):
+    return os.path.join(archive_dir, f"clicks-{month}.db")
+
+
+def list_archive_months(archive_dir, since_month=None):
+    """Mois archivés disponibles (AAAA-MM, croissants), à partir de since_month."""
+    if not archive_dir or not os.path.isdir(archive_dir):
+        return []
+    months = []
+    for name in os.listdir(archive_dir):
+        match = _ARCHIVE_NAME.match(name)
+        if match and (since_month is None or match.group(1) >= since_month):
+            months.append(match.group(1))
+    return sorted(months)
+
+
+def _create_archive_table(conn, schema):
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {schema}.site_clicks (
+            id INTEGER PRIMARY KEY,
+            site_id INTEGER NOT NULL,
+            ip_address TEXT NOT NULL,
+            user_agent TEXT,
+            clicked_at DATETIME
+        )
+        """
+    )
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {schema}.idx_site_clicks_clicked_at ON site_clicks(clicked_at)"
+    )
+
+
+def archive_old_clicks(conn, archive_dir, retention_days, logger=None):
+    """Déplace les clics antérieurs à la rétention vers leurs archives mensuelles.
+
+    Chaque mois est traité dans sa propre transaction ; la copie utilise
+    INSERT OR IGNORE sur l'id d'origine, donc un passage interrompu peut
+    simplement être relancé. Retourne {mois: nombre de clics déplacés}.
+    """
+    conn.commit()
+    # Coupure à minuit (UTC) : un jour est archivé en entier ou pas du tout,
+    # ce qui permet de recalculer les agrégats depuis les jours restants.
+    cutoff = conn.execute("SELECT date('now', ?)", (f"-{int(retention_days)} days",)).fetchone()[0]
+    months = [
+        row[0]
+        for row in conn.execute(
+            """
+            SELECT DISTINCT substr(clicked_at, 1, 7)
+            FROM site_clicks
+            WHERE clicked_at < ?
+            ORDER BY 1
+            """,
+            (cutoff,),
+        )
+    ]
+
+    os.makedirs(archive_dir, exist_ok=True)
+    moved = {}
+    for month in months:
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path(archive_dir, month),))
+        try:
+            _create_archive_table(conn, "archive")
+            conn.commit()
+            selection = "FROM main.site_clicks WHERE clicked_at < ? AND substr(clicked_at, 1, 7) = ?"
+            conn.execute(
+                f"INSERT OR IGNORE INTO archive.site_clicks ({_CLICK_COLUMNS}) SELECT {_CLICK_COLUMNS} {selection}",
+                (cutoff, month),
+            )
+            cur = conn.execute(f"DELETE {selection}", (cutoff, month))
+            moved[month] = cur.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE archive")
+        if logger:
+            logger.info(f"[ARCHIVE] {moved[month]} clics déplacés vers clicks-{month}.db")
+    return moved
+
+
+def attach_archives(conn, archive_dir, months):
+    """Attache les archives (lecture seule) ; retourne leurs alias de schéma."""
+    aliases = []
+    for i, month in enumerate(months[:MAX_ATTACHED]):
+        alias = f"archive_{i}"
+        uri = f"file:{pathname2url(archive_path(archive_dir, month))}?mode=ro"
+        conn.execute("ATTACH DATABASE ? AS " + alias, (uri,))
+        aliases.append(alias)
+    return aliases
+
+
+def click_source_sql(aliases, include_live=True):
+    """Sous-requête "site_clicks" couvrant la table vive et/ou les archives.
+
+    La colonne `archived` distingue les événements archivés (non supprimables).
+    """
+    parts = []
+    if include_live:
+        parts.append(f"SELECT {_CLICK_COLUMNS}, 0 AS archived FROM main.site_clicks")
+    for alias in aliases:
+        parts.append(f"SELECT {_CLICK_COLUMNS}, 1 AS archived FROM {alias}.site_clicks")
+    return "(" + " UNION ALL ".join(parts) + ")"
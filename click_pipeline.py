@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""
+Ingestion des clics /go/<site_id> pour Réunion Wiki
+PERFORMANCE : la route dépose l'événement dans une file bornée et redirige tout
+de suite ; un thread écrivain insère les clics par lots et regroupe les
+incréments de click_count en un seul UPDATE par site et par lot.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+
+from hyperloglog import HyperLogLog
+
+_STOP = object()
+
+# Agrégats journaliers des clics (jour UTC, comme clicked_at) : les pages de
+# statistiques lisent quelques centaines de lignes au lieu du journal brut.
+CLICK_ROLLUP_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS site_click_daily (
+        site_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        clicks INTEGER NOT NULL DEFAULT 0,
+        visitors BLOB,
+        PRIMARY KEY (site_id, day),
+        FOREIGN KEY (site_id) REFERENCES sites(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS category_click_daily (
+        category_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        clicks INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (category_id, day),
+        FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_site_click_daily_day ON site_click_daily(day)",
+    "CREATE INDEX IF NOT EXISTS idx_category_click_daily_day ON category_click_daily(day)",
+]
+
+# visitors : croquis HyperLogLog des IP du jour (voir hyperloglog.py), fusionné
+# par hll_merge ; un clic supprimé ne peut pas en être retiré.
+_SITE_ROLLUP_UPSERT = """
+    INSERT INTO site_click_daily (site_id, day, clicks, visitors)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(site_id, day) DO UPDATE SET
+        clicks = MAX(clicks + excluded.clicks, 0),
+        visitors = hll_merge(visitors, excluded.visitors)
+"""
+
+# La catégorie retenue est celle du site au moment du clic.
+_CATEGORY_ROLLUP_UPSERT = """
+    INSERT INTO category_click_daily (category_id, day, clicks)
+    SELECT s.category_id, ?, ?
+    FROM sites s
+    JOIN categories c ON c.id = s.category_id
+    WHERE s.id = ?
+    ON CONFLICT(category_id, day) DO UPDATE SET clicks = MAX(clicks + excluded.clicks, 0)
+"""
+
+
+def apply_click_rollups(conn, deltas, visitors=None):
+    """Ajoute des deltas {(site_id, day): n} aux agrégats (n < 0 pour retirer).
+
+    `visitors` : {(site_id, day): HyperLogLog} des IP du lot, optionnel.
+    """
+    visitors = visitors or {}
+    conn.executemany(
+        _SITE_ROLLUP_UPSERT,
+        [
+            (site_id, day, delta, visitors[(site_id, day)].to_bytes() if (site_id, day) in visitors else None)
+            for (site_id, day), delta in deltas.items()
+        ],
+    )
+    conn.executemany(
+        _CATEGORY_ROLLUP_UPSERT,
+        [(day, delta, site_id) for (site_id, day), delta in deltas.items()],
+    )
+
+
+def rebuild_click_rollups(conn):
+    """Recalcule les agrégats depuis site_clicks, pour les jours encore présents
+    dans le journal brut (les jours plus anciens, archivés, sont conservés).
+
+    Retourne le nombre de lignes site_click_daily recalculées.
+    """
+    with conn:
+        first_day = conn.execute("SELECT MIN(date(clicked_at)) FROM site_clicks").fetchone()[0]
+        if first_day is None:
+            return 0
+        conn.execute("DELETE FROM site_click_daily WHERE day >= ?", (first_day,))
+        conn.execute("DELETE FROM category_click_daily WHERE day >= ?", (first_day,))
+        cur = conn.execute(
+            """
+            INSERT INTO site_click_daily (site_id, day, clicks, visitors)
+            SELECT sc.site_id, date(sc.clicked_at), COUNT(*), hll_build(sc.ip_address)
+            FROM site_clicks sc
+            JOIN sites s ON s.id = sc.site_id
+            WHERE sc.clicked_at IS NOT NULL
+            GROUP BY sc.site_id, date(sc.clicked_at)
+            """
+        )
+        rebuilt = cur.rowcount
+        conn.execute(
+            """
+            INSERT INTO category_click_daily (category_id, day, clicks)
+            SELECT s.category_id, d.day, SUM(d.clicks)
+            FROM site_click_daily d
+            JOIN sites s ON s.id = d.site_id
+            JOIN categories c ON c.id = s.category_id
+            WHERE d.day >= ?
+            GROUP BY s.category_id, d.day
+            """,
+            (first_day,),
+        )
+    return rebuilt
+
+
+def utc_timestamp():
+    """Horodatage au format de CURRENT_TIMESTAMP (UTC, à la seconde)."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class ClickBuffer:
+    """File de clics vidée par un thread écrivain.
+
+    `connect` est appelé depuis le thread écrivain pour ouvrir sa propre
+    connexion SQLite. Le thread démarre au premier clic (et redémarre après un
+    fork : chaque worker a sa file).
+    """
+
+    def __init__(self, connect, max_size=10000, batch_size=500, flush_interval=1.0, logger=None):
+        self.connect = connect
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def submit(self, site_id, ip_address, user_agent, clicked_at=None):
+        """Dépose un clic ; False si la file est pleine (clic abandonné)."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((site_id, ip_address, user_agent, clicked_at or utc_timestamp()))
+        except queue.Full:
+            self.dropped += 1
+            self.logger.warning(f"[GO] File de clics pleine, clic abandonné id={site_id} (total={self.dropped})")
+            return False
+        return True
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Après un fork, la file héritée n'a plus de lecteur.
+                self._queue = queue.Queue(maxsize=self.max_size)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="click-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Vide la file puis arrête l'écrivain (appelé à l'arrêt du process)."""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def _run(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            if stopping:
+                # Ce qui reste dans la file part dans le dernier lot.
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+
+            if not batch:
+                continue
+            conn = self._write_with_retry(conn, batch)
+
+        if conn is not None:
+            conn.close()
+
+    def _write_with_retry(self, conn, batch):
+        """Écrit un lot ; après un échec (base verrouillée, connexion cassée), une
+        seconde tentative sur une connexion neuve. Retourne la connexion à garder."""
+        for attempt in (1, 2):
+            try:
+                if conn is None:
+                    conn = self.connect()
+                self.write_batch(conn, batch)
+                return conn
+            except sqlite3.Error as e:
+                if conn is not None:
+                    conn.close()
+                conn = None
+                if attempt == 1:
+                    self.logger.warning(f"[GO] Écriture de {len(batch)} clics en échec, nouvel essai: {e}")
+                    time.sleep(min(self.flush_interval, 1.0))
+                else:
+                    self.failed += len(batch)
+                    self.logger.error(
+                        f"[GO] Écriture de {len(batch)} clics impossible, lot abandonné (total={self.failed}): {e}"
+                    )
+        return conn
+
+    def write_batch(self, conn, batch):
+        """Un INSERT multi-lignes + un UPDATE par site, dans une transaction."""
+        site_ids = sorted({site_id for site_id, _ip, _ua, _at in batch})
+        placeholders = ", ".join("?" for _ in site_ids)
+        existing = {
+            row[0] for row in conn.execute(f"SELECT id FROM sites WHERE id IN ({placeholders})", site_ids)
+        }
+        # Un site supprimé entre le clic et l'écriture ne doit pas faire échouer le lot.
+        batch = [event for event in batch if event[0] in existing]
+        if not batch:
+            return
+
+        deltas = Counter(site_id for site_id, _ip, _ua, _at in batch)
+        daily = Counter()
+        visitors = {}
+        for site_id, ip_address, _ua, clicked_at in batch:
+            key = (site_id, clicked_at[:10])
+            daily[key] += 1
+            visitors.setdefault(key, HyperLogLog()).add(ip_address)
+        with conn:
+            conn.executemany(
+                "INSERT INTO site_clicks (site_id, ip_address, user_agent, clicked_at) VALUES (?, ?, ?, ?)",
+                batch,
+            )
+            conn.executemany(
+                "UPDATE sites SET click_count = COALESCE(click_count, 0) + ? WHERE id = ?",
+                [(delta, site_id) for site_id, delta in deltas.items()],
+            )
+            apply_click_rollups(conn, daily, visitors)
+        self.logger.info(f"[GO] {len(batch)} clics écrits ({len(deltas)} sites)")
+
+
+class MemoryClickDeduplicator:
+    """Ensemble (site_id, ip) -> expiration, en mémoire du worker.
+
+    Le TTL étant identique pour toutes les entrées, l'ordre d'insertion est
+    aussi l'ordre d'expiration : les entrées périmées sont purgées en tête à
+    chaque appel, et max_entries borne la mémoire en cas de pic.
+    """
+
+    def __init__(self, ttl=1800, max_entries=200000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._expires = OrderedDict()
+        self._lock = threading.Lock()
+
+    def first_seen(self, site_id, ip_address):
+        """True si ce couple n'a pas été vu depuis `ttl` secondes (et le marque)."""
+        key = (site_id, ip_address)
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            if key in self._expires:
+                return False
+            self._expires[key] = now + self.ttl
+            if len(self._expires) > self.max_entries:
+                self._expires.popitem(last=False)
+            return True
+
+    def release(self, site_id, ip_address):
+        """Annule la marque de first_seen (clic finalement non enregistré)."""
+        with self._lock:
+            self._expires.pop((site_id, ip_address), None)
+
+    def _evict(self, now):
+        while self._expires:
+            key, expires_at = next(iter(self._expires.items()))
+            if expires_at > now:
+                break
+            del self._expires[key]
+
+    def __len__(self):
+        return len(self._expires)
+
+
+class RedisClickDeduplicator:
+    """Même contrat, partagé entre workers : SET NX EX sur une clé par couple.
+
+    Délais réseau courts (`socket_timeout`, en secondes) : un Redis figé ne
+    retient pas la redirection /go, on passe au repli local.
+    """
+
+    def __init__(self, url, ttl=1800, prefix="rw:click:", socket_timeout=0.2, logger=None):
+        import redis
+
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout
+        )
+        self.ttl = ttl
+        self.prefix = prefix
+        self.logger = logger or logging.getLogger(__name__)
+        # Redis indisponible : on retombe sur la déduplication locale.
+        self.fallback = MemoryClickDeduplicator(ttl=ttl)
+
+    def first_seen(self, site_id, ip_address):
+        try:
+            return bool(self.client.set(f"{self.prefix}{site_id}:{ip_address}", 1, nx=True, ex=self.ttl))
+        except Exception as e:
+            self.logger.warning(f"[GO] Redis indisponible pour la déduplication des clics: {e}")
+            return self.fallback.first_seen(site_id, ip_address)
+
+    def release(self, site_id, ip_address):
+        self.fallback.release(site_id, ip_address)
+        try:
+            self.client.delete(f"{self.prefix}{site_id}:{ip_address}")
+        except Exception as e:
+            self.logger.warning(f"[GO] Redis indisponible pour la déduplication des clics: {e}")
+
+
+def create_click_deduplicator(config, logger=None):
+    url = config.get("CLICK_DEDUP_STORAGE_URL") or "memory://"
+    ttl = int(config.get("CLICK_DEDUP_TTL", 1800))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisClickDeduplicator(
+            url, ttl=ttl, socket_timeout=float(config.get("CLICK_DEDUP_REDIS_TIMEOUT", 0.2)), logger=logger
+        )
+    return MemoryClickDeduplicator(ttl=ttl, max_entries=int(config.get("CLICK_DEDUP_MAX_ENTRIES", 200000)))
+
+
+def create_click_buffer(connect, config, logger=None):
+    buffer = ClickBuffer(
+        connect,
+        max_size=config.get("CLICK_QUEUE_SIZE", 10000),
+        batch_size=config.get("CLICK_BATCH_SIZE", 500),
+        flush_interval=config.get("CLICK_FLUSH_INTERVAL", 1.0),
+        logger=logger,
+    )
+    atexit.register(buffer.stop)
+    return buffer
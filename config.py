@@ -28,6 +28,18 @@ class Config:
         DATABASE_PATH = os.path.join(BASE_DIR, DATABASE_PATH)
         
     print("DATABASE_PATH final:", DATABASE_PATH)
+
+    # PERFORMANCE : connexions SQLite réutilisées par worker (une par requête)
+    # Pool lecture seule (mode=ro) pour les pages + connexion d'écriture distincte.
+    DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', 4))
+    DB_WRITE_POOL_SIZE = int(os.getenv('DB_WRITE_POOL_SIZE', 1))
+
+    # PERFORMANCE : profil de stockage SQLite
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 16384))  # 16 Mo par connexion
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 134217728))  # 128 Mo
     
     # NOTIFICATIONS : configuration email (désactivée par défaut)
     MAIL_ENABLED = os.getenv('MAIL_ENABLED', 'false').lower() == 'true'
@@ -43,6 +55,19 @@ class Config:
         for email in os.getenv('MAIL_RECIPIENTS', '').split(',')
         if email.strip()
     ]
+    # NOTIFICATIONS : boîte d'envoi vidée en arrière-plan (connexion SMTP réutilisée)
+    MAIL_OUTBOX_POLL_INTERVAL = float(os.getenv('MAIL_OUTBOX_POLL_INTERVAL', 5.0))
+    MAIL_OUTBOX_BATCH_SIZE = int(os.getenv('MAIL_OUTBOX_BATCH_SIZE', 20))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('MAIL_OUTBOX_MAX_ATTEMPTS', 8))
+    MAIL_RETRY_BASE_DELAY = int(os.getenv('MAIL_RETRY_BASE_DELAY', 30))  # x2 à chaque échec, 1 h max
+    MAIL_SMTP_TIMEOUT = int(os.getenv('MAIL_SMTP_TIMEOUT', 10))
+    MAIL_SMTP_IDLE_TIMEOUT = int(os.getenv('MAIL_SMTP_IDLE_TIMEOUT', 60))
+    # NOTIFICATIONS : mode résumé (un email pour plusieurs propositions)
+    MAIL_DIGEST_ENABLED = os.getenv('MAIL_DIGEST_ENABLED', 'false').lower() == 'true'
+    MAIL_DIGEST_INTERVAL_MINUTES = int(os.getenv('MAIL_DIGEST_INTERVAL_MINUTES', 30))
+    MAIL_DIGEST_MAX_ITEMS = int(os.getenv('MAIL_DIGEST_MAX_ITEMS', 20))  # envoi anticipé...
+    MAIL_DIGEST_MIN_GAP_MINUTES = int(os.getenv('MAIL_DIGEST_MIN_GAP_MINUTES', 5))  # ...au plus 1 résumé / 5 min
+    MAIL_DIGEST_BATCH_SIZE = int(os.getenv('MAIL_DIGEST_BATCH_SIZE', 100))  # propositions par email, surplus au suivant
     ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', '')
     ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', '')
     ADMIN_PASSWORD_HASH = os.getenv('ADMIN_PASSWORD_HASH', '')
@@ -50,6 +75,43 @@ class Config:
     # PERFORMANCE : Configuration du cache
     SEND_FILE_MAX_AGE_DEFAULT = 31536000  # 1 an pour les fichiers statiques
     
+    # RECHERCHE : durée de vie max de l'index en mémoire (secondes)
+    SEARCH_INDEX_TTL = int(os.getenv('SEARCH_INDEX_TTL', 300))
+
+    # ADMIN : durée de cache des totaux affichés par les explorateurs paginés (secondes)
+    ADMIN_COUNT_CACHE_TTL = int(os.getenv('ADMIN_COUNT_CACHE_TTL', 60))
+    # ADMIN : taille max. d'un fichier d'import de sites (octets)
+    SITE_IMPORT_MAX_BYTES = int(os.getenv('SITE_IMPORT_MAX_BYTES', 2 * 1024 * 1024))
+
+    # LISTES PUBLIQUES : sites par page (la vue complète ?tout=1 est diffusée en flux)
+    PUBLIC_LIST_PER_PAGE = int(os.getenv('PUBLIC_LIST_PER_PAGE', 50))
+
+    # CLICS /go : file bornée vidée par lots en arrière-plan
+    CLICK_BUFFER_ENABLED = os.getenv('CLICK_BUFFER_ENABLED', 'true').lower() == 'true'
+    CLICK_QUEUE_SIZE = int(os.getenv('CLICK_QUEUE_SIZE', 10000))
+    CLICK_BATCH_SIZE = int(os.getenv('CLICK_BATCH_SIZE', 500))
+    CLICK_FLUSH_INTERVAL = float(os.getenv('CLICK_FLUSH_INTERVAL', 1.0))
+    # Déduplication des clics répétés (memory:// par worker, redis:// partagé)
+    CLICK_DEDUP_STORAGE_URL = os.getenv('CLICK_DEDUP_STORAGE_URL', 'memory://')
+    CLICK_DEDUP_TTL = int(os.getenv('CLICK_DEDUP_TTL', 1800))
+    CLICK_DEDUP_MAX_ENTRIES = int(os.getenv('CLICK_DEDUP_MAX_ENTRIES', 200000))
+    CLICK_DEDUP_REDIS_TIMEOUT = float(os.getenv('CLICK_DEDUP_REDIS_TIMEOUT', 0.2))  # secondes
+    # Rétention du journal brut ; au-delà, archives mensuelles (flask archive-clicks)
+    CLICK_RETENTION_DAYS = int(os.getenv('CLICK_RETENTION_DAYS', 30))
+    CLICK_ARCHIVE_DIR = os.getenv('CLICK_ARCHIVE_DIR', '')
+
+    # CACHE DE PAGES : pages publiques des visiteurs anonymes (memory:// par worker, redis:// partagé)
+    PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+    PAGE_CACHE_STORAGE_URL = os.getenv('PAGE_CACHE_STORAGE_URL', 'memory://')
+    PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', 300))
+    PAGE_CACHE_MAX_ENTRIES = int(os.getenv('PAGE_CACHE_MAX_ENTRIES', 500))
+    PAGE_CACHE_REDIS_TIMEOUT = float(os.getenv('PAGE_CACHE_REDIS_TIMEOUT', 0.2))  # secondes
+    # Durée max. pendant laquelle un 304 peut resservir un ordre "par clics" périmé
+    PAGE_REVALIDATE_WINDOW = int(os.getenv('PAGE_REVALIDATE_WINDOW', 300))
+
+    # TENDANCES : intervalle de recalcul de l'instantané (secondes)
+    TRENDS_REFRESH_INTERVAL = int(os.getenv('TRENDS_REFRESH_INTERVAL', 300))
+
     # SÉCURITÉ : Rate limiting
     RATELIMIT_STORAGE_URL = os.getenv("RATELIMIT_STORAGE_URL", "memory://")
     RATELIMIT_DEFAULT = os.getenv("RATELIMIT_DEFAULT", None)
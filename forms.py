@@ -5,9 +5,11 @@ SÉCURITÉ : Validation côté serveur pour éviter les injections
 """
 
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import BooleanField, HiddenField, PasswordField, SelectField, StringField, SubmitField, TextAreaField
-from wtforms.validators import DataRequired, Length, URL, ValidationError
+from wtforms.validators import DataRequired, Length, StopValidation, URL, ValidationError
 import re
+from urllib.parse import parse_qsl, urlencode, urlsplit
 
 
 def _strip_filter(value):
@@ -45,50 +47,138 @@ def _normalize_url(value):
     return value
 
 
+# Paramètres de suivi ignorés pour comparer deux liens.
+_TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "xtor"}
+
+
+def canonical_url(value):
+    """Clé de comparaison d'un lien : www.Site.re/page/?utm_source=x -> site.re/page.
+
+    Schéma, casse de l'hôte, préfixe www., port par défaut, slash final,
+    fragment et paramètres de suivi sont ignorés.
+    """
+    value = _normalize_url(value)
+    if not value:
+        return ""
+    try:
+        parts = urlsplit(value)
+        port = parts.port
+    except ValueError:
+        return value.lower()
+    host = (parts.hostname or "").lower().rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/")
+    query = urlencode(
+        [
+            (key, val)
+            for key, val in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith("utm_") and key.lower() not in _TRACKING_PARAMS
+        ]
+    )
+    return host + path + (f"?{query}" if query else "")
+
+
+def _reject_dangerous_name(form, field):
+    """Évite les caractères dangereux dans le nom"""
+    if re.search(r'[<>"\']', field.data or ""):
+        raise ValidationError("Le nom ne peut pas contenir les caractères < > \" '")
+
+
+def _reject_scripts(form, field):
+    """Évite les scripts et balises HTML dans la description"""
+    if re.search(r'<script|javascript:|on\w+\s*=', field.data or "", re.IGNORECASE):
+        raise ValidationError("La description contient du contenu non autorisé")
+
+
+def _require_http_scheme(form, field):
+    if not (field.data or "").startswith(("http://", "https://")):
+        raise ValidationError("URL invalide")
+
+
+# Règles d'un site (filtres, validateurs) : communes à SiteForm et à l'import en masse.
+SITE_FIELD_RULES = {
+    "nom": (
+        [_sanitize_basic],
+        [
+            DataRequired(message="Le nom du site est obligatoire"),
+            Length(min=2, max=100, message="Le nom doit faire entre 2 et 100 caractères"),
+            _reject_dangerous_name,
+        ],
+    ),
+    "lien": (
+        [_normalize_url],
+        [
+            DataRequired(message="Le lien du site est obligatoire"),
+            URL(message="Veuillez entrer une URL valide (ex: example.com ou https://example.com)"),
+            _require_http_scheme,
+        ],
+    ),
+    "description": (
+        [_sanitize_multiline],
+        [
+            DataRequired(message="La description est obligatoire"),
+            Length(min=10, max=500, message="La description doit faire entre 10 et 500 caractères"),
+            _reject_scripts,
+        ],
+    ),
+}
+
+
+class _PlainField:
+    """Valeur hors formulaire, pour appliquer les validateurs WTForms."""
+
+    def __init__(self, data):
+        self.data = data
+        self.errors = []
+
+    def gettext(self, string):
+        return string
+
+    def ngettext(self, singular, plural, n):
+        return singular if n == 1 else plural
+
+
+def validate_site_fields(**values):
+    """Nettoie et valide nom / lien / description comme SiteForm.
+
+    Retourne (valeurs nettoyées, erreur) ; erreur est le premier message de
+    validation, None si tout est valide.
+    """
+    cleaned = {}
+    for name, (filters, validators) in SITE_FIELD_RULES.items():
+        field = _PlainField(str(values.get(name) or ""))
+        for apply_filter in filters:
+            field.data = apply_filter(field.data)
+        for validator in validators:
+            try:
+                validator(None, field)
+            except (StopValidation, ValidationError) as e:
+                return None, str(e)
+        cleaned[name] = field.data
+    return cleaned, None
+
+
 class SiteForm(FlaskForm):
     """Formulaire de proposition de site avec validation complète"""
     
-    nom = StringField('Nom du site', [
-        DataRequired(message="Le nom du site est obligatoire"),
-        Length(min=2, max=100, message="Le nom doit faire entre 2 et 100 caractères")
-    ], filters=[_sanitize_basic])
+    nom = StringField('Nom du site', SITE_FIELD_RULES["nom"][1], filters=SITE_FIELD_RULES["nom"][0])
     
     ville = SelectField('Ville', choices=[], filters=[_strip_filter])
     
-    lien = StringField('Lien du site', [
-        DataRequired(message="Le lien du site est obligatoire"),
-        URL(message="Veuillez entrer une URL valide (ex: example.com ou https://example.com)")
-    ], filters=[_normalize_url])
-
+    lien = StringField('Lien du site', SITE_FIELD_RULES["lien"][1], filters=SITE_FIELD_RULES["lien"][0])
     
-    description = TextAreaField('Description', [
-        DataRequired(message="La description est obligatoire"),
-        Length(min=10, max=500, message="La description doit faire entre 10 et 500 caractères")
-    ], filters=[_sanitize_multiline])
+    description = TextAreaField(
+        'Description', SITE_FIELD_RULES["description"][1], filters=SITE_FIELD_RULES["description"][0]
+    )
     
     categorie = SelectField('Catégorie', [
         DataRequired(message="Veuillez sélectionner une catégorie")
     ], choices=[], filters=[_strip_filter])
     honeypot = StringField('Ne pas remplir ce champ', render_kw={"autocomplete": "off"}, filters=[_strip_filter])
     
-    def validate_nom(self, field):
-        """Validation personnalisée pour le nom"""
-        # Évite les caractères dangereux
-        if re.search(r'[<>"\']', field.data or ""):
-            raise ValidationError("Le nom ne peut pas contenir les caractères < > \" '")
-    
-    def validate_description(self, field):
-        """Validation personnalisée pour la description"""
-        # Évite les scripts et balises HTML
-        if re.search(r'<script|javascript:|on\w+\s*=', field.data, re.IGNORECASE):
-            raise ValidationError("La description contient du contenu non autorisé")
-    
-    def validate_lien(self, field):
-        """Validation personnalisée pour le lien"""
-        if not field.data.startswith(("http://", "https://")):
-            raise ValidationError("URL invalide")
-
-
     def validate_honeypot(self, field):
         """Champ trappé pour les robots : doit rester vide"""
         if field.data:
@@ -126,6 +216,22 @@ class ModerationActionForm(FlaskForm):
     return_to = HiddenField()
 
 
+class BulkModerationForm(FlaskForm):
+    """Même action de modération appliquée à plusieurs propositions"""
+
+    action = SelectField(
+        "Action groupée",
+        choices=[
+            ("approve", "Valider"),
+            ("reject", "Refuser"),
+            ("pending", "Remettre en attente"),
+            ("delete", "Supprimer"),
+        ],
+        validators=[DataRequired()],
+    )
+    return_to = HiddenField()
+
+
 class AdminSiteForm(SiteForm):
     """Formulaire complet pour la création/édition d'un site côté admin"""
 
@@ -141,6 +247,29 @@ class AdminSiteForm(SiteForm):
     en_vedette = BooleanField("Mettre en vedette", default=False)
 
 
+class SiteImportForm(FlaskForm):
+    """Import en masse de sites (CSV ou JSON)"""
+
+    fichier = FileField(
+        "Fichier CSV ou JSON",
+        validators=[
+            FileRequired(message="Sélectionne un fichier à importer"),
+            FileAllowed(["csv", "json"], message="Formats acceptés : .csv, .json"),
+        ],
+    )
+    status = SelectField(
+        "Statut par défaut",
+        choices=[
+            ("valide", "Publié"),
+            ("en_attente", "En attente"),
+            ("refuse", "Refusé"),
+        ],
+        default="valide",
+    )
+    dry_run = BooleanField("Simulation (aucune écriture)", default=True)
+    submit = SubmitField("Importer")
+
+
 class CategoryForm(FlaskForm):
     """CRUD catégories côté admin"""
 
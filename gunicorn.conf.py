@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Configuration Gunicorn lue automatiquement depuis le dossier de lancement."""
+
+
+def post_worker_init(worker):
+    # Index de recherche et threads d'arrière-plan prêts avant la première requête.
+    from app import start_worker_services
+
+    start_worker_services()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+HyperLogLog pour Réunion Wiki
+PERFORMANCE : estimation des visiteurs uniques par site et par jour à taille
+fixe (512 octets par croquis, erreur type ~4,6 %), fusionnable entre jours.
+Les croquis sont stockés en BLOB dans site_click_daily.visitors ; des
+fonctions SQL permettent de les fusionner et de les compter dans les requêtes.
+"""
+
+import hashlib
+import math
+
+PRECISION = 9
+REGISTERS = 1 << PRECISION
+_HASH_BITS = 64
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+class HyperLogLog:
+    """Croquis HyperLogLog (registres d'un octet, hachage blake2b 64 bits)."""
+
+    __slots__ = ("registers",)
+
+    def __init__(self, registers=None):
+        if registers is None:
+            self.registers = bytearray(REGISTERS)
+        elif len(registers) != REGISTERS:
+            raise ValueError(f"Croquis HyperLogLog invalide ({len(registers)} octets)")
+        else:
+            self.registers = bytearray(registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data) if data else cls()
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+        hashed = int.from_bytes(digest, "big")
+        index = hashed >> (_HASH_BITS - PRECISION)
+        remaining = hashed & ((1 << (_HASH_BITS - PRECISION)) - 1)
+        rank = (_HASH_BITS - PRECISION) - remaining.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """Union en place (max registre par registre)."""
+        other_registers = other.registers if isinstance(other, HyperLogLog) else other
+        if other_registers:
+            self.registers = bytearray(map(max, self.registers, other_registers))
+        return self
+
+    def count(self):
+        zeros = self.registers.count(0)
+        if zeros == REGISTERS:
+            return 0
+        estimate = _ALPHA * REGISTERS * REGISTERS / sum(2.0 ** -r for r in self.registers)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Petites cardinalités : comptage linéaire, plus précis.
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return int(round(estimate))
+
+
+def merge_sketches(left, right):
+    """hll_merge(a, b) : union de deux BLOB (NULL = croquis vide)."""
+    if not left:
+        return right
+    if not right:
+        return left
+    return HyperLogLog(left).merge(right).to_bytes()
+
+
+def count_sketch(data):
+    """hll_count(blob) : cardinalité estimée (0 pour NULL)."""
+    return HyperLogLog.from_bytes(data).count() if data else 0
+
+
+class _SketchUnion:
+    """Agrégat hll_union(blob) : union des croquis d'un groupe."""
+
+    def __init__(self):
+        self.sketch = None
+
+    def step(self, data):
+        if not data:
+            return
+        if self.sketch is None:
+            self.sketch = HyperLogLog(data)
+        else:
+            self.sketch.merge(data)
+
+    def finalize(self):
+        return self.sketch.to_bytes() if self.sketch is not None else None
+
+
+class _SketchBuild:
+    """Agrégat hll_build(valeur) : croquis des valeurs d'un groupe."""
+
+    def __init__(self):
+        self.sketch = None
+
+    def step(self, value):
+        if value is None:
+            return
+        if self.sketch is None:
+            self.sketch = HyperLogLog()
+        self.sketch.add(value)
+
+    def finalize(self):
+        return self.sketch.to_bytes() if self.sketch is not None else None
+
+
+def register_sqlite_functions(conn):
+    conn.create_function("hll_merge", 2, merge_sketches, deterministic=True)
+    conn.create_function("hll_count", 1, count_sketch, deterministic=True)
+    conn.create_aggregate("hll_union", 1, _SketchUnion)
+    conn.create_aggregate("hll_build", 1, _SketchBuild)
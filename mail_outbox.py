@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+Boîte d'envoi des emails pour Réunion Wiki
+PERFORMANCE : la requête n'écrit qu'une ligne dans email_outbox, dans la même
+transaction que la proposition ; un thread expéditeur vide la table à travers
+une connexion SMTP gardée ouverte entre les messages, avec reprises espacées
+(backoff exponentiel) en cas d'échec. Aucune E/S réseau dans le POST.
+En mode résumé (MAIL_DIGEST_ENABLED), les propositions s'accumulent dans
+email_digest_items et partent en un seul message périodique.
+"""
+
+import atexit
+import json
+import logging
+import os
+import secrets
+import smtplib
+import sqlite3
+import ssl
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+EMAIL_OUTBOX_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS email_outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        body TEXT NOT NULL,
+        recipients TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at DATETIME NOT NULL,
+        next_attempt_at DATETIME NOT NULL,
+        claim_token TEXT,
+        claimed_until DATETIME,
+        sent_at DATETIME,
+        last_error TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at)",
+    "CREATE INDEX IF NOT EXISTS idx_email_outbox_kind ON email_outbox(kind, created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS email_digest_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+    """,
+]
+
+DIGEST_KIND = "digest"
+
+
+def _timestamp(moment=None):
+    return (moment or datetime.now(timezone.utc)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse_timestamp(value):
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+
+
+def enqueue_email(conn, kind, subject, body, recipients):
+    """Ajoute un message à la boîte d'envoi, sans valider la transaction.
+
+    L'appelant valide avec le reste de son écriture : le message n'existe que
+    si la proposition a bien été enregistrée.
+    """
+    now = _timestamp()
+    conn.execute(
+        """
+        INSERT INTO email_outbox (kind, subject, body, recipients, created_at, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (kind, subject, body, ", ".join(recipients), now, now),
+    )
+
+
+def enqueue_digest_item(conn, kind, payload):
+    """Met une notification de côté pour le prochain résumé (transaction de l'appelant)."""
+    conn.execute(
+        "INSERT INTO email_digest_items (kind, payload, created_at) VALUES (?, ?, ?)",
+        (kind, json.dumps(payload, ensure_ascii=False), _timestamp()),
+    )
+
+
+class SmtpConnection:
+    """Connexion SMTP persistante : ouverte au premier envoi, réutilisée,
+    refermée après `idle_timeout` secondes d'inactivité.
+
+    `factory(config, timeout)` ouvre une session prête à envoyer (tests :
+    serveur SMTP local ou faux client).
+    """
+
+    def __init__(self, config, timeout=10, idle_timeout=60, factory=None):
+        self.config = config
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.factory = factory or open_smtp_session
+        self.opened = 0
+        self._smtp = None
+        self._last_used = 0.0
+
+    def send(self, message):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+        if self._smtp is None:
+            self._smtp = self.factory(self.config, self.timeout)
+            self.opened += 1
+        try:
+            self._smtp.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Le serveur a fermé la session entre deux messages : une reconnexion.
+            self._smtp = None
+            self._smtp = self.factory(self.config, self.timeout)
+            self.opened += 1
+            self._smtp.send_message(message)
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+
+def open_smtp_session(config, timeout):
+    """Session SMTP(S) authentifiée selon les réglages MAIL_*."""
+    server = config.get("MAIL_SERVER")
+    port = config.get("MAIL_PORT")
+    context = ssl.create_default_context()
+    if config.get("MAIL_USE_SSL"):
+        smtp = smtplib.SMTP_SSL(server, port, timeout=timeout, context=context)
+    else:
+        smtp = smtplib.SMTP(server, port, timeout=timeout)
+        smtp.ehlo()
+        if config.get("MAIL_USE_TLS"):
+            smtp.starttls(context=context)
+            smtp.ehlo()
+    username = config.get("MAIL_USERNAME")
+    password = config.get("MAIL_PASSWORD")
+    if username and password:
+        smtp.login(username, password)
+    return smtp
+
+
+class OutboxSender:
+    """Expéditeur de la boîte d'envoi, dans un thread du worker.
+
+    `connect` ouvre la connexion SQLite du thread. Plusieurs workers peuvent
+    tourner en même temps : chaque lot est réservé (claim_token,
+    claimed_until) avant l'envoi. `drain(conn)` est utilisable seul (commande
+    flask send-outbox, tests).
+
+    `render_digest(items)` -> (sujet, corps) active le mode résumé : un
+    message part quand le plus ancien élément a `digest_interval` secondes, ou
+    plus tôt dès `digest_max_items` éléments, mais jamais moins de
+    `digest_min_gap` secondes après le résumé précédent. Un résumé regroupe au
+    plus `digest_batch_size` éléments : le surplus part au passage suivant.
+    """
+
+    def __init__(self, connect, config, smtp=None, batch_size=20, poll_interval=5.0,
+                 max_attempts=8, retry_base_delay=30, retry_max_delay=3600, render_digest=None,
+                 digest_interval=1800, digest_max_items=20, digest_min_gap=300,
+                 digest_batch_size=100, logger=None):
+        self.connect = connect
+        self.config = config
+        self.smtp = smtp or SmtpConnection(
+            config,
+            timeout=config.get("MAIL_SMTP_TIMEOUT", 10),
+            idle_timeout=config.get("MAIL_SMTP_IDLE_TIMEOUT", 60),
+        )
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.render_digest = render_digest
+        self.digest_interval = digest_interval
+        self.digest_max_items = digest_max_items
+        self.digest_min_gap = digest_min_gap
+        self.digest_batch_size = max(int(digest_batch_size), 1)
+        self.logger = logger or logging.getLogger(__name__)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def wake(self):
+        """Signale un nouveau message (appelé après le commit de la requête)."""
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        """Démarre le thread du worker courant (au démarrage du worker : les
+        messages en attente ou en reprise partent sans attendre une proposition)."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Après un fork, la session SMTP héritée appartient au parent.
+                self.smtp._smtp = None
+                self._wake = threading.Event()
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="outbox-sender", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Dernier passage sur la boîte d'envoi puis arrêt (fin du process)."""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or self._pid != os.getpid():
+            return
+        self._stopping = True
+        self._wake.set()
+        thread.join(timeout)
+
+    def _run(self):
+        conn = None
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                if conn is None:
+                    conn = self.connect()
+                if self.render_digest is not None:
+                    self.flush_digest(conn)
+                self.drain(conn)
+            except sqlite3.Error as e:
+                self.logger.error(f"[MAIL] Lecture de la boîte d'envoi impossible: {e}")
+                if conn is not None:
+                    conn.close()
+                conn = None
+            except Exception as e:
+                self.logger.exception(f"[MAIL] Erreur de l'expéditeur: {e}")
+            self.smtp.close_if_idle()
+            if self._stopping:
+                break
+        self.smtp.close()
+        if conn is not None:
+            conn.close()
+
+    def flush_digest(self, conn, force=False):
+        """Transforme les éléments en attente en un message résumé s'il est dû.
+
+        Retourne le nombre d'éléments regroupés (0 si rien n'est parti).
+        """
+        # Décision sur des agrégats : les éléments ne sont lus qu'au moment d'envoyer.
+        pending, oldest = conn.execute(
+            "SELECT COUNT(*), MIN(created_at) FROM email_digest_items"
+        ).fetchone()
+        if not pending:
+            return 0
+        recipients = self.config.get("MAIL_RECIPIENTS", [])
+        if not recipients:
+            # Personne à prévenir : les éléments ne s'accumulent pas indéfiniment.
+            conn.execute("DELETE FROM email_digest_items")
+            conn.commit()
+            self.logger.warning(
+                f"[MAIL] Résumé non envoyé : aucun destinataire configuré, {pending} notification(s) supprimée(s)."
+            )
+            return 0
+        now = datetime.now(timezone.utc)
+        oldest_age = (now - _parse_timestamp(oldest)).total_seconds()
+        due = force or oldest_age >= self.digest_interval
+        if not due and pending >= self.digest_max_items:
+            last_digest = conn.execute(
+                "SELECT MAX(created_at) FROM email_outbox WHERE kind = ?", (DIGEST_KIND,)
+            ).fetchone()[0]
+            due = last_digest is None or (now - _parse_timestamp(last_digest)).total_seconds() >= self.digest_min_gap
+        if not due:
+            return 0
+
+        rows = conn.execute(
+            "SELECT id, payload FROM email_digest_items ORDER BY id LIMIT ?", (self.digest_batch_size,)
+        ).fetchall()
+        subject, body = self.render_digest([json.loads(row[1]) for row in rows])
+        try:
+            cur = conn.execute("DELETE FROM email_digest_items WHERE id <= ?", (rows[-1][0],))
+            if cur.rowcount != len(rows):
+                # Un autre worker a pris (une partie de) ces éléments entre-temps.
+                conn.rollback()
+                return 0
+            enqueue_email(conn, DIGEST_KIND, subject, body, recipients)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.logger.info(f"[MAIL] Résumé de {len(rows)} notification(s) mis en file")
+        return len(rows)
+
+    def _claim(self, conn):
+        token = secrets.token_hex(8)
+        now = datetime.now(timezone.utc)
+        with conn:
+            conn.execute(
+                """
+                UPDATE email_outbox
+                SET claim_token = ?, claimed_until = ?
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE status = 'pending'
+                      AND next_attempt_at <= ?
+                      AND (claimed_until IS NULL OR claimed_until < ?)
+                    ORDER BY id
+                    LIMIT ?
+                )
+                """,
+                (token, _timestamp(now + timedelta(minutes=5)), _timestamp(now), _timestamp(now), self.batch_size),
+            )
+        return conn.execute(
+            "SELECT id, subject, body, recipients, attempts FROM email_outbox WHERE claim_token = ? ORDER BY id",
+            (token,),
+        ).fetchall()
+
+    def retry_delay(self, attempts):
+        return min(self.retry_base_delay * (2 ** (attempts - 1)), self.retry_max_delay)
+
+    def drain(self, conn):
+        """Envoie les messages dus ; retourne le nombre de messages envoyés."""
+        sent = 0
+        while True:
+            rows = self._claim(conn)
+            if not rows:
+                return sent
+            for index, row in enumerate(rows):
+                message_id, subject, body, recipients, attempts = row
+                message = EmailMessage()
+                message["Subject"] = subject
+                message["From"] = (
+                    self.config.get("MAIL_DEFAULT_SENDER")
+                    or self.config.get("MAIL_USERNAME")
+                    or recipients.split(",")[0].strip()
+                )
+                message["To"] = recipients
+                message.set_content(body)
+                try:
+                    self.smtp.send(message)
+                except Exception as e:
+                    self.smtp.close()
+                    self._record_failure(conn, message_id, attempts + 1, e)
+                    # Serveur en panne : inutile d'essayer le reste du lot maintenant.
+                    self._release(conn, [r[0] for r in rows[index + 1:]])
+                    return sent
+                with conn:
+                    conn.execute(
+                        """
+                        UPDATE email_outbox
+                        SET status = 'sent', sent_at = ?, attempts = ?, claim_token = NULL, claimed_until = NULL
+                        WHERE id = ?
+                        """,
+                        (_timestamp(), attempts + 1, message_id),
+                    )
+                sent += 1
+            self.logger.info(f"[MAIL] {len(rows)} message(s) envoyé(s)")
+
+    def _record_failure(self, conn, message_id, attempts, error):
+        status = FAILED if attempts >= self.max_attempts else PENDING
+        next_attempt = datetime.now(timezone.utc) + timedelta(seconds=self.retry_delay(attempts))
+        with conn:
+            conn.execute(
+                """
+                UPDATE email_outbox
+                SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?,
+                    claim_token = NULL, claimed_until = NULL
+                WHERE id = ?
+                """,
+                (status, attempts, _timestamp(next_attempt), str(error)[:500], message_id),
+            )
+        if status == FAILED:
+            self.logger.error(f"[MAIL] Message #{message_id} abandonné après {attempts} essais: {error}")
+        else:
+            self.logger.warning(f"[MAIL] Envoi du message #{message_id} échoué (essai {attempts}): {error}")
+
+    def _release(self, conn, message_ids):
+        if not message_ids:
+            return
+        with conn:
+            conn.executemany(
+                "UPDATE email_outbox SET claim_token = NULL, claimed_until = NULL WHERE id = ?",
+                [(message_id,) for message_id in message_ids],
+            )
+
+
+def create_outbox_sender(connect, config, render_digest=None, logger=None):
+    sender = OutboxSender(
+        connect,
+        config,
+        batch_size=config.get("MAIL_OUTBOX_BATCH_SIZE", 20),
+        poll_interval=config.get("MAIL_OUTBOX_POLL_INTERVAL", 5.0),
+        max_attempts=config.get("MAIL_OUTBOX_MAX_ATTEMPTS", 8),
+        retry_base_delay=config.get("MAIL_RETRY_BASE_DELAY", 30),
+        render_digest=render_digest if config.get("MAIL_DIGEST_ENABLED") else None,
+        digest_interval=config.get("MAIL_DIGEST_INTERVAL_MINUTES", 30) * 60,
+        digest_max_items=config.get("MAIL_DIGEST_MAX_ITEMS", 20),
+        digest_min_gap=config.get("MAIL_DIGEST_MIN_GAP_MINUTES", 5) * 60,
+        digest_batch_size=config.get("MAIL_DIGEST_BATCH_SIZE", 100),
+        logger=logger,
+    )
+    atexit.register(sender.stop)
+    return sender
@@ -2,6 +2,7 @@ import os
 import re
 import shutil
 import sqlite3
+import sys
 from datetime import datetime
 from flask import Flask
 from config import config
@@ -257,12 +258,13 @@ def _drop_sites_ville_column(cur) -> bool:
 def main():
     print("📂 DB cible:", DATABASE_PATH)
 
-    # Backup auto
-    os.makedirs("backups", exist_ok=True)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = os.path.join("backups", f"base_backup_{ts}.db")
-    shutil.copy2(DATABASE_PATH, backup_path)
-    print("💾 Backup créé:", backup_path)
+    # Backup auto (rien à sauvegarder pour une base neuve)
+    if os.path.exists(DATABASE_PATH):
+        os.makedirs("backups", exist_ok=True)
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = os.path.join("backups", f"base_backup_{ts}.db")
+        shutil.copy2(DATABASE_PATH, backup_path)
+        print("💾 Backup créé:", backup_path)
 
     conn = sqlite3.connect(DATABASE_PATH)
     cur = conn.cursor()
@@ -463,6 +465,13 @@ def main():
         cur.execute("CREATE INDEX IF NOT EXISTS idx_villes_slug ON villes(slug)")
 
         conn.commit()
+
+        # Finalise le schéma applicatif (index + PRAGMA user_version) : seul
+        # point d'entrée du DDL, l'app n'en exécute plus au démarrage.
+        from app import SCHEMA_VERSION, ensure_db_schema
+
+        ensure_db_schema()
+        print(f"🏷️  Schéma applicatif v{SCHEMA_VERSION}")
         print("✅ Migration terminée avec succès")
 
     except Exception as e:
@@ -474,4 +483,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except Exception:
+        # Code de sortie non nul : le Dockerfile ne lance pas gunicorn sur un schéma incomplet.
+        sys.exit(1)
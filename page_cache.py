@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de pages complètes pour Réunion Wiki
+PERFORMANCE : les pages publiques vues par un visiteur anonyme sont gardées
+(corps HTML déjà rendu) sous la clé URL complète. L'appelant écarte les
+entrées périmées (version des données) ; les étiquettes ("trends", ...)
+purgent les pages dont le contenu ne suit pas cette version. Backend LRU en
+mémoire du worker, ou Redis partagé entre workers.
+Les versions gzip et brotli du corps sont calculées une fois au remplissage
+et servies selon Accept-Encoding (nginx ne recompresse pas une réponse qui a
+déjà un Content-Encoding).
+"""
+
+import gzip
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # dépendance optionnelle : gzip seul
+    brotli = None
+
+# En dessous, la compression ne fait rien gagner (même seuil que gzip_min_length).
+COMPRESS_MIN_LENGTH = 1024
+
+
+def compress_bodies(body):
+    """Corps identity + gzip (+ br si brotli est installé), à stocker dans l'entrée."""
+    bodies = {"identity": body}
+    if len(body) < COMPRESS_MIN_LENGTH:
+        return bodies
+    # Compression faite pendant la requête qui remplit le cache : niveaux moyens,
+    # les niveaux maximaux coûtent plusieurs fois plus de CPU pour quelques %.
+    bodies["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, mode=brotli.MODE_TEXT, quality=5)
+    return bodies
+
+
+def select_body(bodies, accept_encodings):
+    """(encodage, corps) le plus adapté à l'en-tête Accept-Encoding ("identity" par défaut)."""
+    # Ordre de préférence serveur à qualité égale : br, puis gzip.
+    offered = [encoding for encoding in ("br", "gzip") if encoding in bodies]
+    encoding = accept_encodings.best_match(offered) if offered else None
+    if encoding is None:
+        return "identity", bodies["identity"]
+    return encoding, bodies[encoding]
+
+
+class MemoryPageCache:
+    """LRU borné avec expiration, index étiquette -> clés."""
+
+    def __init__(self, ttl=300, max_entries=500):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, entry, _tags = item
+            if expires_at <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, tags=()):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            tags = frozenset(tags)
+            self._entries[key] = (time.monotonic() + self.ttl, entry, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        """Supprime les pages portant l'une des étiquettes ; retourne leur nombre."""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.pop(tag, set())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _drop(self, key):
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisPageCache:
+    """Même contrat, partagé entre workers : un hash par page, un set par étiquette.
+
+    Redis indisponible ou figé (délais réseau `socket_timeout`, en secondes) :
+    lecture manquée et écriture ignorée (la page est rendue normalement),
+    jamais d'erreur côté visiteur.
+    """
+
+    def __init__(self, url, ttl=300, prefix="rw:page:", socket_timeout=0.2, logger=None):
+        import redis
+
+        self.client = redis.Redis.from_url(
+            url, socket_timeout=socket_timeout, socket_connect_timeout=socket_timeout
+        )
+        self.ttl = ttl
+        self.prefix = prefix
+        self.logger = logger or logging.getLogger(__name__)
+
+    def _page_key(self, key):
+        return f"{self.prefix}p:{key}"
+
+    def _tag_key(self, tag):
+        return f"{self.prefix}t:{tag}"
+
+    def get(self, key):
+        try:
+            data = self.client.hgetall(self._page_key(key))
+        except Exception as e:
+            self.logger.warning(f"[CACHE] Redis indisponible (lecture): {e}")
+            return None
+        if not data:
+            return None
+        entry = json.loads(data.pop(b"meta"))
+        for field, value in data.items():
+            entry.setdefault("bodies", {})[field.decode("ascii")] = value
+        return entry
+
+    def set(self, key, entry, tags=()):
+        meta = {name: value for name, value in entry.items() if name != "bodies"}
+        mapping = {"meta": json.dumps(meta)}
+        mapping.update(entry.get("bodies", {}))
+        page_key = self._page_key(key)
+        try:
+            pipe = self.client.pipeline()
+            pipe.delete(page_key)
+            pipe.hset(page_key, mapping=mapping)
+            pipe.expire(page_key, self.ttl)
+            for tag in tags:
+                pipe.sadd(self._tag_key(tag), key)
+                pipe.expire(self._tag_key(tag), self.ttl)
+            pipe.execute()
+        except Exception as e:
+            self.logger.warning(f"[CACHE] Redis indisponible (écriture): {e}")
+
+    def invalidate(self, tags):
+        try:
+            keys = set()
+            for tag in tags:
+                keys |= self.client.smembers(self._tag_key(tag))
+            pipe = self.client.pipeline()
+            for key in keys:
+                pipe.delete(self._page_key(key.decode("utf-8")))
+            for tag in tags:
+                pipe.delete(self._tag_key(tag))
+            pipe.execute()
+            return len(keys)
+        except Exception as e:
+            self.logger.warning(f"[CACHE] Redis indisponible (invalidation): {e}")
+            return 0
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}*", count=500))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            self.logger.warning(f"[CACHE] Redis indisponible (purge): {e}")
+
+
+def create_page_cache(config, logger=None):
+    if not config.get("PAGE_CACHE_ENABLED", True):
+        return None
+    url = config.get("PAGE_CACHE_STORAGE_URL") or "memory://"
+    ttl = int(config.get("PAGE_CACHE_TTL", 300))
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisPageCache(
+            url, ttl=ttl, socket_timeout=float(config.get("PAGE_CACHE_REDIS_TIMEOUT", 0.2)), logger=logger
+        )
+    return MemoryPageCache(ttl=ttl, max_entries=int(config.get("PAGE_CACHE_MAX_ENTRIES", 500)))
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Index de recherche en mémoire pour Réunion Wiki
+PERFORMANCE : structures construites une fois par worker, sans requête SQL par saisie
+"""
+
+import bisect
+import re
+import unicodedata
+from collections import Counter
+
+
+def normalize_text(text):
+    """Minuscules sans accents, pour comparer des saisies libres."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return text.lower()
+
+
+def trigrams(text):
+    """Trigrammes façon pg_trgm : chaque mot est entouré d'espaces ("  mot ")."""
+    grams = set()
+    for word in re.findall(r"[a-z0-9]+", normalize_text(text)):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """Index inversé trigramme -> entrées, pour les recherches approximatives.
+
+    Chaque entrée est un dict avec au moins "label" (texte indexé) et "clicks".
+    Le score combine la similarité de Jaccard et la part des trigrammes de la
+    requête retrouvés dans le libellé (utile pour les noms longs).
+    """
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self._grams = []
+        self._postings = {}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        grams = trigrams(entry.get("label"))
+        if not grams:
+            return
+        position = len(self.entries)
+        self.entries.append(entry)
+        self._grams.append(len(grams))
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(position)
+
+    def search(self, text, limit=10, threshold=0.35, kinds=None):
+        """Retourne [(score, entry), ...] triés par score puis clics."""
+        query_grams = trigrams(text)
+        if not query_grams:
+            return []
+
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self._postings.get(gram, ()))
+
+        results = []
+        query_size = len(query_grams)
+        for position, common in shared.items():
+            entry = self.entries[position]
+            if kinds and entry.get("kind") not in kinds:
+                continue
+            jaccard = common / (query_size + self._grams[position] - common)
+            containment = common / query_size
+            score = max(jaccard, 0.8 * containment)
+            if score >= threshold:
+                results.append((score, entry))
+
+        results.sort(key=lambda item: (-round(item[0], 2), -(item[1].get("clicks") or 0)))
+        return results[:limit]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PrefixIndex:
+    """Autocomplétion par préfixe : tableau trié + bisect.
+
+    Chaque libellé est indexé à partir de chacun de ses mots ("Pôle Emploi"
+    répond à "pol" et à "empl"). Les préfixes courts et ceux qui couvrent
+    beaucoup d'entrées ("saint") ont leur top précalculé à la construction :
+    une recherche ne parcourt jamais plus de HEAVY_RANGE clés.
+    """
+
+    SHORT_PREFIX = 2
+    HEAVY_RANGE = 64
+
+    def __init__(self, entries=(), top_size=10):
+        self.entries = list(entries)
+        self.top_size = top_size
+        keyed = []
+        for position, entry in enumerate(self.entries):
+            words = re.findall(r"[a-z0-9]+", normalize_text(entry.get("label")))
+            for i in range(len(words)):
+                # rang 0 = le libellé commence par le préfixe (prioritaire)
+                keyed.append((" ".join(words[i:]), 0 if i == 0 else 1, position))
+        keyed.sort()
+        self._keys = [key for key, _rank, _position in keyed]
+        self._hits = [(rank, position) for _key, rank, position in keyed]
+        self._top = {}
+        self._precompute_tops()
+
+    def _precompute_tops(self):
+        """Affine les plages de clés par longueur de préfixe croissante."""
+        groups = [(0, len(self._keys))]
+        length = 1
+        while groups:
+            next_groups = []
+            for lo, hi in groups:
+                i = lo
+                while i < hi:
+                    if len(self._keys[i]) < length:
+                        i += 1
+                        continue
+                    prefix = self._keys[i][:length]
+                    j = i + 1
+                    while j < hi and self._keys[j].startswith(prefix):
+                        j += 1
+                    heavy = j - i > self.HEAVY_RANGE
+                    if heavy or length <= self.SHORT_PREFIX:
+                        self._top[prefix] = self._collect(i, j)
+                    if heavy or length < self.SHORT_PREFIX:
+                        next_groups.append((i, j))
+                    i = j
+            groups = next_groups
+            length += 1
+
+    def _collect(self, lo, hi):
+        candidates = {}
+        for rank, position in self._hits[lo:hi]:
+            if rank < candidates.get(position, 2):
+                candidates[position] = rank
+        return self._rank(candidates)[:self.top_size]
+
+    def _rank(self, candidates):
+        def sort_key(item):
+            position, rank = item
+            entry = self.entries[position]
+            return rank, -(entry.get("clicks") or 0), entry.get("label") or ""
+
+        ordered = sorted(candidates.items(), key=sort_key)
+        return [self.entries[position] for position, _rank in ordered]
+
+    def search(self, text, limit=8):
+        prefix = " ".join(re.findall(r"[a-z0-9]+", normalize_text(text)))
+        if not prefix:
+            return []
+        limit = min(limit, self.top_size)
+        if prefix in self._top:
+            return self._top[prefix][:limit]
+        if len(prefix) <= self.SHORT_PREFIX:
+            return []
+
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = lo
+        while hi < len(self._keys) and self._keys[hi].startswith(prefix):
+            hi += 1
+        return self._collect(lo, hi)[:limit]
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Import en masse de sites pour Réunion Wiki
+PERFORMANCE : catégories, villes et liens existants sont chargés une fois en
+mémoire (au lieu des requêtes resolve_category / resolve_city ligne par ligne),
+puis toutes les lignes retenues sont insérées par executemany dans une seule
+transaction. Un passage "dry run" produit le même rapport sans rien écrire.
+"""
+
+import csv
+import io
+import json
+
+from forms import canonical_url, validate_site_fields
+
+SITE_STATUSES = ("valide", "en_attente", "refuse")
+
+# En-têtes acceptés -> champ du formulaire.
+_FIELD_ALIASES = {
+    "nom": "nom",
+    "name": "nom",
+    "titre": "nom",
+    "lien": "lien",
+    "url": "lien",
+    "description": "description",
+    "categorie": "categorie",
+    "catégorie": "categorie",
+    "category": "categorie",
+    "ville": "ville",
+    "city": "ville",
+    "status": "status",
+    "statut": "status",
+    "en_vedette": "en_vedette",
+    "vedette": "en_vedette",
+}
+
+_TRUE_VALUES = {"1", "true", "oui", "yes", "x", "vrai"}
+
+
+def _canonical_record(record):
+    row = {}
+    for key, value in record.items():
+        field = _FIELD_ALIASES.get(str(key or "").strip().lower())
+        if field and field not in row:
+            row[field] = value if isinstance(value, (str, bool, int)) else ("" if value is None else str(value))
+    return row
+
+
+def parse_import_file(data, filename=""):
+    """Lit un fichier CSV (séparateur , ; ou tabulation) ou JSON.
+
+    Retourne une liste de (numéro de ligne, dict). Lève ValueError si le
+    fichier est illisible.
+    """
+    if isinstance(data, bytes):
+        try:
+            data = data.decode("utf-8-sig")
+        except UnicodeDecodeError as e:
+            raise ValueError("Le fichier doit être encodé en UTF-8.") from e
+    text = data.lstrip("\ufeff")
+
+    if filename.lower().endswith(".json") or text.lstrip().startswith(("[", "{")):
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON invalide (ligne {e.lineno}).") from e
+        if isinstance(payload, dict):
+            payload = payload.get("sites")
+        if not isinstance(payload, list):
+            raise ValueError("Le JSON doit être une liste de sites (ou {\"sites\": [...]}).")
+        return [
+            (index, _canonical_record(item) if isinstance(item, dict) else {})
+            for index, item in enumerate(payload, start=1)
+        ]
+
+    first_line = text.split("\n", 1)[0]
+    try:
+        dialect = csv.Sniffer().sniff(first_line, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    if not reader.fieldnames or "lien" not in {_FIELD_ALIASES.get(h.strip().lower()) for h in reader.fieldnames}:
+        raise ValueError("En-tête CSV manquant : colonnes attendues nom, lien, description, categorie, ville.")
+    # Ligne 1 = en-tête.
+    return [(reader.line_num, _canonical_record(record)) for record in reader]
+
+
+class NameLookup:
+    """Résolution nom -> (id, nom) en mémoire, mêmes règles que resolve_category/resolve_city."""
+
+    def __init__(self, rows, slug_func):
+        self.slug_func = slug_func
+        self.by_name = {}
+        self.by_folded = {}
+        self.by_slug = {}
+        self.slugs = set()
+        for row in sorted(rows, key=lambda r: r["id"]):
+            self.add(row["id"], row["nom"], row["slug"])
+
+    def add(self, item_id, nom, slug):
+        self.by_name.setdefault(nom, (item_id, nom))
+        self.by_folded.setdefault(nom.strip().lower(), (item_id, nom))
+        self.by_slug.setdefault(slug, (item_id, nom))
+        self.slugs.add(slug)
+
+    def resolve(self, name, match_slug=True):
+        name = (name or "").strip()
+        if not name:
+            return None
+        found = self.by_name.get(name) or self.by_folded.get(name.lower())
+        if found is None and match_slug:
+            found = self.by_slug.get(self.slug_func(name))
+        return found
+
+    def unique_slug(self, name, fallback):
+        base_slug = self.slug_func(name) or fallback
+        candidate = base_slug
+        suffix = 1
+        while candidate in self.slugs:
+            candidate = f"{base_slug}-{suffix}"
+            suffix += 1
+        return candidate
+
+
+def _validate_row(row, default_status):
+    """Applique les règles de SiteForm ; retourne (valeurs, erreur)."""
+    values, error = validate_site_fields(nom=row.get("nom"), lien=row.get("lien"), description=row.get("description"))
+    if error:
+        return None, error
+    status = str(row.get("status") or "").strip().lower() or default_status
+    if status not in SITE_STATUSES:
+        return None, f"statut inconnu « {status} »"
+    vedette = row.get("en_vedette")
+    values["status"] = status
+    values["en_vedette"] = 1 if (vedette is True or str(vedette or "").strip().lower() in _TRUE_VALUES) else 0
+    return values, None
+
+
+def import_sites(conn, records, category_slug, city_slug, default_status="valide", dry_run=False):
+    """Importe des sites en une transaction ; retourne le rapport d'import.
+
+    category_slug / city_slug : fonctions de slug de l'application (slugify,
+    slugify_ville). Les catégories inconnues sont créées (comme
+    resolve_category), les villes inconnues rejettent la ligne.
+    """
+    cur = conn.cursor()
+    categories = NameLookup(cur.execute("SELECT id, nom, slug FROM categories").fetchall(), category_slug)
+    cities = NameLookup(cur.execute("SELECT id, nom, slug FROM villes").fetchall(), city_slug)
+    known_urls = dict(
+        cur.execute("SELECT lien_canonique, id FROM sites WHERE lien_canonique IS NOT NULL").fetchall()
+    )
+
+    report = {
+        "total": len(records),
+        "created": 0,
+        "duplicates": [],
+        "errors": [],
+        "new_categories": [],
+        "dry_run": dry_run,
+    }
+    pending_categories = {}
+    seen_in_file = {}
+    to_insert = []
+
+    for line, row in records:
+        values, error = _validate_row(row, default_status)
+        if error:
+            report["errors"].append((line, row.get("lien") or row.get("nom") or "", error))
+            continue
+
+        key = canonical_url(values["lien"])
+        if key in known_urls:
+            report["duplicates"].append((line, values["lien"], f"déjà référencé (#{known_urls[key]})"))
+            continue
+        if key in seen_in_file:
+            report["duplicates"].append((line, values["lien"], f"doublon de la ligne {seen_in_file[key]}"))
+            continue
+
+        city_name = str(row.get("ville") or "").strip()
+        city = cities.resolve(city_name)
+        if city_name and city is None:
+            report["errors"].append((line, values["lien"], f"ville inconnue « {city_name} »"))
+            continue
+
+        category_name = str(row.get("categorie") or "").strip()
+        if not category_name:
+            report["errors"].append((line, values["lien"], "catégorie manquante"))
+            continue
+        category = categories.resolve(category_name, match_slug=False) or pending_categories.get(category_name.lower())
+        if category is None:
+            category = pending_categories[category_name.lower()] = category_name
+            report["new_categories"].append(category_name)
+
+        seen_in_file[key] = line
+        to_insert.append((values, key, category, city[0] if city else None))
+
+    report["created"] = len(to_insert)
+    if dry_run or not to_insert:
+        return report
+
+    try:
+        # Peu de catégories nouvelles : insertion unitaire pour récupérer les id.
+        category_ids = {}
+        for name in report["new_categories"]:
+            slug = categories.unique_slug(name, "categorie")
+            cur.execute("INSERT INTO categories (nom, slug) VALUES (?, ?)", (name, slug))
+            categories.add(cur.lastrowid, name, slug)
+            category_ids[name] = cur.lastrowid
+
+        cur.executemany(
+            """
+            INSERT INTO sites (nom, ville_id, lien, lien_canonique, description, category_id, status, date_ajout, en_vedette)
+            VALUES (?, ?, ?, ?, ?, ?, ?, DATETIME('now'), ?)
+            """,
+            [
+                (
+                    values["nom"],
+                    city_id,
+                    values["lien"],
+                    key,
+                    values["description"],
+                    category[0] if isinstance(category, tuple) else category_ids[category],
+                    values["status"],
+                    values["en_vedette"],
+                )
+                for values, key, category, city_id in to_insert
+            ],
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return report
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Fixtures communes : une base SQLite neuve par test, schéma appliqué comme migrate.py."""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Avant l'import de config.py : jamais la base de développement.
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="reunionwiki-tests-"), "base.db")
+os.environ.setdefault("FLASK_ENV", "development")
+os.environ["RATELIMIT_STORAGE_URL"] = "memory://"
+os.environ["CLICK_DEDUP_STORAGE_URL"] = "memory://"
+os.environ["PAGE_CACHE_STORAGE_URL"] = "memory://"
+os.environ["MAIL_ENABLED"] = "false"
+
+CATEGORIES = [(1, "Emploi", "emploi"), (2, "Santé", "sante")]
+VILLES = [(12, "Saint-Denis", "saint-denis"), (18, "Saint-Pierre", "saint-pierre")]
+SITES = [
+    # (nom, lien, description, category_id, status, ville_id, click_count)
+    ("Pôle Emploi Réunion", "https://www.emploi974.re/", "Offres d'emploi à Saint-Denis", 1, "valide", 12, 40),
+    ("Job Sud", "https://jobsud.re", "Annonces du sud de l'île", 1, "valide", 18, 10),
+    ("Clinique Nord", "https://clinique-nord.re", "Santé et urgences à Saint-Denis", 2, "valide", 12, 25),
+    ("Pharmacie de garde", "https://pharmacie.re", "Pharmacies ouvertes ce soir", 2, "en_attente", None, 0),
+]
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    import app as app_module
+
+    app_module.app.config.update(
+        TESTING=True,
+        WTF_CSRF_ENABLED=False,
+        CLICK_BUFFER_ENABLED=False,
+    )
+    app_module.limiter.enabled = False
+    # Pas de threads d'arrière-plan (tendances, emails) : les tests les pilotent.
+    app_module._WORKER_SERVICES["pid"] = os.getpid()
+    return app_module
+
+
+def _drain_pools(app_module):
+    for pool in app_module._DB_POOLS.values():
+        while not pool.empty():
+            pool.get_nowait().close()
+
+
+@pytest.fixture
+def db_path(app_module, tmp_path):
+    """Base neuve (schéma à jour + jeu de données minimal) pour le test courant."""
+    path = str(tmp_path / "base.db")
+    _drain_pools(app_module)
+    app_module.app.config["DATABASE_PATH"] = path
+    assert app_module.ensure_db_schema()
+
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO categories (id, nom, slug) VALUES (?, ?, ?)", CATEGORIES)
+    conn.executemany("INSERT INTO villes (id, nom, slug) VALUES (?, ?, ?)", VILLES)
+    conn.executemany(
+        """
+        INSERT INTO sites (nom, lien, lien_canonique, description, category_id, status, ville_id, click_count, date_ajout)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, DATETIME('now'))
+        """,
+        [
+            (nom, lien, app_module.canonical_url(lien), description, category_id, status, ville_id, clicks)
+            for nom, lien, description, category_id, status, ville_id, clicks in SITES
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    if app_module.PAGE_CACHE is not None:
+        app_module.PAGE_CACHE.clear()
+    app_module.invalidate_search_index()
+    app_module.CLICK_DEDUP = app_module.create_click_deduplicator(app_module.app.config)
+    yield path
+    _drain_pools(app_module)
+
+
+@pytest.fixture
+def client(app_module, db_path):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def admin_client(app_module, db_path):
+    test_client = app_module.app.test_client()
+    with test_client.session_transaction() as session:
+        session["admin_authenticated"] = True
+    return test_client
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+
+def _statuses(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = dict(conn.execute("SELECT id, status FROM sites").fetchall())
+    conn.close()
+    return rows
+
+
+def _post(admin_client, action, site_ids):
+    return admin_client.post(
+        "/admin/propositions/bulk",
+        data={"action": action, "site_ids": [str(site_id) for site_id in site_ids]},
+        headers={"Accept": "application/json"},
+    )
+
+
+def test_bulk_approve_reports_each_site(admin_client, db_path):
+    response = _post(admin_client, "approve", [4, 2, 999])
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload["updated"] == 2
+    assert payload["results"] == [
+        {"id": 4, "result": "ok"},
+        {"id": 2, "result": "ok"},
+        {"id": 999, "result": "introuvable"},
+    ]
+    assert _statuses(db_path)[4] == "valide"
+
+
+def test_bulk_delete(admin_client, db_path):
+    assert _post(admin_client, "delete", [3, 4]).status_code == 200
+    assert set(_statuses(db_path)) == {1, 2}
+
+
+def test_bulk_rejects_unknown_action_and_empty_selection(admin_client, db_path):
+    assert _post(admin_client, "purge", [1]).status_code == 400
+    assert _post(admin_client, "reject", []).status_code == 400
+    assert _statuses(db_path)[1] == "valide"
+
+
+def test_bulk_requires_admin(client):
+    response = client.post("/admin/propositions/bulk", data={"action": "delete", "site_ids": ["1"]})
+    assert response.status_code in (302, 401, 403)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+from forms import canonical_url
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "https://www.Site.re/page/",
+        "http://site.re/page",
+        "site.re/page?utm_source=fb&fbclid=abc",
+        "https://site.re:443/page#haut",
+    ],
+)
+def test_variants_share_one_key(value):
+    assert canonical_url(value) == "site.re/page"
+
+
+def test_meaningful_query_is_kept():
+    assert canonical_url("https://site.re/annonce?id=3") != canonical_url("https://site.re/annonce?id=4")
+
+
+def test_public_submission_refuses_known_site(client, db_path):
+    response = client.post(
+        "/proposer-site",
+        data={
+            "nom": "Encore Pôle Emploi",
+            "lien": "http://emploi974.re",
+            "description": "Le même site, autre écriture",
+            "categorie": "Emploi",
+            "ville": "",
+        },
+        follow_redirects=True,
+    )
+    assert "déjà référencé" in response.get_data(as_text=True)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM sites").fetchone()[0] == 4
+    conn.close()
+
+
+def test_unique_index_blocks_duplicate_keys(db_path):
+    conn = sqlite3.connect(db_path)
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute(
+            "INSERT INTO sites (nom, lien, lien_canonique, status) VALUES ('x', 'https://jobsud.re/', 'jobsud.re', 'en_attente')"
+        )
+    conn.close()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import re
+import sqlite3
+from html import unescape
+
+from click_archive import MAX_ATTACHED, archive_old_clicks, list_archive_months
+
+BROWSER_UA = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36"
+
+
+def _insert_monthly_clicks(db_path, months, per_month=3):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO site_clicks (site_id, ip_address, user_agent, clicked_at) "
+        "VALUES (1, ?, ?, DATETIME('now', ?, ?))",
+        [
+            (f"10.0.{m}.{i}", BROWSER_UA, f"-{m * 28 + 35} days", f"-{i} hours")
+            for m in range(months)
+            for i in range(per_month)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_archive_moves_old_clicks_and_is_rerunnable(app_module, db_path, tmp_path):
+    _insert_monthly_clicks(db_path, months=3)
+    archive_dir = str(tmp_path / "archives")
+    conn = app_module.get_db_connection()
+    moved = archive_old_clicks(conn, archive_dir, retention_days=30)
+    assert sum(moved.values()) == 9
+    assert conn.execute("SELECT COUNT(*) FROM site_clicks").fetchone()[0] == 0
+    assert archive_old_clicks(conn, archive_dir, retention_days=30) == {}
+    conn.close()
+    assert len(list_archive_months(archive_dir)) == len(moved)
+
+
+def test_admin_clicks_pages_across_more_archives_than_attach_limit(app_module, admin_client, db_path, tmp_path, monkeypatch):
+    # 12 mois x 10 clics : plus d'archives que d'ATTACH possibles, et plus d'une page (100 lignes).
+    _insert_monthly_clicks(db_path, months=MAX_ATTACHED + 2, per_month=10)
+    archive_dir = str(tmp_path / "archives")
+    monkeypatch.setitem(app_module.app.config, "CLICK_ARCHIVE_DIR", archive_dir)
+    conn = app_module.get_db_connection()
+    archive_old_clicks(conn, archive_dir, retention_days=30)
+    conn.close()
+    assert len(list_archive_months(archive_dir)) > MAX_ATTACHED
+
+    seen = []
+    pages = 0
+    url = "/admin/clicks?days=365"
+    while url:
+        body = admin_client.get(url).get_data(as_text=True)
+        pages += 1
+        seen.extend(re.findall(r'data-label="Date">([^<]+)</td>', body))
+        next_link = re.search(r'href="(/admin/clicks\?[^"]*after=[^"]+)"', body)
+        url = unescape(next_link.group(1)) if next_link else None
+    # Tout ce qui a moins de 365 jours, une seule fois chacun.
+    assert len(seen) == len(set(seen)) == 120
+    assert pages == 2
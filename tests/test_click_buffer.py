@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import socket
+import sqlite3
+import time
+
+import pytest
+
+from click_pipeline import ClickBuffer, MemoryClickDeduplicator, create_click_deduplicator
+
+BROWSER_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+def _connect(app_module):
+    return lambda: app_module.get_db_connection()
+
+
+def _counts(db_path, site_id=1):
+    conn = sqlite3.connect(db_path)
+    try:
+        clicks = conn.execute("SELECT COUNT(*) FROM site_clicks WHERE site_id = ?", (site_id,)).fetchone()[0]
+        click_count = conn.execute("SELECT click_count FROM sites WHERE id = ?", (site_id,)).fetchone()[0]
+        daily = conn.execute("SELECT COALESCE(SUM(clicks), 0) FROM site_click_daily WHERE site_id = ?", (site_id,)).fetchone()[0]
+    finally:
+        conn.close()
+    return clicks, click_count, daily
+
+
+def test_buffer_writes_batches_on_stop(app_module, db_path):
+    buffer = ClickBuffer(_connect(app_module), batch_size=3, flush_interval=0.05)
+    for i in range(7):
+        assert buffer.submit(1, f"10.0.0.{i}", BROWSER_UA)
+    buffer.stop()
+    assert _counts(db_path) == (7, 40 + 7, 7)
+
+
+def test_full_queue_drops_click(app_module, db_path):
+    buffer = ClickBuffer(_connect(app_module), max_size=1, flush_interval=60)
+    buffer._ensure_started = lambda: None  # pas d'écrivain : la file reste pleine
+    assert buffer.submit(1, "10.0.0.1", BROWSER_UA)
+    assert not buffer.submit(1, "10.0.0.2", BROWSER_UA)
+    assert buffer.dropped == 1
+
+
+def test_failed_batch_is_retried_once(app_module, db_path):
+    buffer = ClickBuffer(_connect(app_module), flush_interval=0.01)
+    original = buffer.write_batch
+    calls = []
+
+    def flaky(conn, batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return original(conn, batch)
+
+    buffer.write_batch = flaky
+    buffer.submit(1, "10.0.0.1", BROWSER_UA)
+    buffer.stop()
+    assert calls == [1, 1]
+    assert buffer.failed == 0
+    assert _counts(db_path)[0] == 1
+
+
+def test_batch_dropped_after_second_failure(app_module, db_path):
+    buffer = ClickBuffer(_connect(app_module), flush_interval=0.01)
+
+    def broken(conn, batch):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    buffer.write_batch = broken
+    buffer.submit(1, "10.0.0.1", BROWSER_UA)
+    buffer.stop()
+    assert buffer.failed == 1
+
+
+def test_dedup_ignores_repeat_click(client, db_path):
+    for _ in range(3):
+        response = client.get("/go/1", headers={"User-Agent": BROWSER_UA})
+        assert response.status_code == 302
+    assert _counts(db_path)[0] == 1
+
+
+def test_dropped_click_does_not_stay_deduplicated(app_module, client, db_path, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "CLICK_BUFFER_ENABLED", True)
+    submitted = []
+
+    def full_queue(site_id, ip_address, user_agent):
+        submitted.append(site_id)
+        return len(submitted) > 1  # premier clic perdu, le suivant passe
+
+    monkeypatch.setattr(app_module.CLICK_BUFFER, "submit", full_queue)
+    client.get("/go/1", headers={"User-Agent": BROWSER_UA})
+    client.get("/go/1", headers={"User-Agent": BROWSER_UA})
+    client.get("/go/1", headers={"User-Agent": BROWSER_UA})
+    assert submitted == [1, 1]
+
+
+def test_memory_dedup_release():
+    dedup = MemoryClickDeduplicator(ttl=60)
+    assert dedup.first_seen(1, "ip")
+    assert not dedup.first_seen(1, "ip")
+    dedup.release(1, "ip")
+    assert dedup.first_seen(1, "ip")
+
+
+@pytest.fixture
+def hung_redis_url():
+    """Port qui accepte les connexions mais ne répond jamais (Redis figé)."""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(8)
+    yield f"redis://127.0.0.1:{server.getsockname()[1]}/0"
+    server.close()
+
+
+def test_hung_redis_falls_back_quickly(hung_redis_url):
+    dedup = create_click_deduplicator({"CLICK_DEDUP_STORAGE_URL": hung_redis_url, "CLICK_DEDUP_REDIS_TIMEOUT": 0.1})
+    started = time.monotonic()
+    assert dedup.first_seen(1, "ip")
+    assert not dedup.first_seen(1, "ip")
+    assert time.monotonic() - started < 2
+
+
+@pytest.mark.parametrize(
+    "user_agent",
+    [
+        "Googlebot/2.1 (+http://www.google.com/bot.html)",
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 HeadlessChrome/120.0 Safari/537.36",
+    ],
+)
+def test_bots_are_not_counted(client, db_path, user_agent):
+    client.get("/go/1", headers={"User-Agent": user_agent})
+    assert _counts(db_path)[0] == 0
+
+
+@pytest.mark.parametrize("user_agent", ["", "Opera", "curl/8.5.0"])
+def test_other_user_agents_are_counted(client, db_path, user_agent):
+    # Règle historique : seuls les robots (et navigateurs headless) sont exclus.
+    client.get("/go/1", headers={"User-Agent": user_agent})
+    assert _counts(db_path) == (1, 41, 1)
+
+
+@pytest.mark.parametrize("site_id", [4, 999])
+def test_go_unknown_or_pending_site(client, site_id):
+    assert client.get(f"/go/{site_id}", headers={"User-Agent": BROWSER_UA}).status_code == 404
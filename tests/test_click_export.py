@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import csv
+import gzip
+import io
+import json
+import sqlite3
+
+
+def _seed_clicks(db_path, count=25):
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO site_clicks (site_id, ip_address, user_agent, clicked_at) VALUES (?, ?, ?, DATETIME('now', ?))",
+        [(1 + i % 3, f"10.0.0.{i}", "Mozilla/5.0 test", f"-{i} hours") for i in range(count)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_csv_export_streams_all_rows(app_module, admin_client, db_path):
+    _seed_clicks(db_path)
+    response = admin_client.get("/admin/clicks/export?days=7")
+    assert response.status_code == 200
+    assert response.is_streamed
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True).lstrip("\ufeff"))))
+    assert rows[0] == app_module.CLICK_EXPORT_COLUMNS
+    assert len(rows) == 26
+
+
+def test_ndjson_gzip_export(admin_client, db_path):
+    _seed_clicks(db_path)
+    response = admin_client.get("/admin/clicks/export?days=7&format=ndjson&gzip=1")
+    assert response.mimetype == "application/gzip"
+    lines = gzip.decompress(response.get_data()).decode("utf-8").splitlines()
+    assert len(lines) == 25
+    assert {"id", "site_id", "clicked_at"} <= set(json.loads(lines[0]))
+
+
+def test_export_requires_admin(client):
+    assert client.get("/admin/clicks/export").status_code in (302, 401, 403)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from click_pipeline import ClickBuffer, rebuild_click_rollups
+
+
+def _rollups(conn):
+    sites = [tuple(row) for row in conn.execute("SELECT site_id, day, clicks FROM site_click_daily ORDER BY site_id, day")]
+    categories = [
+        tuple(row) for row in conn.execute("SELECT category_id, day, clicks FROM category_click_daily ORDER BY category_id, day")
+    ]
+    return sites, categories
+
+
+def test_incremental_rollups_match_rebuild(app_module, db_path):
+    conn = app_module.get_db_connection()
+    buffer = ClickBuffer(lambda: conn)
+    buffer.write_batch(
+        conn,
+        [
+            (1, "10.0.0.1", "ua", "2026-01-02 10:00:00"),
+            (1, "10.0.0.2", "ua", "2026-01-02 11:00:00"),
+            (2, "10.0.0.1", "ua", "2026-01-02 12:00:00"),
+            (3, "10.0.0.3", "ua", "2026-01-03 08:00:00"),
+            (999, "10.0.0.9", "ua", "2026-01-03 08:00:00"),  # site supprimé entre-temps
+        ],
+    )
+    incremental = _rollups(conn)
+    assert incremental == (
+        [(1, "2026-01-02", 2), (2, "2026-01-02", 1), (3, "2026-01-03", 1)],
+        [(1, "2026-01-02", 3), (2, "2026-01-03", 1)],
+    )
+    assert rebuild_click_rollups(conn) == 3
+    assert _rollups(conn) == incremental
+    conn.close()
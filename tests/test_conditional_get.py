@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def csrf_enabled(app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "WTF_CSRF_ENABLED", True)
+
+
+def test_public_pages_carry_validators(client, db_path):
+    response = client.get("/villes")
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('W/"')
+    assert "Last-Modified" in response.headers
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+
+@pytest.mark.parametrize("path", ["/", "/categorie/emploi"])
+def test_home_and_category_are_private(client, db_path, path):
+    assert client.get(path).headers["Cache-Control"] == "private, no-cache"
+
+
+def test_unchanged_page_answers_304(client, db_path):
+    etag = client.get("/").headers["ETag"]
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_write_changes_the_etag(client, db_path):
+    etag = client.get("/").headers["ETag"]
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE sites SET nom = 'Job Sud Réunion' WHERE id = 2")
+    conn.commit()
+    conn.close()
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_click_does_not_change_the_etag(client, db_path):
+    etag = client.get("/").headers["ETag"]
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE sites SET click_count = click_count + 1 WHERE id = 2")
+    conn.commit()
+    conn.close()
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_if_modified_since_alone_is_not_honoured(client, db_path):
+    last_modified = client.get("/").headers["Last-Modified"]
+    assert client.get("/", headers={"If-Modified-Since": last_modified}).status_code == 200
+
+
+def test_etag_depends_on_session_token(app_module, client, db_path, csrf_enabled):
+    etag = client.get("/").headers["ETag"]
+    other = app_module.app.test_client()
+    assert other.get("/", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_admin_gets_no_304(admin_client, db_path):
+    response = admin_client.get("/")
+    assert "ETag" not in response.headers
+    assert admin_client.get("/", headers={"If-None-Match": "*"}).status_code == 200
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+
+def test_one_connection_per_request(app_module, db_path):
+    with app_module.app.test_request_context("/"):
+        assert app_module.get_db() is app_module.get_db()
+        assert app_module.get_read_db() is app_module.get_read_db()
+        assert app_module.get_db() is not app_module.get_read_db()
+
+
+def test_connections_return_to_pool(app_module, db_path):
+    with app_module.app.test_request_context("/"):
+        read_conn = app_module.get_read_db()
+    with app_module.app.test_request_context("/"):
+        assert app_module.get_read_db() is read_conn
+
+
+def test_read_connection_is_read_only(app_module, db_path):
+    with app_module.app.test_request_context("/"):
+        with pytest.raises(sqlite3.OperationalError):
+            app_module.get_read_db().execute("DELETE FROM sites")
+
+
+def test_open_transaction_is_rolled_back_on_release(app_module, db_path):
+    with app_module.app.test_request_context("/"):
+        app_module.get_db().execute("DELETE FROM sites")
+    with app_module.app.test_request_context("/"):
+        assert app_module.get_read_db().execute("SELECT COUNT(*) FROM sites").fetchone()[0] == 4
+
+
+def test_full_pool_closes_extra_connections(app_module, db_path):
+    pool = app_module._DB_POOLS["write"]
+    extra = [app_module.get_db_connection() for _ in range(pool.maxsize + 1)]
+    for conn in extra:
+        app_module._release_pooled_connection(conn, "write")
+    assert pool.qsize() == pool.maxsize
+    with pytest.raises(sqlite3.ProgrammingError):
+        extra[-1].execute("SELECT 1")
+
+
+def test_no_request_connection_outside_request(app_module, db_path):
+    with pytest.raises(RuntimeError):
+        app_module.get_db()
+
+
+def test_storage_profile(app_module, db_path):
+    conn = app_module.get_db_connection()
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        conn.close()
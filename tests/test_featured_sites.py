@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+EXTRA_SITES = [
+    # (nom, category_id, status, click_count, en_vedette, date_ajout)
+    ("Emploi récent", 1, "valide", 25, 0, "2024-05-02 10:00:00"),
+    ("Emploi ancien", 1, "valide", 25, 0, "2024-05-01 10:00:00"),
+    ("Emploi discret", 1, "valide", 5, 0, "2024-06-01 10:00:00"),
+    ("Santé vedette A", 2, "valide", 3, 1, "2024-01-01 10:00:00"),
+    ("Santé vedette B", 2, "valide", 0, 1, "2024-01-02 10:00:00"),
+    ("Santé populaire", 2, "valide", 99, 0, "2024-01-03 10:00:00"),
+    ("Santé refusée", 2, "refuse", 500, 1, "2024-01-04 10:00:00"),
+] + [(f"Transport {i}", 3, "valide", 7, 0, "2024-03-01 10:00:00") for i in range(4)]
+
+
+@pytest.fixture
+def seeded(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO categories (id, nom, slug) VALUES (3, 'Transport', 'transport')")
+    conn.executemany(
+        """
+        INSERT INTO sites (nom, lien, lien_canonique, description, category_id, status, click_count, en_vedette, date_ajout)
+        VALUES (?, ?, ?, 'Site de test pour la une', ?, ?, ?, ?, ?)
+        """,
+        [
+            (nom, f"https://site{i}.re", f"site{i}.re", category_id, status, clicks, featured, added)
+            for i, (nom, category_id, status, clicks, featured, added) in enumerate(EXTRA_SITES)
+        ],
+    )
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def _per_category_loop(db_path, per_category=3):
+    """Ancien algorithme (une passe par catégorie), départage final par id décroissant."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(
+        """
+        SELECT s.id, s.click_count, s.en_vedette, s.date_ajout, c.nom AS categorie
+        FROM sites s JOIN categories c ON c.id = s.category_id
+        WHERE s.status = 'valide'
+        """
+    ).fetchall()
+    conn.close()
+    by_category = {}
+    for row in rows:
+        by_category.setdefault(row["categorie"], []).append(row)
+    stats = {
+        cat: (sum(r["click_count"] or 0 for r in sites), len(sites)) for cat, sites in by_category.items()
+    }
+    order = sorted(by_category, key=lambda cat: (-stats[cat][0], -stats[cat][1], cat.lower()))
+    result = {}
+    for cat in order:
+        sites = by_category[cat]
+        featured = [s for s in sites if s["en_vedette"]]
+        chosen = sorted(
+            featured or sites,
+            key=lambda s: (s["click_count"] or 0, s["date_ajout"] or "", s["id"]),
+            reverse=True,
+        )
+        result[cat] = [s["id"] for s in chosen[:per_category]]
+    return result, {cat: {"site_count": stats[cat][1], "total_clicks": stats[cat][0]} for cat in order}
+
+
+def _featured(app_module):
+    with app_module.app.test_request_context("/"):
+        data, stats = app_module.get_sites_en_vedette()
+    return {cat: [site["id"] for site in sites] for cat, sites in data.items()}, stats
+
+
+def test_matches_per_category_loop(app_module, seeded):
+    data, stats = _featured(app_module)
+    expected_data, expected_stats = _per_category_loop(seeded)
+    assert list(data) == list(expected_data)
+    assert data == expected_data
+    assert stats == expected_stats
+
+
+def test_limits_featured_and_ties(app_module, seeded):
+    data, _stats = _featured(app_module)
+    names = {}
+    conn = sqlite3.connect(seeded)
+    for site_id, nom in conn.execute("SELECT id, nom FROM sites"):
+        names[site_id] = nom
+    conn.close()
+    named = {cat: [names[site_id] for site_id in ids] for cat, ids in data.items()}
+    assert named["Emploi"] == ["Pôle Emploi Réunion", "Emploi récent", "Emploi ancien"]
+    # Des vedettes dans la catégorie : elles seules sont affichées.
+    assert named["Santé"] == ["Santé vedette A", "Santé vedette B"]
+    # Égalité parfaite : le plus récent identifiant d'abord.
+    assert named["Transport"] == ["Transport 3", "Transport 2", "Transport 1"]
+    assert list(data) == ["Santé", "Emploi", "Transport"]
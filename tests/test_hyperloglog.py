@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+from hyperloglog import REGISTERS, HyperLogLog, register_sqlite_functions
+
+
+def _sketch(values):
+    sketch = HyperLogLog()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+@pytest.mark.parametrize("cardinality", [0, 1, 50, 1000, 20000])
+def test_estimate_within_error_bounds(cardinality):
+    estimate = _sketch(f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(cardinality)).count()
+    # Erreur type ~4,6 % : marge de 4 écarts-types.
+    assert abs(estimate - cardinality) <= max(2, 0.19 * cardinality)
+
+
+def test_duplicates_do_not_change_estimate():
+    once = _sketch(str(i) for i in range(300))
+    twice = _sketch([str(i) for i in range(300)] * 2)
+    assert once.to_bytes() == twice.to_bytes()
+
+
+def test_merge_is_union():
+    left = _sketch(str(i) for i in range(0, 600))
+    right = _sketch(str(i) for i in range(400, 1000))
+    union = _sketch(str(i) for i in range(1000))
+    assert HyperLogLog(left.to_bytes()).merge(right).to_bytes() == union.to_bytes()
+
+
+def test_rejects_wrong_size():
+    with pytest.raises(ValueError):
+        HyperLogLog(b"\x00" * (REGISTERS - 1))
+
+
+def test_sqlite_functions():
+    conn = sqlite3.connect(":memory:")
+    register_sqlite_functions(conn)
+    conn.execute("CREATE TABLE clicks (day TEXT, ip TEXT)")
+    conn.executemany(
+        "INSERT INTO clicks VALUES (?, ?)",
+        [("d1", f"ip{i}") for i in range(100)] + [("d2", f"ip{i}") for i in range(50, 150)],
+    )
+    daily = dict(conn.execute("SELECT day, hll_build(ip) FROM clicks GROUP BY day").fetchall())
+    assert conn.execute("SELECT hll_count(hll_merge(?, ?))", (daily["d1"], daily["d2"])).fetchone()[0] == pytest.approx(150, abs=10)
+    conn.execute("CREATE TABLE sketches (visitors BLOB)")
+    conn.executemany("INSERT INTO sketches VALUES (?)", [(daily["d1"],), (daily["d2"],), (None,)])
+    assert conn.execute("SELECT hll_count(hll_union(visitors)) FROM sketches").fetchone()[0] == pytest.approx(150, abs=10)
+    assert conn.execute("SELECT hll_count(NULL), hll_merge(NULL, NULL)").fetchone() == (0, None)
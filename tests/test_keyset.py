@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+import pytest
+
+SORT_KEYS = {
+    "clicks_desc": [("COALESCE(clicks, 0)", "DESC"), ("id", "DESC")],
+    "name_asc": [("nom COLLATE NOCASE", "ASC"), ("id", "DESC")],
+}
+
+
+@pytest.fixture
+def items():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, nom TEXT, clicks INTEGER)")
+    # Égalités et NULL : le curseur doit départager par id.
+    conn.executemany(
+        "INSERT INTO items (id, nom, clicks) VALUES (?, ?, ?)",
+        [(i, f"site {i % 7}", None if i % 5 == 0 else i % 4) for i in range(1, 38)],
+    )
+    return conn
+
+
+def _select(app_module, sort_key):
+    return (
+        f"SELECT id, {app_module.keyset_select_columns(sort_key)} FROM items "
+        "WHERE {where} ORDER BY {order} LIMIT ?"
+    )
+
+
+@pytest.mark.parametrize("sort_name", sorted(SORT_KEYS))
+def test_keyset_pages_walk_forward_and_back(app_module, items, sort_name):
+    sort_key = SORT_KEYS[sort_name]
+    select_sql = _select(app_module, sort_key)
+    expected = [
+        row["id"]
+        for row in items.execute(f"SELECT id FROM items ORDER BY {app_module.keyset_order_sql(sort_key)}")
+    ]
+
+    pages = []
+    after = None
+    while True:
+        rows, has_prev, has_next, first, last = app_module.keyset_page(
+            items.cursor(), select_sql, "1=1", [], sort_key, 10, after=after
+        )
+        assert has_prev == (after is not None)
+        pages.append(([row["id"] for row in rows], first))
+        if not has_next:
+            break
+        after = app_module.decode_cursor(last, len(sort_key))
+
+    assert [item for ids, _first in pages for item in ids] == expected
+    assert [len(ids) for ids, _first in pages] == [10, 10, 10, 7]
+
+    # Retour arrière depuis la dernière page : mêmes pages, même ordre.
+    before = app_module.decode_cursor(pages[-1][1], len(sort_key))
+    rows, has_prev, has_next, _first, _last = app_module.keyset_page(
+        items.cursor(), select_sql, "1=1", [], sort_key, 10, before=before
+    )
+    assert [row["id"] for row in rows] == pages[-2][0]
+    assert has_prev and has_next
+
+
+def test_decode_cursor_rejects_garbage(app_module):
+    assert app_module.decode_cursor("not-base64!", 2) is None
+    assert app_module.decode_cursor(app_module.encode_cursor([1]), 2) is None
+    assert app_module.decode_cursor(app_module.encode_cursor([{"x": 1}, 2]), 2) is None
+    assert app_module.decode_cursor(app_module.encode_cursor(["a", 2]), 2) == ["a", 2]
+
+
+def test_admin_sites_cursor_links(admin_client):
+    response = admin_client.get("/admin/sites?sort=clicks_desc")
+    assert response.status_code == 200
+    assert "Pôle Emploi Réunion" in response.get_data(as_text=True)
+
+
+def test_count_cache_evicts_least_recently_used(app_module, items, monkeypatch):
+    monkeypatch.setattr(app_module, "_COUNT_CACHE", app_module.OrderedDict())
+    monkeypatch.setattr(app_module, "_COUNT_CACHE_MAX_ENTRIES", 3)
+    statements = []
+    items.set_trace_callback(statements.append)
+    sql = "SELECT COUNT(*) FROM items WHERE clicks = ?"
+
+    def count(clicks):
+        return app_module.cached_count(items.cursor(), sql, [clicks], ttl=60)
+
+    for clicks in (0, 1, 2):
+        count(clicks)
+    count(0)  # relu : devient le plus récent
+    count(3)  # évince clicks=1 seulement
+    statements.clear()
+    count(0)
+    count(2)
+    count(3)
+    assert statements == []
+    count(1)
+    assert len(statements) == 1
+    assert len(app_module._COUNT_CACHE) == 3
+
+
+def test_count_cache_expires(app_module, items, monkeypatch):
+    monkeypatch.setattr(app_module, "_COUNT_CACHE", app_module.OrderedDict())
+    sql = "SELECT COUNT(*) FROM items"
+    assert app_module.cached_count(items.cursor(), sql, [], ttl=0) == 37
+    items.execute("DELETE FROM items WHERE id = 1")
+    assert app_module.cached_count(items.cursor(), sql, [], ttl=60) == 36
+    items.execute("DELETE FROM items WHERE id = 2")
+    assert app_module.cached_count(items.cursor(), sql, [], ttl=60) == 36
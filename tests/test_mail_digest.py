@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import pytest
+
+from mail_outbox import OutboxSender, SmtpConnection, create_outbox_sender, enqueue_digest_item
+
+CONFIG = {"MAIL_RECIPIENTS": ["admin@reunionwiki.re"]}
+
+
+def _render(items):
+    return f"{len(items)} proposition(s)", "\n".join(item["nom"] for item in items)
+
+
+@pytest.fixture
+def conn(app_module, db_path):
+    conn = app_module.get_db_connection()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def sender(app_module):
+    return OutboxSender(
+        app_module.get_db_connection,
+        CONFIG,
+        smtp=SmtpConnection(CONFIG, factory=lambda config, timeout: None),
+        render_digest=_render,
+        digest_interval=1800,
+        digest_max_items=3,
+        digest_min_gap=300,
+    )
+
+
+def _add_items(conn, count, age_seconds=0):
+    for i in range(count):
+        enqueue_digest_item(conn, "submission", {"nom": f"Site {i}"})
+    conn.execute(
+        "UPDATE email_digest_items SET created_at = DATETIME('now', ?)", (f"-{age_seconds} seconds",)
+    )
+    conn.commit()
+
+
+def _digests(conn):
+    return [row[0] for row in conn.execute("SELECT subject FROM email_outbox WHERE kind = 'digest' ORDER BY id")]
+
+
+def test_not_due_reads_no_items(conn, sender):
+    _add_items(conn, 2)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert sender.flush_digest(conn) == 0
+    conn.set_trace_callback(None)
+    assert not any("payload" in sql for sql in statements)
+    assert _digests(conn) == []
+
+
+def test_flushes_when_oldest_item_reaches_interval(conn, sender):
+    _add_items(conn, 2, age_seconds=1800)
+    assert sender.flush_digest(conn) == 2
+    assert _digests(conn) == ["2 proposition(s)"]
+    assert conn.execute("SELECT COUNT(*) FROM email_digest_items").fetchone()[0] == 0
+
+
+def test_flushes_early_at_max_items_but_respects_min_gap(conn, sender):
+    _add_items(conn, 3)
+    assert sender.flush_digest(conn) == 3
+    _add_items(conn, 3)
+    # Résumé précédent trop récent : on attend digest_min_gap.
+    assert sender.flush_digest(conn) == 0
+    conn.execute("UPDATE email_outbox SET created_at = DATETIME('now', '-301 seconds')")
+    conn.commit()
+    assert sender.flush_digest(conn) == 3
+    assert len(_digests(conn)) == 2
+
+
+def test_digest_size_is_capped(conn, sender):
+    sender.digest_batch_size = 4
+    _add_items(conn, 6)
+    assert sender.flush_digest(conn, force=True) == 4
+    assert sender.flush_digest(conn, force=True) == 2
+
+
+def test_batch_size_comes_from_config(app_module):
+    sender = create_outbox_sender(app_module.get_db_connection, {"MAIL_DIGEST_BATCH_SIZE": 7})
+    assert sender.digest_batch_size == 7
+
+
+def test_items_are_purged_without_recipients(app_module, conn, caplog):
+    sender = OutboxSender(
+        app_module.get_db_connection,
+        {"MAIL_RECIPIENTS": []},
+        smtp=SmtpConnection({}, factory=lambda config, timeout: None),
+        render_digest=_render,
+    )
+    _add_items(conn, 2, age_seconds=1800)
+    with caplog.at_level(logging.WARNING):
+        assert sender.flush_digest(conn) == 0
+    assert "aucun destinataire" in caplog.text
+    assert conn.execute("SELECT COUNT(*) FROM email_digest_items").fetchone()[0] == 0
+    assert _digests(conn) == []
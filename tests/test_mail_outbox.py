@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+import smtplib
+import sqlite3
+import time
+
+import pytest
+
+from mail_outbox import OutboxSender, SmtpConnection, enqueue_email
+
+CONFIG = {"MAIL_DEFAULT_SENDER": "noreply@reunionwiki.re", "MAIL_RECIPIENTS": ["admin@reunionwiki.re"]}
+
+
+class FakeSmtpServer:
+    """Fabrique de sessions SMTP factices : `failures` = exceptions à lever, dans l'ordre."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.sessions = 0
+        self.sent = []
+
+    def __call__(self, config, timeout):
+        self.sessions += 1
+        return FakeSmtpSession(self)
+
+
+class FakeSmtpSession:
+    def __init__(self, server):
+        self.server = server
+
+    def send_message(self, message):
+        if self.server.failures:
+            raise self.server.failures.pop(0)
+        self.server.sent.append(message["Subject"])
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def outbox(app_module, db_path):
+    conn = app_module.get_db_connection()
+    yield conn
+    conn.close()
+
+
+def _sender(app_module, server, **options):
+    smtp = SmtpConnection(CONFIG, idle_timeout=60, factory=server)
+    return OutboxSender(app_module.get_db_connection, CONFIG, smtp=smtp, **options)
+
+
+def _enqueue(conn, count):
+    for i in range(count):
+        enqueue_email(conn, "submission", f"Proposition {i}", "Corps", CONFIG["MAIL_RECIPIENTS"])
+    conn.commit()
+
+
+def _statuses(conn):
+    return [tuple(row) for row in conn.execute("SELECT status, attempts FROM email_outbox ORDER BY id")]
+
+
+def test_drain_sends_batches_over_one_session(app_module, outbox):
+    server = FakeSmtpServer()
+    _enqueue(outbox, 5)
+    sender = _sender(app_module, server, batch_size=2)
+    assert sender.drain(outbox) == 5
+    assert server.sent == [f"Proposition {i}" for i in range(5)]
+    assert server.sessions == 1
+    assert _statuses(outbox) == [("sent", 1)] * 5
+
+
+def test_reconnects_when_server_drops_session(app_module, outbox):
+    server = FakeSmtpServer(failures=[smtplib.SMTPServerDisconnected("bye")])
+    _enqueue(outbox, 2)
+    sender = _sender(app_module, server)
+    assert sender.drain(outbox) == 2
+    assert server.sessions == 2
+    assert sender.smtp.opened == 2
+
+
+def test_temporary_failure_backs_off_then_retries(app_module, outbox):
+    server = FakeSmtpServer(failures=[smtplib.SMTPResponseException(451, b"try later")])
+    _enqueue(outbox, 2)
+    sender = _sender(app_module, server, retry_base_delay=30)
+    # Premier message en échec : le reste du lot est relâché pour plus tard.
+    assert sender.drain(outbox) == 0
+    row = outbox.execute(
+        "SELECT status, attempts, last_error, claim_token, next_attempt_at > DATETIME('now', '+20 seconds') "
+        "FROM email_outbox WHERE id = 1"
+    ).fetchone()
+    assert tuple(row) == ("pending", 1, "(451, b'try later')", None, 1)
+
+    # Le second message n'était pas en reprise : il part ; le premier attend son délai.
+    assert sender.drain(outbox) == 1
+    outbox.execute("UPDATE email_outbox SET next_attempt_at = DATETIME('now', '-1 second') WHERE id = 1")
+    outbox.commit()
+    assert sender.drain(outbox) == 1
+    assert _statuses(outbox) == [("sent", 2), ("sent", 1)]
+
+
+def test_gives_up_after_max_attempts(app_module, outbox):
+    server = FakeSmtpServer(failures=[smtplib.SMTPResponseException(550, b"rejected")])
+    _enqueue(outbox, 1)
+    sender = _sender(app_module, server, max_attempts=1)
+    assert sender.drain(outbox) == 0
+    assert _statuses(outbox) == [("failed", 1)]
+
+
+def test_retry_delay_is_exponential_and_capped(app_module):
+    sender = _sender(app_module, FakeSmtpServer(), retry_base_delay=30, retry_max_delay=600)
+    assert [sender.retry_delay(n) for n in (1, 2, 3, 6)] == [30, 60, 120, 600]
+
+
+def test_started_sender_sends_pending_rows_without_wake(app_module, outbox):
+    # Messages restés en attente avant un redémarrage : aucune proposition ne réveille le thread.
+    server = FakeSmtpServer()
+    _enqueue(outbox, 3)
+    sender = _sender(app_module, server, poll_interval=0.05)
+    sender.start()
+    deadline = time.monotonic() + 5
+    while len(server.sent) < 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    sender.stop()
+    assert len(server.sent) == 3
+
+
+def test_worker_start_starts_sender_when_mail_enabled(app_module, db_path, monkeypatch):
+    started = []
+    monkeypatch.setitem(app_module.app.config, "MAIL_ENABLED", True)
+    monkeypatch.setattr(app_module.MAIL_OUTBOX, "start", lambda: started.append(1))
+    monkeypatch.setattr(app_module, "warm_search_index", lambda: None)
+    monkeypatch.setattr(app_module, "ensure_trends_refresher", lambda: None)
+    monkeypatch.setitem(app_module._WORKER_SERVICES, "pid", None)
+    app_module.start_worker_services()
+    assert started == [1]
+
+
+def test_submission_enqueues_in_same_transaction(app_module, client, db_path, monkeypatch):
+    woken = []
+    monkeypatch.setattr(app_module.MAIL_OUTBOX, "wake", lambda: woken.append(1))
+    monkeypatch.setitem(app_module.app.config, "MAIL_ENABLED", True)
+    monkeypatch.setitem(app_module.app.config, "MAIL_SERVER", "smtp.example.org")
+    monkeypatch.setitem(app_module.app.config, "MAIL_RECIPIENTS", ["admin@reunionwiki.re"])
+    monkeypatch.setitem(app_module.app.config, "MAIL_DIGEST_ENABLED", False)
+    response = client.post(
+        "/proposer-site",
+        data={
+            "nom": "Marché forain",
+            "lien": "marche-forain.re",
+            "description": "Les marchés forains de l'île",
+            "categorie": "Emploi",
+            "ville": "",
+        },
+    )
+    assert response.status_code == 302
+    conn = sqlite3.connect(db_path)
+    subjects = [row[0] for row in conn.execute("SELECT subject FROM email_outbox")]
+    conn.close()
+    assert subjects == ["Nouvelle proposition Réunion Wiki : Marché forain"]
+    assert woken == [1]
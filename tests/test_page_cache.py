@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import re
+import socket
+import sqlite3
+import time
+
+import pytest
+
+from page_cache import create_page_cache
+
+TOKEN_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+@pytest.fixture
+def csrf_enabled(app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "WTF_CSRF_ENABLED", True)
+
+
+def _get(client, path="/"):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response
+
+
+def _form_token(response):
+    return TOKEN_RE.search(response.get_data(as_text=True)).group(1)
+
+
+def _submit(client, token, nom):
+    return client.post(
+        "/proposer-site",
+        data={
+            "csrf_token": token,
+            "nom": nom,
+            "lien": f"https://{nom.lower()}.re",
+            "description": "Une ressource utile proposée",
+            "categorie": "Emploi",
+            "ville": "",
+        },
+        follow_redirects=True,
+    )
+
+
+def test_second_visit_is_served_from_cache(client, db_path):
+    assert _get(client).headers["X-Page-Cache"] == "MISS"
+    assert _get(client).headers["X-Page-Cache"] == "HIT"
+
+
+def test_cached_entry_never_holds_a_token(app_module, client, db_path, csrf_enabled):
+    _get(client)
+    entry = app_module.PAGE_CACHE.get("http://localhost/")
+    assert entry["csrf"] is True
+    assert set(entry["bodies"]) == {"identity"}
+    assert app_module.CSRF_PLACEHOLDER in entry["bodies"]["identity"]
+    assert "version" in entry
+
+
+def test_each_visitor_gets_its_own_token(app_module, db_path, csrf_enabled):
+    first, second = app_module.app.test_client(), app_module.app.test_client()
+    filled = _get(first)
+    served = _get(second)
+    assert served.headers["X-Page-Cache"] == "HIT"
+    assert _form_token(filled) != _form_token(served)
+    with first.session_transaction() as s1, second.session_transaction() as s2:
+        assert s1["csrf_token"] != s2["csrf_token"]
+
+
+def test_cache_hit_keeps_existing_session_token(app_module, client, db_path, csrf_enabled):
+    _get(app_module.app.test_client())
+    with client.session_transaction() as session:
+        session["csrf_token"] = "jeton-deja-la"
+    assert _get(client).headers["X-Page-Cache"] == "HIT"
+    with client.session_transaction() as session:
+        assert session["csrf_token"] == "jeton-deja-la"
+
+
+def test_submission_from_cached_page(app_module, db_path, csrf_enabled):
+    _get(app_module.app.test_client())
+    visitor = app_module.app.test_client()
+    page = _get(visitor)
+    assert page.headers["X-Page-Cache"] == "HIT"
+    response = _submit(visitor, _form_token(page), "Cacheok")
+    assert "Session expirée" not in response.get_data(as_text=True)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM sites WHERE nom = 'Cacheok'").fetchone()[0] == 1
+    conn.close()
+
+
+def test_token_from_another_visitor_is_refused(app_module, db_path, csrf_enabled):
+    other_token = _form_token(_get(app_module.app.test_client()))
+    visitor = app_module.app.test_client()
+    _get(visitor)
+    response = _submit(visitor, other_token, "Volé")
+    assert "Session expirée" in response.get_data(as_text=True)
+
+
+def test_trends_snapshot_purges_its_page(app_module, client, db_path):
+    _get(client)
+    _get(client, "/tendances")
+    app_module.refresh_trends_snapshot()
+    assert _get(client).headers["X-Page-Cache"] == "HIT"
+    assert _get(client, "/tendances").headers["X-Page-Cache"] == "MISS"
+
+
+def test_hung_redis_is_a_cache_miss():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(8)
+    try:
+        cache = create_page_cache(
+            {"PAGE_CACHE_STORAGE_URL": f"redis://127.0.0.1:{server.getsockname()[1]}/1", "PAGE_CACHE_REDIS_TIMEOUT": 0.1}
+        )
+        started = time.monotonic()
+        assert cache.get("http://localhost/") is None
+        cache.set("http://localhost/", {"status": 200, "bodies": {"identity": b"x"}})
+        assert time.monotonic() - started < 2
+    finally:
+        server.close()
+
+
+def test_write_from_another_worker_skips_stale_entry(client, db_path):
+    _get(client)
+    # Écriture sans purge locale (autre worker, import en ligne de commande).
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE sites SET status = 'valide' WHERE id = 4")
+    conn.commit()
+    conn.close()
+    response = _get(client)
+    assert response.headers["X-Page-Cache"] == "MISS"
+    assert "Pharmacie de garde" in response.get_data(as_text=True)
+
+
+def test_admin_write_purges_pages(admin_client, client, db_path):
+    _get(client)
+    admin_client.post(
+        "/admin/propositions/bulk",
+        data={"action": "approve", "site_ids": ["4"]},
+        headers={"Accept": "application/json"},
+    )
+    assert _get(client).headers["X-Page-Cache"] == "MISS"
+
+
+def test_admin_is_never_served_from_cache(admin_client, client, db_path):
+    _get(client)
+    assert "X-Page-Cache" not in _get(admin_client).headers
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import gzip
+
+import pytest
+from werkzeug.http import parse_accept_header
+
+import page_cache
+from page_cache import COMPRESS_MIN_LENGTH, compress_bodies, select_body
+
+BODY = ("<li>Réunion Wiki</li>" * 200).encode("utf-8")
+
+
+def _accept(value):
+    return parse_accept_header(value)
+
+
+def test_small_bodies_are_not_compressed():
+    assert compress_bodies(b"x" * (COMPRESS_MIN_LENGTH - 1)) == {"identity": b"x" * (COMPRESS_MIN_LENGTH - 1)}
+
+
+def test_gzip_body_round_trips():
+    bodies = compress_bodies(BODY)
+    assert gzip.decompress(bodies["gzip"]) == BODY
+    assert len(bodies["gzip"]) < len(BODY)
+    # mtime=0 : corps identique d'un remplissage à l'autre.
+    assert compress_bodies(BODY)["gzip"] == bodies["gzip"]
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip, deflate, br", "br"),
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+        ("deflate", "identity"),
+        ("", "identity"),
+    ],
+)
+def test_select_body(header, expected):
+    bodies = {"identity": b"i", "gzip": b"g", "br": b"b"}
+    assert select_body(bodies, _accept(header))[0] == expected
+
+
+def test_select_body_without_brotli():
+    assert select_body({"identity": b"i", "gzip": b"g"}, _accept("br, gzip"))[0] == "gzip"
+
+
+def test_brotli_is_optional(monkeypatch):
+    monkeypatch.setattr(page_cache, "brotli", None)
+    assert set(compress_bodies(BODY)) == {"identity", "gzip"}
+
+
+def test_cached_page_is_served_precompressed(client, db_path):
+    plain = client.get("/villes")
+    for _ in range(2):
+        response = client.get("/villes", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert gzip.decompress(response.get_data()) == plain.get_data()
+    assert response.headers["X-Page-Cache"] == "HIT"
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import base64
+import html
+import json
+import re
+import sqlite3
+from html.parser import HTMLParser
+
+import pytest
+
+LIST_URL = "/sites-les-plus-visites"
+TITLE_RE = re.compile(r'class="ranking-title"\s*>\s*([^<]+?)\s*</a>')
+
+
+@pytest.fixture
+def many_sites(app_module, db_path, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "PUBLIC_LIST_PER_PAGE", 5)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        """
+        INSERT INTO sites (nom, lien, lien_canonique, description, category_id, status, click_count, date_ajout)
+        VALUES (?, ?, ?, 'Site de test pour les listes', 1, 'valide', ?, DATETIME('now'))
+        """,
+        [(f"Liste {i}", f"https://liste{i}.re", f"liste{i}.re", i) for i in range(1, 10)],
+    )
+    conn.commit()
+    expected = [
+        row[0]
+        for row in conn.execute(
+            "SELECT nom FROM sites WHERE status = 'valide' ORDER BY click_count DESC, id DESC"
+        )
+    ]
+    conn.close()
+    return expected
+
+
+def _names(response):
+    return [html.unescape(name) for name in TITLE_RE.findall(response.get_data(as_text=True))]
+
+
+def _link(response, rel):
+    match = re.search(rf'rel="{rel}"\s+href="([^"]+)"', response.get_data(as_text=True))
+    return html.unescape(match.group(1)) if match else None
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def test_next_and_prev_cursors_walk_the_list(client, many_sites):
+    pages = []
+    response = client.get(LIST_URL)
+    while True:
+        assert response.status_code == 200
+        pages.append(_names(response))
+        next_url = _link(response, "next")
+        if next_url is None:
+            break
+        response = client.get(next_url)
+    assert [len(page) for page in pages] == [5, 5, 2]
+    assert sum(pages, []) == many_sites
+    assert "Page 3" in response.get_data(as_text=True)
+
+    back = client.get(_link(response, "prev"))
+    assert _names(back) == pages[1]
+    first = client.get(_link(back, "prev"))
+    assert _names(first) == pages[0]
+    assert _link(first, "prev") is None
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "after=pas-un-curseur",
+        "after=" + _cursor([1]),
+        "after=" + _cursor([{"id": 1}, 2]),
+        "before=" + "A" * 600,
+        "page=2",
+    ],
+)
+def test_invalid_cursor_falls_back_to_first_page(client, many_sites, query):
+    response = client.get(f"{LIST_URL}?{query}")
+    assert response.status_code == 200
+    assert _names(response) == many_sites[:5]
+    assert _link(response, "prev") is None
+
+
+def test_cursor_past_the_end_is_404(client, many_sites):
+    assert client.get(f"{LIST_URL}?page=4&after={_cursor([-1, 0])}").status_code == 404
+
+
+class _TagChecker(HTMLParser):
+    VOID = {"meta", "link", "br", "img", "input", "hr", "source", "area", "base", "col", "embed", "wbr"}
+
+    def __init__(self):
+        super().__init__()
+        self.stack = []
+        self.errors = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in self.VOID:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.VOID:
+            return
+        if not self.stack or self.stack[-1] != tag:
+            self.errors.append(f"</{tag}> inattendu (ouverts : {self.stack[-3:]})")
+            if tag in self.stack:
+                del self.stack[len(self.stack) - 1 - self.stack[::-1].index(tag):]
+            return
+        self.stack.pop()
+
+
+def test_full_list_is_streamed_as_valid_html(client, many_sites):
+    response = client.get(f"{LIST_URL}?tout=1", buffered=False)
+    assert response.status_code == 200
+    assert response.is_streamed
+    body = b"".join(response.response).decode("utf-8")
+    response.close()
+    assert [html.unescape(name) for name in TITLE_RE.findall(body)] == many_sites
+    assert 'class="list-pagination"' not in body
+    checker = _TagChecker()
+    checker.feed(body)
+    checker.close()
+    assert checker.errors == []
+    assert checker.stack == []
+    assert body.rstrip().endswith("</html>")
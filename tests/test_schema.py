@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import os
+import runpy
+import sqlite3
+
+import pytest
+
+
+def test_import_does_not_touch_database(app_module):
+    # conftest importe app avec une base qui n'existe pas encore.
+    assert not os.path.exists(os.environ["DATABASE_PATH"])
+
+
+def test_ensure_db_schema_runs_once(app_module, db_path):
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == app_module.SCHEMA_VERSION
+    conn.close()
+    # Base à jour : aucun DDL rejoué.
+    assert app_module.ensure_db_schema() is False
+
+
+def test_start_worker_services_once_per_process(app_module, db_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, "warm_search_index", lambda: calls.append("index"))
+    monkeypatch.setattr(app_module, "ensure_trends_refresher", lambda: calls.append("trends"))
+    monkeypatch.setitem(app_module._WORKER_SERVICES, "pid", None)
+    app_module.start_worker_services()
+    app_module.start_worker_services()
+    assert calls == ["index", "trends"]
+
+
+def test_migrate_exits_non_zero_when_schema_fails(app_module, tmp_path, monkeypatch):
+    path = str(tmp_path / "neuve.db")
+    monkeypatch.setenv("DATABASE_PATH", path)
+    monkeypatch.setitem(app_module.app.config, "DATABASE_PATH", path)
+
+    def broken_schema(conn):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(app_module, "init_db_schema", broken_schema)
+    with pytest.raises(SystemExit) as excinfo:
+        runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrate.py"), run_name="__main__")
+    assert excinfo.value.code == 1
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    conn.close()
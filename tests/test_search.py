@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+
+def test_search_matches_without_accents(client):
+    response = client.get("/recherche?q=sante")
+    assert response.status_code == 200
+    assert "Clinique Nord" in response.get_data(as_text=True)
+
+
+def test_search_ignores_pending_sites(client):
+    assert "Pharmacie de garde" not in client.get("/recherche?q=pharmacie").get_data(as_text=True)
+
+
+def test_fts_index_follows_site_updates(app_module, db_path):
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("UPDATE sites SET description = 'Volcan et randonnées' WHERE nom = 'Job Sud'")
+    conn.commit()
+    found = [row["nom"] for row in app_module.search_sites(conn, "volcan")]
+    conn.close()
+    assert found == ["Job Sud"]
+
+
+def test_trigram_fallback_suggests_on_typo(client):
+    body = client.get("/recherche?q=clinik").get_data(as_text=True)
+    assert "Clinique Nord" in body
+
+
+def test_suggest_endpoint_prefix(client):
+    response = client.get("/recherche/suggest?q=cli")
+    assert response.status_code == 200
+    assert any("Clinique" in entry["label"] for entry in response.get_json()["results"])
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import sqlite3
+
+import pytest
+
+from site_import import import_sites, parse_import_file
+
+CSV = (
+    "nom;lien;description;categorie;ville\n"
+    "Nouveau site;https://nouveau.re;Un nouveau site local;Emploi;Saint-Denis\n"
+    "Déjà là;http://www.emploi974.re;Doublon d'un site existant;Emploi;\n"
+    "Doublon fichier;https://nouveau.re/?utm_source=x;Même lien que la ligne 2;Emploi;\n"
+    "Ville inconnue;https://atlantis.re;Une ville qui n'existe pas;Emploi;Atlantis\n"
+    "Autre;https://tourisme.re;Offices de tourisme;Tourisme;\n"
+    "X;pas une url;Description trop courte;Emploi;\n"
+)
+
+
+def _run(app_module, db_path, data, filename="sites.csv", dry_run=False):
+    conn = app_module.get_db_connection()
+    try:
+        return import_sites(
+            conn,
+            parse_import_file(data, filename),
+            category_slug=app_module.slugify,
+            city_slug=app_module.slugify_ville,
+            dry_run=dry_run,
+        )
+    finally:
+        conn.close()
+
+
+def _count(db_path, table):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_dry_run_reports_without_writing(app_module, db_path):
+    report = _run(app_module, db_path, CSV.encode("utf-8"), dry_run=True)
+    assert report["created"] == 2
+    assert [line for line, _value, _reason in report["duplicates"]] == [3, 4]
+    assert [reason for _line, _value, reason in report["errors"]] == [
+        "ville inconnue « Atlantis »",
+        "Le nom doit faire entre 2 et 100 caractères",
+    ]
+    assert report["new_categories"] == ["Tourisme"]
+    assert _count(db_path, "sites") == 4
+    assert _count(db_path, "categories") == 2
+
+
+def test_import_writes_rows_and_is_idempotent(app_module, db_path):
+    report = _run(app_module, db_path, CSV.encode("utf-8"))
+    assert report["created"] == 2
+    assert _count(db_path, "sites") == 6
+    assert _count(db_path, "categories") == 3
+    # Relancer le même fichier : tout est doublon.
+    assert _run(app_module, db_path, CSV.encode("utf-8"))["created"] == 0
+
+
+def test_json_import(app_module, db_path):
+    data = json.dumps({"sites": [{"name": "Json", "url": "json.re", "description": "Importé en JSON", "category": "Santé"}]})
+    report = _run(app_module, db_path, data.encode("utf-8"), filename="sites.json")
+    assert report["created"] == 1
+
+
+@pytest.mark.parametrize("data", [b"\xff\xfe", b"foo,bar\n1,2\n", b"{\"sites\": 3}"])
+def test_unreadable_files_raise_value_error(data):
+    with pytest.raises(ValueError):
+        parse_import_file(data, "sites.csv")
+
+
+def test_admin_upload(admin_client, db_path):
+    response = admin_client.post(
+        "/admin/propositions/import",
+        data={"fichier": (io.BytesIO(CSV.encode("utf-8")), "sites.csv"), "status": "en_attente", "dry_run": "y"},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    assert "Simulation" in response.get_data(as_text=True)
+    assert _count(db_path, "sites") == 4
+
+
+def test_import_rules_match_site_form(app_module):
+    from forms import SiteForm, validate_site_fields
+
+    row = {"nom": "Site <b>gras</b>", "lien": "exemple.re", "description": "court"}
+    with app_module.app.test_request_context(method="POST", data=row):
+        form = SiteForm(meta={"csrf": False})
+        form.validate()
+        expected = form.description.errors[0]
+        assert form.nom.data == "Site gras"
+    assert validate_site_fields(**row) == (None, expected)
+    values, error = validate_site_fields(nom="Exemple", lien="exemple.re", description="Une description correcte")
+    assert error is None
+    assert values["lien"] == "https://exemple.re"
+
+
+def test_admin_upload_size_is_limited(app_module, admin_client, db_path, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, "SITE_IMPORT_MAX_BYTES", 100)
+    response = admin_client.post(
+        "/admin/propositions/import",
+        data={"fichier": (io.BytesIO(CSV.encode("utf-8")), "sites.csv"), "status": "valide"},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert "trop volumineux" in response.get_data(as_text=True)
+    assert _count(db_path, "sites") == 4
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+import threading
+from types import SimpleNamespace
+
+
+def test_trends_page_builds_first_snapshot(client):
+    response = client.get("/tendances")
+    assert response.status_code == 200
+
+
+def test_refresher_survives_unexpected_errors(app_module, db_path, monkeypatch):
+    calls = []
+    second_round = threading.Event()
+
+    def failing_refresh():
+        calls.append(1)
+        if len(calls) >= 2:
+            second_round.set()
+        raise ValueError("payload invalide")
+
+    def fake_sleep(seconds):
+        if second_round.is_set():
+            threading.Event().wait()  # thread démon bloqué jusqu'à la fin des tests
+
+    monkeypatch.setattr(app_module, "refresh_trends_snapshot", failing_refresh)
+    monkeypatch.setattr(app_module, "time", SimpleNamespace(sleep=fake_sleep))
+    threading.Thread(target=app_module._trends_refresher_loop, daemon=True).start()
+    assert second_round.wait(5)
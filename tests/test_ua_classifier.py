@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from ua_classifier import BOT, BROWSER, HEADLESS, SUSPICIOUS, classify_user_agent
+
+
+@pytest.mark.parametrize(
+    "user_agent, expected",
+    [
+        ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36", BROWSER),
+        ("Mozilla/5.0 (Linux; Android 12; CUBOT P50) AppleWebKit/537.36 Chrome/119.0 Mobile Safari/537.36", BROWSER),
+        ("Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)", BOT),
+        ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 HeadlessChrome/120.0 Safari/537.36", HEADLESS),
+        ("Mozilla/5.0 (compatible; UptimeRobot/2.0; http://www.uptimerobot.com/)", BOT),
+        ("Mozilla/5.0 (compatible; Site Monitoring Service)", BOT),
+        ("Mozilla/5.0 (Windows NT 6.1) AppleWebKit/534.24 (KHTML, like Gecko) Google Web Preview", BOT),
+        ("W3C_Validator/1.3 http://validator.w3.org/services", BOT),
+        ("Mozilla/5.0 (X11; Linux x86_64) Chrome/120.0 Safari/537.36 MonitorControl/4.2", BROWSER),
+        ("Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0) Safari/605.1.15 PreviewApp Validators", BROWSER),
+        ("python-requests/2.31.0", SUSPICIOUS),
+        ("", SUSPICIOUS),
+        (None, SUSPICIOUS),
+    ],
+)
+def test_classify_user_agent(user_agent, expected):
+    assert classify_user_agent(user_agent) == expected
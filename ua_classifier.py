@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Classification des user-agents pour Réunion Wiki
+PERFORMANCE : une seule expression régulière compilée à partir des listes de
+motifs ci-dessous, et un cache LRU sur la chaîne brute : un user-agent déjà vu
+coûte une recherche dans un dict.
+"""
+
+import re
+from functools import lru_cache
+
+BROWSER = "browser"
+BOT = "bot"
+HEADLESS = "headless"
+SUSPICIOUS = "suspicious"
+
+CATEGORY_LABELS = {
+    BROWSER: "Navigateur",
+    BOT: "Robot connu",
+    HEADLESS: "Navigateur headless",
+    SUSPICIOUS: "Suspect",
+}
+
+# Navigateurs pilotés (tests automatisés, scraping).
+HEADLESS_PATTERNS = [
+    r"headless",
+    r"phantomjs",
+    r"slimerjs",
+    r"puppeteer",
+    r"playwright",
+    r"selenium",
+    r"webdriver",
+    r"htmlunit",
+    r"splash",
+    r"lighthouse",
+]
+
+# Robots déclarés : moteurs, aperçus de liens, SEO, archivage, IA, monitoring.
+BOT_PATTERNS = [
+    r"(?<!cu)bot\b",  # pas les téléphones Cubot
+    r"bot/",
+    r"crawl",
+    r"spider",
+    r"slurp",
+    r"facebookexternalhit",
+    r"facebookcatalog",
+    r"embedly",
+    r"whatsapp",
+    r"skypeuripreview",
+    r"bitlybot",
+    r"yandex",
+    r"baiduspider",
+    r"sogou",
+    r"exabot",
+    r"seznam",
+    r"qwantify",
+    r"bytespider",
+    r"petalbot",
+    r"semrush",
+    r"ahrefs",
+    r"mj12bot",
+    r"dotbot",
+    r"blexbot",
+    r"dataforseo",
+    r"serpstat",
+    r"ia_archiver",
+    r"archive\.org",
+    r"gptbot",
+    r"chatgpt-user",
+    r"oai-searchbot",
+    r"claudebot",
+    r"claude-web",
+    r"anthropic-ai",
+    r"perplexity",
+    r"ccbot",
+    r"cohere-ai",
+    r"diffbot",
+    r"google-extended",
+    r"googleother",
+    r"google-inspectiontool",
+    r"feedfetcher",
+    r"mediapartners-google",
+    r"adsbot",
+    r"uptimerobot",
+    r"pingdom",
+    r"statuscake",
+    r"site24x7",
+    r"newrelicpinger",
+    # Mots courants : seulement en jeton produit ou expression de robot.
+    r"\bmonitor(?:ing)?\b",
+    r"\b(?:web|link|bing)\s?preview\b",
+    r"validator(?:\.nu)?/",
+    r"feedly",
+    r"inoreader",
+]
+
+# Clients HTTP génériques et scanners : pas un navigateur, pas un robot déclaré.
+SUSPICIOUS_PATTERNS = [
+    r"^curl/",
+    r"^wget/",
+    r"python-requests",
+    r"python-urllib",
+    r"aiohttp",
+    r"httpx",
+    r"go-http-client",
+    r"^java/",
+    r"okhttp",
+    r"apache-httpclient",
+    r"libwww-perl",
+    r"lwp::simple",
+    r"^php/",
+    r"guzzlehttp",
+    r"node-fetch",
+    r"^axios/",
+    r"undici",
+    r"scrapy",
+    r"postmanruntime",
+    r"insomnia",
+    r"httpie",
+    r"masscan",
+    r"nmap",
+    r"zgrab",
+    r"nikto",
+    r"sqlmap",
+    r"nuclei",
+    r"wpscan",
+    r"dirbuster",
+    r"gobuster",
+    r"censys",
+    r"shodan",
+]
+
+_UA_REGEX = re.compile(
+    "|".join(
+        f"(?P<{name}>{'|'.join(patterns)})"
+        for name, patterns in (
+            (HEADLESS, HEADLESS_PATTERNS),
+            (BOT, BOT_PATTERNS),
+            (SUSPICIOUS, SUSPICIOUS_PATTERNS),
+        )
+    ),
+    re.IGNORECASE,
+)
+
+# Les navigateurs réels s'annoncent tous "Mozilla/5.0 (...)" (ou "Opera/").
+_BROWSER_PREFIX = re.compile(r"^(mozilla|opera)/\d", re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def classify_user_agent(user_agent):
+    """Catégorie d'un user-agent : browser, bot, headless ou suspicious.
+
+    Indicative pour "suspicious" : /go ne retire du compteur que bot et headless.
+    """
+    user_agent = (user_agent or "").strip()
+    if len(user_agent) < 10:
+        return SUSPICIOUS
+    match = _UA_REGEX.search(user_agent)
+    if match:
+        return match.lastgroup
+    if not _BROWSER_PREFIX.match(user_agent):
+        return SUSPICIOUS
+    return BROWSER